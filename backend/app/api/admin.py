@@ -3,18 +3,16 @@ from typing import List
 from app.models.models import Restaurant, MenuItem, User
 from app.core.admin_middleware import get_current_admin
 from app.dbConnection.mongoRepository import get_database
+from app.core.catalog import catalog
+from app.core import uploads, images
 import uuid
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-import os
-import shutil
 from typing import Optional
 
 db = get_database()
 router = APIRouter(prefix="/restaurants")
 
-UPLOAD_DIR = "static/restaurant_images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/", response_model=Restaurant)
 async def create_restaurant(
@@ -52,24 +50,33 @@ async def create_restaurant(
 
         # Handle image upload if provided
         if image:
-            # Generate unique filename
-            filename = f"{restaurant_dict['id']}_{image.filename}"
-            file_path = os.path.join(UPLOAD_DIR, filename)
-
-            # Save the image
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
+            pending_image = await uploads.inspect_upload(image)
+
+            # Stream the image to content-addressed storage while inserting into the database
+            stored_image, result = await uploads.save_upload_with(
+                pending_image,
+                db,
+                insert=lambda: db["restaurants"].insert_one(restaurant_dict),
+                rollback=lambda inserted: db["restaurants"].delete_one({"_id": inserted.inserted_id}),
+                attach=lambda stored: uploads.attach_image(db, restaurant_dict["id"], stored)
+            )
 
             # Add image path to restaurant data
-            restaurant_dict["image_url"] = f"/static/restaurant_images/{filename}"
-
-            print(f"Saved image to {file_path}")
-
-        # Insert into database
-        result = db["restaurants"].insert_one(restaurant_dict)
+            restaurant_dict["image_url"] = stored_image.url
+            restaurant_dict["image_digest"] = stored_image.digest
+            print(f"Saved image as {stored_image.filename}")
+
+            # Generate thumbnails and WebP/AVIF variants in the background
+            images.image_queue.enqueue(restaurant_dict["id"], restaurant_dict["image_url"])
+        else:
+            # Insert into database
+            result = db["restaurants"].insert_one(restaurant_dict)
         print(f"Insertion result: {result.inserted_id}")
+        catalog.mark_changed(db, restaurant_dict["id"])
 
         return restaurant_dict
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Restaurant creation error: {str(e)}")
         raise HTTPException(
@@ -94,6 +101,8 @@ async def update_restaurant(
             {"$set": update_data}
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Restaurant not found")
 
@@ -111,9 +120,17 @@ async def delete_restaurant(
         current_admin: User = Depends(get_current_admin)
 ):
     try:
-        result = db["restaurants"].delete_one({"id": restaurant_id})
-        if result.deleted_count == 0:
+        deleted = db["restaurants"].find_one_and_delete(
+            {"id": restaurant_id},
+            projection={"image_url": 1}
+        )
+        catalog.mark_changed(db, restaurant_id)
+
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Restaurant not found")
+
+        # Drop the image once no other restaurant shares it
+        uploads.release_image(db, deleted.get("image_url"))
         return {"message": "Restaurant deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -152,6 +169,8 @@ async def add_menu_item(
             }
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Failed to add menu item")
 
@@ -193,6 +212,8 @@ async def delete_menu_item(
             }
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             logger.error(f"Failed to delete menu item. Restaurant ID: {restaurant_id}, Item ID: {item_id}")
             raise HTTPException(status_code=404, detail="Failed to delete menu item")
@@ -227,6 +248,8 @@ async def update_menu_item(
             }
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Restaurant or menu item not found")
 
@@ -0,0 +1,94 @@
+# analytics.py
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+
+from app.models.models import User
+from app.core.admin_middleware import get_current_admin
+from app.core import analytics
+from app.dbConnection.mongoRepository import get_database
+
+db = get_database()
+router = APIRouter(prefix="/analytics")
+
+MAX_RANGE_DAYS = 366
+
+
+def _parse_day(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, analytics.DAY_FORMAT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid day '{value}', expected YYYY-MM-DD")
+
+
+@router.get("/daily")
+async def get_daily_stats(
+        day: Optional[str] = None,
+        top_n: int = Query(5, ge=1, le=50),
+        current_admin: User = Depends(get_current_admin)
+):
+    """
+    Per-restaurant figures for a single day (defaults to today, UTC)
+    """
+    day = day or analytics.day_bucket(datetime.utcnow())
+    _parse_day(day)
+
+    stats = db[analytics.STATS_COLLECTION].find({"day": day}, {"_id": 0})
+    results = [analytics.summarize(doc, top_n) for doc in stats]
+    results.sort(key=lambda row: row["revenue"], reverse=True)
+    return results
+
+
+@router.get("/restaurants/{restaurant_id}")
+async def get_restaurant_stats(
+        restaurant_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        top_n: int = Query(5, ge=1, le=50),
+        current_admin: User = Depends(get_current_admin)
+):
+    """
+    Daily figures and range totals for one restaurant (defaults to the last 30 days)
+    """
+    end_day = _parse_day(end) if end else datetime.utcnow()
+    start_day = _parse_day(start) if start else end_day - timedelta(days=29)
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    stats = list(db[analytics.STATS_COLLECTION].find(
+        {
+            "restaurant_id": restaurant_id,
+            "day": {
+                "$gte": analytics.day_bucket(start_day),
+                "$lte": analytics.day_bucket(end_day)
+            }
+        },
+        {"_id": 0}
+    ).sort("day", 1))
+
+    # Fold the daily documents into one range total
+    total = {
+        "restaurant_id": restaurant_id,
+        "day": f"{analytics.day_bucket(start_day)}..{analytics.day_bucket(end_day)}",
+        "order_count": 0,
+        "revenue_cents": 0,
+        "items": {},
+        "status_counts": {}
+    }
+    for doc in stats:
+        total["order_count"] += doc.get("order_count", 0)
+        total["revenue_cents"] += doc.get("revenue_cents", 0)
+        for key, item in doc.get("items", {}).items():
+            entry = total["items"].setdefault(key, {"name": item["name"], "quantity": 0, "revenue_cents": 0})
+            entry["quantity"] += item.get("quantity", 0)
+            entry["revenue_cents"] += item.get("revenue_cents", 0)
+        for status, count in doc.get("status_counts", {}).items():
+            total["status_counts"][status] = total["status_counts"].get(status, 0) + count
+
+    return {
+        "total": analytics.summarize(total, top_n),
+        "days": [analytics.summarize(doc, top_n) for doc in stats]
+    }
@@ -0,0 +1,50 @@
+# monitoring.py
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.models.models import User
+from app.core.admin_middleware import get_current_admin
+from app.core.loop_lag import lag_monitor
+from app.core.profiling import profile_store
+from app.core.ratelimit import load_shedder, rate_limiter
+
+router = APIRouter(prefix="/monitoring")
+
+
+@router.get("/limits")
+async def get_limit_stats(current_admin: User = Depends(get_current_admin)):
+    """Rate limit and load shedding counters of this worker"""
+    return {
+        "rate_limits": rate_limiter.stats(),
+        "load_shedding": load_shedder.stats(),
+    }
+
+
+@router.get("/loop")
+async def get_loop_stats(current_admin: User = Depends(get_current_admin)):
+    """
+    Event-loop lag of this worker, and with LOOP_DEBUG on, the calls that
+    blocked the loop (stack, route, duration) with per-route totals
+    """
+    return {
+        "lag": lag_monitor.stats(),
+        "blocking": lag_monitor.blocking_stats(),
+    }
+
+
+@router.get("/profiles")
+async def list_profiles(current_admin: User = Depends(get_current_admin)):
+    """Recently profiled requests, newest first"""
+    return profile_store.summaries()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: int, current_admin: User = Depends(get_current_admin)):
+    """
+    A request profile as collapsed stacks, e.g. for
+    ``flamegraph.pl profile.txt > profile.svg`` or speedscope
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed())
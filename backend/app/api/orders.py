@@ -2,41 +2,27 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 import uuid
+import logging
 
 from app.models.models import Order, OrderStatus, User, OrderItem
 from app.core.security import get_current_user
+from app.core.pricing import price_tables, price_order, from_cents
+from app.core import analytics, profiles
 from app.dbConnection.mongoRepository import get_database
 
 router = APIRouter()
 db = get_database()
+logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=Order)
 async def create_order(order: Order, current_user: User = Depends(get_current_user)):
     try:
-        # Validate restaurant and menu items exist
-        restaurant_ids = set()
-        for item in order.items:
-            # Check restaurant exists
-            restaurant = db["restaurants"].find_one({"id": item.restaurant_id})
-            if not restaurant:
-                raise HTTPException(status_code=404,
-                                    detail=f"Restaurant {item.restaurant_id} not found")
-
-            # Check menu item exists and price matches
-            menu_item = next((m for m in restaurant.get('menu', [])
-                              if m.get('name') == item.name), None)
-            if not menu_item:
-                raise HTTPException(status_code=404,
-                                    detail=f"Menu item {item.name} not found in restaurant")
-
-            # Validate menu item price
-            if abs(float(menu_item['price']) - item.price) > 0.01:
-                raise HTTPException(status_code=400,
-                                    detail=f"Price mismatch for {item.name}")
-
-            # Collect unique restaurant IDs
-            restaurant_ids.add(item.restaurant_id)
+        # Price every item from the catalog instead of trusting the client
+        tables = price_tables.get_many(db, (item.restaurant_id for item in order.items))
+        quote = price_order(order.items, tables)
+        restaurant_ids = quote.restaurant_ids
 
         # Prepare order for database
         order_dict = order.model_dump()
@@ -45,12 +31,29 @@ async def create_order(order: Order, current_user: User = Depends(get_current_us
         if not order_dict.get('id'):
             order_dict['id'] = str(uuid.uuid4())
 
+        # Store server-side prices and totals
+        order_dict['items'] = [
+            {
+                "menu_item_id": line.menu_item_id,
+                "restaurant_id": line.restaurant_id,
+                "name": line.name,
+                "quantity": line.quantity,
+                "price": from_cents(line.unit_cents),
+                "discount": from_cents(line.discount_cents)
+            }
+            for line in quote.lines
+        ]
+        order_dict['subtotal'] = from_cents(quote.subtotal_cents)
+        order_dict['discount_total'] = from_cents(quote.discount_cents)
+        order_dict['delivery_fee'] = from_cents(quote.delivery_fee_cents)
+        order_dict['total_price'] = from_cents(quote.total_cents)
+
         # Set user ID
         order_dict['user_id'] = current_user.id
 
         # Set restaurant ID (use first restaurant if multiple)
         if not order_dict.get('restaurant_id') and restaurant_ids:
-            order_dict['restaurant_id'] = list(restaurant_ids)[0]
+            order_dict['restaurant_id'] = restaurant_ids[0]
 
         # Ensure status and timestamps
         order_dict['status'] = OrderStatus.PENDING
@@ -60,6 +63,18 @@ async def create_order(order: Order, current_user: User = Depends(get_current_us
         # Insert order
         result = db["orders"].insert_one(order_dict)
 
+        # Keep pre-aggregated analytics in step; never fail the order for it
+        try:
+            analytics.record_order_created(db, order_dict)
+        except Exception as e:
+            logger.error(f"Failed to record order analytics: {str(e)}")
+
+        # Same for the user's taste profile used by recommendations
+        try:
+            profiles.record_order(db, order_dict)
+        except Exception as e:
+            logger.error(f"Failed to update user profile: {str(e)}")
+
         return order_dict
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -129,9 +144,13 @@ async def update_order_status(
 ):
     """
     Update order status
+
+    Setting an order to the status it already has succeeds, as before, and
+    only refreshes ``updated_at``; the analytics status funnel is unchanged.
+    Orders the user does not own, or that do not exist, return 404.
     """
     try:
-        result = db["orders"].update_one(
+        previous = db["orders"].find_one_and_update(
             {
                 "$or": [
                     {"_id": ObjectId(order_id)},
@@ -142,12 +161,19 @@ async def update_order_status(
             {"$set": {
                 "status": status,
                 "updated_at": datetime.utcnow()
-            }}
+            }},
+            projection={"items": 1, "status": 1, "created_at": 1},
+            return_document=ReturnDocument.BEFORE
         )
 
-        if result.modified_count == 0:
+        if previous is None:
             raise HTTPException(status_code=404, detail="Order not found")
 
+        try:
+            analytics.record_status_change(db, previous, previous.get("status"), status)
+        except Exception as e:
+            logger.error(f"Failed to record order analytics: {str(e)}")
+
         return {"message": "Order status updated successfully"}
     except HTTPException:
         # Re-raise HTTP exceptions
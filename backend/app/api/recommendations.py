@@ -0,0 +1,72 @@
+# recommendations.py
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+
+from app.models.models import RecommendationQuery, User
+from app.core.security import get_current_user
+from app.core import profiles
+from app.core.recommendations import menu_cache, recent_order_items, recommendations_client, relay
+from app.dbConnection.mongoRepository import get_database
+
+router = APIRouter()
+db = get_database()
+
+
+def _build_request(restaurant_id: str, query: RecommendationQuery, current_user: User) -> dict:
+    menu = menu_cache.get(db, restaurant_id)
+    if menu is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    if not menu:
+        raise HTTPException(status_code=400, detail="Restaurant has no available menu items")
+    # The profile is fixed-size; only users who ordered before profiles existed need the order scan
+    profile = profiles.summarize(profiles.get_profile(db, current_user.id))
+    return {
+        "restaurant_id": restaurant_id,
+        "restaurant_menu": menu,
+        "user_previous_orders": profile["favorite_items"] if profile else recent_order_items(db, current_user.id),
+        "user_profile": profile,
+        "user_preference": query.user_preference,
+    }
+
+
+@router.post("/{restaurant_id}")
+async def get_recommendation(
+        restaurant_id: str,
+        query: RecommendationQuery,
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Recommend menu items for the current user
+
+    The menu and order history are read server-side, so the client only
+    sends its free-text preference.
+    """
+    try:
+        payload = _build_request(restaurant_id, query, current_user)
+        return await recommendations_client.recommend(payload, current_user.id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/{restaurant_id}/stream")
+async def stream_recommendation(
+        restaurant_id: str,
+        query: RecommendationQuery,
+        current_user: User = Depends(get_current_user)
+):
+    """Relay the service's server-sent events ("item", "reasoning", "done", "error")"""
+    try:
+        payload = _build_request(restaurant_id, query, current_user)
+        response = await recommendations_client.open_stream(payload, current_user.id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        relay(response),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
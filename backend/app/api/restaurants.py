@@ -1,17 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import List, Optional
-from app.models.models import Restaurant, MenuItem, FoodCategory, User
+from app.models.models import Restaurant, MenuItem, FoodCategory, User, RestaurantSort, RankingKind
 from app.dbConnection.mongoRepository import get_database
+from app.core.catalog import MongoJSONEncoder, catalog, menu_filter
+from app.core.config import settings
+from app.core import popularity, uploads, images
 from app.core.security import get_current_admin
-from bson import ObjectId
 import uuid
 import logging
 from urllib.parse import unquote
 from fastapi import File, UploadFile, Form
-import os
-import shutil
 from datetime import datetime
-import json
 
 
 router = APIRouter()
@@ -24,17 +23,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Define the correct static folder path
-UPLOAD_DIR = "static/restaurant_images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-class MongoJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
 
 def serialize_mongo_doc(doc):
     if doc.get('_id'):
@@ -71,6 +59,8 @@ async def update_restaurant(
             {"$set": update_data}
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Restaurant not found")
 
@@ -97,14 +87,22 @@ async def delete_restaurant(
         logger.info(f"Deleting restaurant: {restaurant_id}")
 
         # Delete restaurant from database
-        result = db["restaurants"].delete_one({"id": restaurant_id})
+        deleted = db["restaurants"].find_one_and_delete(
+            {"id": restaurant_id},
+            projection={"image_url": 1}
+        )
+
+        logger.info(f"Delete result: {deleted is not None}")
 
-        logger.info(f"Delete result: {result.deleted_count}")
+        catalog.mark_changed(db, restaurant_id)
 
-        if result.deleted_count == 0:
+        if deleted is None:
             logger.error(f"Restaurant not found: {restaurant_id}")
             raise HTTPException(status_code=404, detail="Restaurant not found")
 
+        # Drop the image once no other restaurant shares it
+        uploads.release_image(db, deleted.get("image_url"))
+
         return {"message": "Restaurant deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting restaurant: {str(e)}")
@@ -137,6 +135,8 @@ async def delete_menu_item(
             }
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             print(f"Failed to delete menu item: {item_name}")
             raise HTTPException(status_code=404, detail="Failed to delete menu item")
@@ -148,17 +148,141 @@ async def delete_menu_item(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/")
-async def get_restaurants():
+async def get_restaurants(
+        request: Request,
+        sort: Optional[RestaurantSort] = None,
+        image_width: Optional[int] = Query(None, ge=1, le=4096)
+):
+    try:
+        accept = request.headers.get("accept")
+        formats = frozenset(images.accepted_formats(accept)) if image_width else None
+        cache_key = ("restaurants", sort, image_width, formats)
+
+        # Serve the serialized (and precompressed) list until the catalog changes
+        cached = catalog.get(db, cache_key)
+        if cached is None:
+            version = catalog.version(db)
+            restaurants = list(db["restaurants"].find())
+
+            # Convert ObjectId to string
+            for restaurant in restaurants:
+                restaurant["_id"] = str(restaurant["_id"])
+
+            # Serve the smallest image variant that fits the requested width
+            if image_width:
+                for restaurant in restaurants:
+                    variant = images.pick_variant(restaurant.get("image_variants"), image_width, accept)
+                    if variant:
+                        restaurant["original_image_url"] = restaurant.get("image_url")
+                        restaurant["image_url"] = variant["url"]
+
+            ttl_seconds = None
+            if sort == RestaurantSort.POPULARITY:
+                scores = popularity.restaurant_scores(db)
+                restaurants.sort(key=lambda r: scores.get(r.get("id"), 0), reverse=True)
+                # Scores move without catalog writes
+                ttl_seconds = settings.POPULARITY_REFRESH_SECONDS
+            elif sort == RestaurantSort.RATING:
+                restaurants.sort(key=lambda r: r.get("rating", 0), reverse=True)
+            elif sort == RestaurantSort.NAME:
+                restaurants.sort(key=lambda r: r.get("name", "").lower())
+
+            cached = catalog.put(cache_key, version, restaurants, ttl_seconds=ttl_seconds)
+
+        headers = {"Vary": "Accept"} if image_width else None
+        return cached.respond(request, headers)
+    except Exception as e:
+        logger.error(f"Error in get_restaurants: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _with_restaurant_details(entries):
+    # Attach display fields for the ranked restaurants in one query
+    restaurant_ids = list({entry["restaurant_id"] for entry in entries})
+    details = {
+        doc["id"]: doc
+        for doc in db["restaurants"].find(
+            {"id": {"$in": restaurant_ids}},
+            {"_id": 0, "id": 1, "name": 1, "cuisine_type": 1, "rating": 1, "image_url": 1}
+        )
+    }
+    return [
+        {**entry, "restaurant": details[entry["restaurant_id"]]}
+        for entry in entries
+        if entry["restaurant_id"] in details
+    ]
+
+@router.get("/trending")
+async def get_trending(
+        kind: RankingKind = RankingKind.RESTAURANTS,
+        limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Restaurants or dishes ranked by time-decayed order volume
+    """
+    try:
+        entries = popularity.top(db, kind.ranking_kind, limit, by="score")
+        return _with_restaurant_details(entries)
+    except Exception as e:
+        logger.error(f"Error in get_trending: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/most-ordered")
+async def get_most_ordered(
+        kind: RankingKind = RankingKind.RESTAURANTS,
+        limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Restaurants or dishes ranked by all-time ordered quantity
+    """
     try:
-        restaurants = list(db["restaurants"].find())
+        entries = popularity.top(db, kind.ranking_kind, limit, by="quantity")
+        return _with_restaurant_details(entries)
+    except Exception as e:
+        logger.error(f"Error in get_most_ordered: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Convert ObjectId to string
-        for restaurant in restaurants:
+
+@router.get("/{restaurant_id}")
+async def get_restaurant(
+        restaurant_id: str,
+        request: Request,
+        category: Optional[str] = None,
+        is_vegetarian: Optional[bool] = None,
+        max_spiciness: Optional[int] = Query(None, ge=1, le=5),
+        available: Optional[bool] = None,
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0)
+):
+    """
+    A single restaurant with its menu, optionally filtered server-side
+    """
+    try:
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise HTTPException(status_code=400, detail="min_price cannot exceed max_price")
+
+        filters = (category, is_vegetarian, max_spiciness, available, min_price, max_price)
+        cache_key = ("restaurant", restaurant_id, filters)
+        cached = catalog.get(db, cache_key)
+        if cached is None:
+            version = catalog.version(db)
+            pipeline = [{"$match": {"id": restaurant_id}}, {"$limit": 1}]
+            menu = menu_filter(*filters)
+            if menu is not None:
+                # Filter the embedded menu in Mongo rather than shipping it whole
+                pipeline.append({"$set": {"menu": menu}})
+
+            restaurant = next(db["restaurants"].aggregate(pipeline), None)
+            if not restaurant:
+                raise HTTPException(status_code=404, detail="Restaurant not found")
             restaurant["_id"] = str(restaurant["_id"])
+            cached = catalog.put(cache_key, version, restaurant)
 
-        return restaurants
+        return cached.respond(request)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in get_restaurants: {str(e)}")
+        logger.error(f"Error in get_restaurant: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -176,26 +300,12 @@ async def add_restaurant(
     try:
         print(f"Received request to add restaurant: {name}")
 
+        # Validate the image before touching the disk or the database
+        pending_image = await uploads.inspect_upload(image)
+
         # Generate unique restaurant ID
         restaurant_id = str(uuid.uuid4())
 
-        # Handle image upload
-        file_extension = os.path.splitext(image.filename)[1]
-        image_filename = f"{restaurant_id}{file_extension}"
-        base_dir = os.path.join(os.getcwd(), "static", "restaurant_images")
-        os.makedirs(base_dir, exist_ok=True)
-        file_path = os.path.join(base_dir, image_filename)
-
-        print(f"Saving to FULL path: {file_path}")
-        print(f"Base directory: {base_dir}")
-        print(f"Directory exists: {os.path.exists(base_dir)}")
-
-        # Save the uploaded image
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-
-        # Verify file exists
-        print(f"File exists after saving: {os.path.exists(file_path)}")
         # Create restaurant data
         restaurant_data = {
             "id": restaurant_id,
@@ -205,21 +315,24 @@ async def add_restaurant(
             "address": address,
             "description": description or "",
             "menu": [],
-            "image_url": f"/static/restaurant_images/{image_filename}",
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
 
-        print(f"Inserting restaurant data: {restaurant_data}")
-
-        # Save the image_url in the database but don't include in response
-        db_restaurant_data = {
-            **restaurant_data,
-            "image_url": f"/static/restaurant_images/{image_filename}"
-        }
+        # Stream the image to content-addressed storage while inserting into the database
+        stored_image, result = await uploads.save_upload_with(
+            pending_image,
+            db,
+            insert=lambda: db["restaurants"].insert_one(restaurant_data),
+            rollback=lambda inserted: db["restaurants"].delete_one({"_id": inserted.inserted_id}),
+            attach=lambda stored: uploads.attach_image(db, restaurant_id, stored)
+        )
+        restaurant_data["image_url"] = stored_image.url
+        restaurant_data["image_digest"] = stored_image.digest
+        catalog.mark_changed(db, restaurant_id)
 
-        # Insert into database
-        result = db["restaurants"].insert_one(restaurant_data)
+        # Generate thumbnails and WebP/AVIF variants in the background
+        images.image_queue.enqueue(restaurant_id, restaurant_data["image_url"])
 
         # Convert ObjectId to string before returning
         restaurant_data['_id'] = str(result.inserted_id)
@@ -229,14 +342,10 @@ async def add_restaurant(
             "restaurant": restaurant_data
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error adding restaurant: {str(e)}")
-        # If there's an error, clean up any uploaded file
-        if 'file_path' in locals():
-            try:
-                os.remove(file_path)
-            except:
-                pass
         raise HTTPException(
             status_code=500,
             detail=f"Failed to add restaurant: {str(e)}"
@@ -281,6 +390,8 @@ async def add_menu_item(
             }
         )
 
+        catalog.mark_changed(db, restaurant_id)
+
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="Failed to add menu item")
 
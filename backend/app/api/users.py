@@ -12,6 +12,7 @@ from app.core.security import (
 from app.models.models import User, UserCreate, UserUpdate, Token
 from app.dbConnection.mongoRepository import get_database
 from app.core.config import settings
+from app.core import profiles
 
 router = APIRouter()
 db = get_database()
@@ -59,7 +60,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
     # Create access token
     access_token = create_access_token(
-        data={"sub": user["email"]},
+        # The admin claim lets middleware (request profiling) check the role without a database query
+        data={"sub": user["email"], "admin": bool(user.get("is_admin", False))},
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -167,4 +169,9 @@ async def update_user_profile(
 @router.get("/me/orders")
 async def read_user_orders(current_user: User = Depends(get_current_user)):
     orders = list(db["orders"].find({"user_id": str(current_user.id)}))
-    return orders
\ No newline at end of file
+    return orders
+
+@router.get("/me/taste-profile")
+async def read_taste_profile(current_user: User = Depends(get_current_user)):
+    """Taste profile built from the user's orders (null before the first order)"""
+    return profiles.summarize(profiles.get_profile(db, str(current_user.id)))
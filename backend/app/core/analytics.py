@@ -0,0 +1,260 @@
+# app/core/analytics.py
+"""
+Pre-aggregated order analytics.
+
+One document per restaurant per day is kept in the ``restaurant_daily_stats``
+collection and updated incrementally whenever an order is created or changes
+status, so reporting endpoints never have to scan ``orders``. ``backfill``
+rebuilds the documents from ``orders`` with an aggregation pipeline.
+"""
+import argparse
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING
+
+from app.core.pricing import to_cents, from_cents
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "restaurant_daily_stats"
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def day_bucket(moment: datetime) -> str:
+    """Return the UTC day key used to bucket an order"""
+    return moment.strftime(DAY_FORMAT)
+
+
+def field_key(name: str) -> str:
+    """Return ``name`` made safe as a Mongo field name (no dots, no leading "$")"""
+    return name.replace(".", "．").replace("$", "＄")
+
+
+def ensure_indexes(db) -> None:
+    db[STATS_COLLECTION].create_index(
+        [("restaurant_id", ASCENDING), ("day", ASCENDING)],
+        unique=True
+    )
+    db[STATS_COLLECTION].create_index([("day", ASCENDING)])
+
+
+def _restaurant_lines(order: dict) -> Dict[str, List[dict]]:
+    lines = {}
+    for item in order.get("items", []):
+        lines.setdefault(item["restaurant_id"], []).append(item)
+    return lines
+
+
+def _line_revenue_cents(item: dict) -> int:
+    return to_cents(item["price"]) * item["quantity"] - to_cents(item.get("discount") or 0)
+
+
+def record_order_created(db, order: dict) -> None:
+    """
+    Add a newly created order to the daily aggregates of every restaurant in it
+
+    Args:
+        db: The MongoDB database instance
+        order (dict): The order document as inserted into ``orders``
+    """
+    day = day_bucket(order["created_at"])
+    status = str(getattr(order["status"], "value", order["status"]))
+
+    for restaurant_id, items in _restaurant_lines(order).items():
+        increments = {
+            "order_count": 1,
+            f"status_counts.{status}": 1,
+        }
+        names = {}
+        revenue = 0
+        for item in items:
+            key = field_key(item["name"])
+            line_revenue = _line_revenue_cents(item)
+            revenue += line_revenue
+            increments[f"items.{key}.quantity"] = (
+                increments.get(f"items.{key}.quantity", 0) + item["quantity"]
+            )
+            increments[f"items.{key}.revenue_cents"] = (
+                increments.get(f"items.{key}.revenue_cents", 0) + line_revenue
+            )
+            names[f"items.{key}.name"] = item["name"]
+        increments["revenue_cents"] = revenue
+
+        db[STATS_COLLECTION].update_one(
+            {"restaurant_id": restaurant_id, "day": day},
+            {
+                "$inc": increments,
+                "$set": {**names, "updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+
+def record_status_change(db, order: dict, old_status: str, new_status: str) -> None:
+    """
+    Move an order between status buckets of the status funnel
+
+    Args:
+        db: The MongoDB database instance
+        order (dict): The order document (needs ``items`` and ``created_at``)
+        old_status (str): The status before the update
+        new_status (str): The status after the update
+    """
+    old_status = str(getattr(old_status, "value", old_status))
+    new_status = str(getattr(new_status, "value", new_status))
+    if old_status == new_status:
+        return
+
+    day = day_bucket(order["created_at"])
+    for restaurant_id in _restaurant_lines(order):
+        db[STATS_COLLECTION].update_one(
+            {"restaurant_id": restaurant_id, "day": day},
+            {
+                "$inc": {
+                    f"status_counts.{old_status}": -1,
+                    f"status_counts.{new_status}": 1
+                },
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+
+def summarize(stats: dict, top_n: int = 5) -> dict:
+    """
+    Turn a stored daily stats document into an API response
+
+    Args:
+        stats (dict): A ``restaurant_daily_stats`` document
+        top_n (int): Number of top menu items to include
+
+    Returns:
+        dict: Order count, revenue, average basket, top items and status funnel
+    """
+    order_count = stats.get("order_count", 0)
+    revenue_cents = stats.get("revenue_cents", 0)
+    items = sorted(
+        stats.get("items", {}).values(),
+        key=lambda item: (item.get("quantity", 0), item.get("revenue_cents", 0)),
+        reverse=True
+    )[:top_n]
+
+    return {
+        "restaurant_id": stats["restaurant_id"],
+        "day": stats["day"],
+        "order_count": order_count,
+        "revenue": from_cents(revenue_cents),
+        "average_basket": from_cents(revenue_cents // order_count) if order_count else 0.0,
+        "top_items": [
+            {
+                "name": item["name"],
+                "quantity": item.get("quantity", 0),
+                "revenue": from_cents(item.get("revenue_cents", 0))
+            }
+            for item in items
+        ],
+        "status_counts": stats.get("status_counts", {})
+    }
+
+
+def backfill_pipeline(since: Optional[datetime] = None) -> List[dict]:
+    line_revenue = {
+        "$subtract": [
+            {"$multiply": [
+                {"$round": [{"$multiply": ["$items.price", 100]}, 0]},
+                "$items.quantity"
+            ]},
+            {"$round": [{"$multiply": [{"$ifNull": ["$items.discount", 0]}, 100]}, 0]}
+        ]
+    }
+    pipeline = [
+        {"$match": {"created_at": {"$gte": since}}} if since else {"$match": {}},
+        {"$unwind": "$items"},
+        # One row per order per restaurant
+        {"$group": {
+            "_id": {
+                "order": "$_id",
+                "restaurant_id": "$items.restaurant_id",
+                "day": {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}}
+            },
+            "status": {"$first": "$status"},
+            "revenue_cents": {"$sum": line_revenue},
+            "items": {"$push": {
+                "name": "$items.name",
+                "quantity": "$items.quantity",
+                "revenue_cents": line_revenue
+            }}
+        }},
+        # One row per restaurant per day
+        {"$group": {
+            "_id": {"restaurant_id": "$_id.restaurant_id", "day": "$_id.day"},
+            "order_count": {"$sum": 1},
+            "revenue_cents": {"$sum": "$revenue_cents"},
+            "statuses": {"$push": "$status"},
+            "items": {"$push": "$items"}
+        }}
+    ]
+    return pipeline
+
+
+def backfill(db, since: Optional[datetime] = None) -> int:
+    """
+    Rebuild daily aggregates from the ``orders`` collection.
+
+    Every day from ``since`` on (or every day, without it) is replaced
+    wholesale: documents for restaurant/days that no longer have orders are
+    deleted before the rebuilt ones are inserted. Run it for days that are
+    not receiving live orders (or while traffic is paused).
+
+    Args:
+        db: The MongoDB database instance
+        since (Optional[datetime]): Only rebuild days from the day of this moment on
+
+    Returns:
+        int: Number of restaurant/day documents written
+    """
+    ensure_indexes(db)
+    if since:
+        # Whole days only, so no day is rebuilt from part of its orders
+        since = datetime.strptime(day_bucket(since), DAY_FORMAT)
+    documents = []
+    for row in db["orders"].aggregate(backfill_pipeline(since), allowDiskUse=True):
+        items = {}
+        for order_items in row["items"]:
+            for item in order_items:
+                entry = items.setdefault(field_key(item["name"]), {
+                    "name": item["name"], "quantity": 0, "revenue_cents": 0
+                })
+                entry["quantity"] += item["quantity"]
+                entry["revenue_cents"] += int(item["revenue_cents"])
+
+        documents.append({
+            "restaurant_id": row["_id"]["restaurant_id"],
+            "day": row["_id"]["day"],
+            "order_count": row["order_count"],
+            "revenue_cents": int(row["revenue_cents"]),
+            "items": items,
+            "status_counts": dict(Counter(str(status) for status in row["statuses"])),
+            "updated_at": datetime.utcnow()
+        })
+
+    # Days whose orders were deleted would otherwise keep their old totals
+    db[STATS_COLLECTION].delete_many({"day": {"$gte": day_bucket(since)}} if since else {})
+    if documents:
+        db[STATS_COLLECTION].insert_many(documents, ordered=False)
+    return len(documents)
+
+
+if __name__ == "__main__":
+    from app.dbConnection.mongoRepository import get_database
+
+    parser = argparse.ArgumentParser(description="Rebuild restaurant daily analytics from orders")
+    parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    since = datetime.strptime(args.since, DAY_FORMAT) if args.since else None
+    written = backfill(get_database(), since)
+    print(f"Backfilled {written} restaurant/day documents")
@@ -0,0 +1,220 @@
+# app/core/catalog.py
+"""
+Process-local cache of serialized catalog responses.
+
+Every write to restaurants or menus calls ``catalog.mark_changed``, which
+bumps a version counter stored in Mongo and drops this worker's cached
+responses. Other workers notice the new version the next time they sync
+(at most every ``CATALOG_VERSION_POLL_SECONDS``), so reads never hit Mongo
+just to validate the cache.
+
+Cached responses keep the serialized JSON and its brotli/gzip encodings
+side by side, so hot reads skip both serialization and compression. Each
+body carries an ETag hashed from its JSON, so a conditional request for a
+cached body is answered with 304 without reading the catalog from Mongo.
+"""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.compression import available_encodings, compress, negotiate
+from app.core.config import settings
+from app.core.pricing import price_tables
+
+META_COLLECTION = "catalog_meta"
+META_ID = "catalog"
+
+
+class MongoJSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+@dataclass
+class CachedBody:
+    version: int
+    raw: bytes
+    etag: str
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    expires_at: Optional[float] = None
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header matches this body (weak comparison)"""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag.removeprefix("W/") in tags
+
+    def respond(self, request: Request, headers: Optional[dict] = None) -> Response:
+        """
+        Answer a request from the cached body
+
+        Returns 304 when the client's copy is current, otherwise the best
+        precomputed encoding the client accepts.
+
+        Args:
+            request (Request): The incoming request
+            headers (Optional[dict]): Extra response headers
+
+        Returns:
+            Response: The response to send
+        """
+        headers = {"ETag": self.etag, "Cache-Control": settings.CATALOG_CACHE_CONTROL, **(headers or {})}
+        headers["Vary"] = ", ".join(filter(None, (headers.get("Vary"), "Accept-Encoding")))
+
+        if self.not_modified(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        if encoding in self.encoded:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.encoded[encoding], media_type="application/json", headers=headers)
+        return Response(content=self.raw, media_type="application/json", headers=headers)
+
+
+def menu_filter(
+        category: Optional[str] = None,
+        is_vegetarian: Optional[bool] = None,
+        max_spiciness: Optional[int] = None,
+        available: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+) -> Optional[dict]:
+    """
+    Build a ``$filter`` expression selecting menu items server-side
+
+    Missing ``available`` / ``is_vegetarian`` fields take the MenuItem
+    defaults (True / False). Items without a spiciness level always pass
+    the spiciness filter.
+
+    Returns:
+        Optional[dict]: The ``$filter`` expression, or None when no filter is set
+    """
+    conditions = []
+    if category is not None:
+        conditions.append({"$eq": ["$$item.category", category]})
+    if is_vegetarian is not None:
+        conditions.append({"$eq" if is_vegetarian else "$ne": ["$$item.is_vegetarian", True]})
+    if max_spiciness is not None:
+        conditions.append({"$lte": [{"$ifNull": ["$$item.spiciness_level", 0]}, max_spiciness]})
+    if available is not None:
+        conditions.append({"$ne" if available else "$eq": ["$$item.available", False]})
+    if min_price is not None:
+        conditions.append({"$gte": ["$$item.price", min_price]})
+    if max_price is not None:
+        conditions.append({"$lte": ["$$item.price", max_price]})
+
+    if not conditions:
+        return None
+    return {"$filter": {"input": {"$ifNull": ["$menu", []]}, "as": "item", "cond": {"$and": conditions}}}
+
+
+class CatalogCache:
+    def __init__(self, poll_seconds: float = settings.CATALOG_VERSION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._version = 0
+        self._synced_at = float("-inf")
+        self._entries: Dict[Hashable, CachedBody] = {}
+        self._lock = threading.Lock()
+
+    def version(self, db) -> int:
+        """
+        Return the current catalog version, re-reading it from Mongo at most
+        once per poll interval
+
+        Args:
+            db: The MongoDB database instance
+
+        Returns:
+            int: The catalog version
+        """
+        now = time.monotonic()
+        if now - self._synced_at >= self.poll_seconds:
+            meta = db[META_COLLECTION].find_one({"_id": META_ID}, {"version": 1})
+            self._set_version(meta["version"] if meta else 0, now)
+        return self._version
+
+    def _set_version(self, version: int, now: float) -> None:
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+            self._version = version
+            self._synced_at = now
+
+    def mark_changed(self, db, restaurant_id: Optional[str] = None) -> int:
+        """
+        Record a catalog write: bump the shared version and drop cached data
+
+        Args:
+            db: The MongoDB database instance
+            restaurant_id (Optional[str]): The restaurant that changed, if known
+
+        Returns:
+            int: The new catalog version
+        """
+        meta = db[META_COLLECTION].find_one_and_update(
+            {"_id": META_ID},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._set_version(meta["version"], time.monotonic())
+        price_tables.invalidate(restaurant_id)
+        return meta["version"]
+
+    def get(self, db, key: Hashable) -> Optional[CachedBody]:
+        version = self.version(db)
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        if entry.expires_at is not None and time.monotonic() >= entry.expires_at:
+            return None
+        return entry
+
+    def put(self, key: Hashable, version: int, payload: Any, ttl_seconds: Optional[float] = None) -> CachedBody:
+        """
+        Serialize, precompress and cache a response payload
+
+        Args:
+            key: The cache key (endpoint and query parameters)
+            version (int): The catalog version the payload was read at
+            payload: JSON-serializable data (Mongo types allowed)
+            ttl_seconds (Optional[float]): Expire the entry even without writes
+
+        Returns:
+            CachedBody: The cached response body
+        """
+        raw = json.dumps(payload, cls=MongoJSONEncoder, separators=(",", ":")).encode("utf-8")
+        entry = CachedBody(
+            version=version,
+            raw=raw,
+            # Weak: the same tag covers the identity and compressed encodings
+            etag=f'W/"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"',
+            expires_at=time.monotonic() + ttl_seconds if ttl_seconds else None
+        )
+        if len(raw) >= settings.COMPRESSION_MIN_BYTES:
+            entry.encoded = {encoding: compress(raw, encoding) for encoding in available_encodings()}
+
+        with self._lock:
+            # Only cache data that is still current
+            if version == self._version:
+                if len(self._entries) >= settings.CATALOG_CACHE_MAX_ENTRIES:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = entry
+        return entry
+
+
+catalog = CatalogCache()
@@ -0,0 +1,194 @@
+# app/core/compression.py
+import gzip
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+# Content types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+)
+
+
+def available_encodings() -> tuple:
+    """Encodings this process can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the best response encoding the client accepts
+
+    Args:
+        accept_encoding (Optional[str]): The Accept-Encoding header
+
+    Returns:
+        Optional[str]: "br", "gzip", or None for an uncompressed response
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Lower-cased coding (or "*") -> q-value from an Accept-Encoding header; q=0 means refused"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.GZIP_LEVEL, mtime=0)
+
+
+def _is_compressible(content_type: str) -> bool:
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip.
+
+    Only responses of an allowlisted content type and at least
+    ``minimum_size`` bytes are compressed. Responses that already carry a
+    Content-Encoding (such as precompressed catalog responses or static
+    ``.br``/``.gz`` siblings) and range responses pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = settings.COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.stream: Optional[_StreamCompressor] = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or "content-range" in headers
+                or message["status"] in (204, 304)
+                or not _is_compressible(headers.get("content-type", ""))
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                # Hold the start message until the first body chunk decides the size
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start_message is not None:
+                # e.g. http.response.pathsend: the body never passes through here
+                self.passthrough = True
+                start_message, self.start_message = self.start_message, None
+                await self._send(start_message)
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start_message["headers"])
+
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    self.passthrough = True
+                    await self._send(start_message)
+                    await self._send(message)
+                    return
+                body = compress(body, self.encoding)
+                headers["content-length"] = str(len(body))
+            else:
+                # Streaming response: compress chunk by chunk
+                self.stream = _StreamCompressor(self.encoding)
+                del headers["content-length"]
+                body = self.stream.chunk(body)
+
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            await self._send(start_message)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.stream is not None:
+            body = self.stream.chunk(body)
+            if not more_body:
+                body += self.stream.finish()
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
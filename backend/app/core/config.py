@@ -5,8 +5,10 @@ import os
 load_dotenv()
 
 class Settings:
-    MONGO_URI: str = os.getenv("MONGO_URI", "")
+    MONGO_URI: str = os.getenv("MONGO_URI") or "mongodb://localhost:27017"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
+    # Tokens carry an "admin" claim, but admin access is always confirmed against
+    # the user record, so revoking it does not wait for the token to expire
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     CORS_ORIGINS: list = [
@@ -19,7 +21,108 @@ class Settings:
 
     ]
 
+    # Pricing
+    DEFAULT_DELIVERY_FEE: float = float(os.getenv("DEFAULT_DELIVERY_FEE", 0))
+    PRICE_TABLE_TTL_SECONDS: int = int(os.getenv("PRICE_TABLE_TTL_SECONDS", 300))
+
     CORS_ALLOW_METHODS: list = ["*"]
     CORS_ALLOW_HEADERS: list = ["*"]
 
+    # Image uploads
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", 5 * 1024 * 1024))
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+    IMAGE_VARIANT_WIDTHS: list = [
+        int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640").split(",")
+    ]
+
+    # Static assets
+    STATIC_STAT_TTL_SECONDS: float = float(os.getenv("STATIC_STAT_TTL_SECONDS", 5))
+    STATIC_CHUNK_BYTES: int = int(os.getenv("STATIC_CHUNK_BYTES", 64 * 1024))
+    STATIC_CACHE_CONTROL: str = os.getenv("STATIC_CACHE_CONTROL", "public, no-cache")
+
+    # Popularity rankings
+    POPULARITY_HALF_LIFE_HOURS: float = float(os.getenv("POPULARITY_HALF_LIFE_HOURS", 72))
+    POPULARITY_REFRESH_SECONDS: int = int(os.getenv("POPULARITY_REFRESH_SECONDS", 60))
+
+    # Response compression
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", 5))
+
+    # Catalog response cache
+    CATALOG_VERSION_POLL_SECONDS: float = float(os.getenv("CATALOG_VERSION_POLL_SECONDS", 1))
+    CATALOG_CACHE_MAX_ENTRIES: int = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 256))
+    # Proxies and browsers revalidate with If-None-Match; set s-maxage to let a proxy serve briefly stale data
+    CATALOG_CACHE_CONTROL: str = os.getenv("CATALOG_CACHE_CONTROL", "public, no-cache")
+
+    # Recommendations service
+    RECOMMENDATIONS_URL: str = os.getenv("RECOMMENDATIONS_URL", "http://localhost:8001")
+    RECOMMENDATIONS_TIMEOUT_SECONDS: float = float(os.getenv("RECOMMENDATIONS_TIMEOUT_SECONDS", 15))
+    RECOMMENDATIONS_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("RECOMMENDATIONS_CONNECT_TIMEOUT_SECONDS", 2))
+    RECOMMENDATIONS_MAX_CONNECTIONS: int = int(os.getenv("RECOMMENDATIONS_MAX_CONNECTIONS", 20))
+    # Sent with X-User-Id so the service rate limits per user; must match the service's
+    RECOMMENDATIONS_SHARED_SECRET: str = os.getenv("RECOMMENDATIONS_SHARED_SECRET", "")
+    # How much order history is sent: the newest orders, then distinct item names from them
+    RECOMMENDATION_HISTORY_ORDERS: int = int(os.getenv("RECOMMENDATION_HISTORY_ORDERS", 20))
+    RECOMMENDATION_HISTORY_ITEMS: int = int(os.getenv("RECOMMENDATION_HISTORY_ITEMS", 20))
+
+    # User taste profiles
+    PROFILE_MAX_ITEMS: int = int(os.getenv("PROFILE_MAX_ITEMS", 50))
+    PROFILE_FAVORITES: int = int(os.getenv("PROFILE_FAVORITES", 5))
+
+    # Rate limiting ("<requests>/<second|minute|hour>", also the burst size)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_IP: str = os.getenv("RATE_LIMIT_IP", "1200/minute")
+    RATE_LIMIT_AUTH: str = os.getenv("RATE_LIMIT_AUTH", "10/minute")
+    RATE_LIMIT_RECOMMEND: str = os.getenv("RATE_LIMIT_RECOMMEND", "30/minute")
+    RATE_LIMIT_WRITE: str = os.getenv("RATE_LIMIT_WRITE", "120/minute")
+    RATE_LIMIT_READ: str = os.getenv("RATE_LIMIT_READ", "600/minute")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+    # Share buckets between workers, e.g. redis://localhost:6379/0
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "")
+    # Only behind a proxy that sets X-Forwarded-For; otherwise clients can spoof it
+    TRUST_PROXY_HEADERS: bool = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+    # Load shedding (0 disables a check)
+    SHED_MAX_IN_FLIGHT: int = int(os.getenv("SHED_MAX_IN_FLIGHT", 256))
+    SHED_MAX_LAG_MS: float = float(os.getenv("SHED_MAX_LAG_MS", 200))
+
+    # Event-loop monitoring
+    LOOP_LAG_INTERVAL_SECONDS: float = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", 0.1))
+    # Lag samples kept for percentiles (a minute at the default interval)
+    LOOP_LAG_WINDOW: int = int(os.getenv("LOOP_LAG_WINDOW", 600))
+    # Debug mode: capture the stack of anything blocking the loop longer than the threshold
+    LOOP_DEBUG: bool = os.getenv("LOOP_DEBUG", "false").lower() == "true"
+    LOOP_BLOCK_THRESHOLD_MS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 100))
+    LOOP_BLOCK_REPORTS: int = int(os.getenv("LOOP_BLOCK_REPORTS", 50))
+
+    # Request profiling: path prefixes always profiled (admins can also send "X-Profile: 1")
+    PROFILE_ROUTES: list = [route.strip() for route in os.getenv("PROFILE_ROUTES", "").split(",") if route.strip()]
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", 20))
+
+    # Health checks: dependencies are probed in the background and /readyz serves the results
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", 5))
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", 2))
+    HEALTH_MIN_FREE_DISK_MB: int = int(os.getenv("HEALTH_MIN_FREE_DISK_MB", 100))
+    # Report not ready once this share of SHED_MAX_IN_FLIGHT is in use, so balancers drain the worker
+    HEALTH_SATURATION_RATIO: float = float(os.getenv("HEALTH_SATURATION_RATIO", 0.9))
+
+    # Production server (python -m app.serve)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", 8000))
+    # With RATE_LIMIT_REDIS_URL, the default worker count: the CPUs this process may run on
+    # (a container often sees the host's count in os.cpu_count()), at most this many
+    SERVER_MAX_WORKERS: int = int(os.getenv("SERVER_MAX_WORKERS", 8))
+    # Worker processes (WEB_CONCURRENCY is the name most platforms set); 0 picks the default,
+    # which is a single worker unless rate limit buckets are shared through Redis
+    SERVER_WORKERS: int = int(os.getenv("WEB_CONCURRENCY") or 0)
+    # Pending connections the kernel queues while every worker is busy
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", 2048))
+    # Keep idle connections longer than the load balancer does (60 s on most), so it never reuses a closed one
+    SERVER_KEEPALIVE_SECONDS: int = int(os.getenv("SERVER_KEEPALIVE_SECONDS", 65))
+    # On SIGTERM, how long in-flight requests get to finish; with 5 s for shutdown hooks this
+    # stays inside the 30 s most orchestrators wait before killing the container
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 20))
+
 settings = Settings()
\ No newline at end of file
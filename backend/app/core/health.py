@@ -0,0 +1,181 @@
+# app/core/health.py
+"""
+Liveness and readiness.
+
+``/livez`` answers from memory: the process is up and its event loop runs.
+``/readyz`` tells load balancers whether to send this worker traffic. Its
+dependency checks (MongoDB, upload disk, the recommendations service) run
+in a background task every ``HEALTH_CHECK_INTERVAL_SECONDS``, so frequent
+probes never reach the database; the endpoint serves the cached results.
+
+A worker is ready when every critical check passed in the last round, the
+results are fresh, and it is not saturated: in-flight requests below
+``HEALTH_SATURATION_RATIO`` of ``SHED_MAX_IN_FLIGHT`` and event-loop lag
+below ``SHED_MAX_LAG_MS``. Saturation is read live, as it costs nothing.
+A failing non-critical check (the recommendations service, which has its
+own fallbacks) marks the worker "degraded" but keeps it ready.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pymongo
+
+from app.core import uploads
+from app.core.config import settings
+from app.core.ratelimit import load_shedder
+from app.core.recommendations import recommendations_client
+from app.dbConnection.mongoRepository import get_database
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CheckResult:
+    ok: bool
+    critical: bool
+    detail: str
+    latency_ms: float
+    checked_at: float
+
+
+# A check returns a short detail string, or raises when the dependency is unhealthy
+Check = Callable[[], Awaitable[str]]
+
+
+def _ping_mongo() -> str:
+    # Client-side deadline, so an unreachable server does not hold a thread for serverSelectionTimeoutMS
+    with pymongo.timeout(settings.HEALTH_CHECK_TIMEOUT_SECONDS):
+        get_database().command("ping")
+    return "connected"
+
+
+async def check_mongo() -> str:
+    return await asyncio.to_thread(_ping_mongo)
+
+
+async def check_disk() -> str:
+    directory = uploads.IMAGE_DIR
+    if not os.access(directory, os.W_OK):
+        raise RuntimeError(f"{directory} is not writable")
+    free_mb = shutil.disk_usage(directory).free // (1024 * 1024)
+    if free_mb < settings.HEALTH_MIN_FREE_DISK_MB:
+        raise RuntimeError(f"{free_mb} MB free, below {settings.HEALTH_MIN_FREE_DISK_MB} MB")
+    return f"{free_mb} MB free"
+
+
+async def check_recommendations() -> str:
+    response = await recommendations_client.client.get("/livez", timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return "reachable"
+
+
+class HealthMonitor:
+    """
+    Runs dependency checks in the background and caches their results
+
+    Args:
+        checks (Dict[str, Tuple[Check, bool]]): Name -> (check, critical)
+        interval (float): Seconds between rounds
+        timeout (float): Seconds before a check counts as failed
+        shedder: Source of the in-flight count and event-loop lag
+    """
+
+    def __init__(self, checks: Optional[Dict[str, Tuple[Check, bool]]] = None,
+                 interval: float = settings.HEALTH_CHECK_INTERVAL_SECONDS,
+                 timeout: float = settings.HEALTH_CHECK_TIMEOUT_SECONDS, shedder=load_shedder):
+        self.checks = checks if checks is not None else {
+            "mongo": (check_mongo, True),
+            "disk": (check_disk, True),
+            "recommendations": (check_recommendations, False),
+        }
+        self.interval = interval
+        self.timeout = timeout
+        self.shedder = shedder
+        self.results: Dict[str, CheckResult] = {}
+        self.last_round = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _check(self, name: str, check: Check, critical: bool) -> None:
+        start = time.perf_counter()
+        try:
+            detail, ok = await asyncio.wait_for(check(), self.timeout), True
+        except asyncio.TimeoutError:
+            detail, ok = f"timed out after {self.timeout:g}s", False
+        except Exception as e:
+            detail, ok = str(e) or type(e).__name__, False
+        previous = self.results.get(name)
+        if not ok and (previous is None or previous.ok):
+            logger.error(f"Health check {name} failed: {detail}")
+        self.results[name] = CheckResult(
+            ok=ok,
+            critical=critical,
+            detail=detail,
+            latency_ms=round((time.perf_counter() - start) * 1000, 3),
+            checked_at=time.time()
+        )
+
+    async def run_checks(self) -> None:
+        await asyncio.gather(*(
+            self._check(name, check, critical) for name, (check, critical) in self.checks.items()
+        ))
+        self.last_round = time.time()
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_checks()
+            await asyncio.sleep(self.interval)
+
+    def saturation(self) -> List[str]:
+        """Why this worker is too busy for more traffic; empty when it is not"""
+        reasons = []
+        shedder = self.shedder
+        if shedder.max_in_flight and shedder.in_flight >= settings.HEALTH_SATURATION_RATIO * shedder.max_in_flight:
+            reasons.append(f"{shedder.in_flight} of {shedder.max_in_flight} requests in flight")
+        if shedder.max_lag and shedder.monitor.lag > shedder.max_lag:
+            reasons.append(f"event loop lag {shedder.monitor.lag * 1000:.0f} ms")
+        return reasons
+
+    def readiness(self) -> Tuple[bool, dict]:
+        """Whether to route traffic here, and the report behind the answer"""
+        saturated = self.saturation()
+        if not self.last_round:
+            status = "starting"
+        elif time.time() - self.last_round > 3 * self.interval + self.timeout:
+            # The checker itself is stuck; the cached results can no longer be trusted
+            status = "stale"
+        elif any(not result.ok and result.critical for result in self.results.values()):
+            status = "unavailable"
+        elif saturated:
+            status = "saturated"
+        elif any(not result.ok for result in self.results.values()):
+            status = "degraded"
+        else:
+            status = "ready"
+        return status in ("ready", "degraded"), {
+            "status": status,
+            "checks": {name: asdict(result) for name, result in self.results.items()},
+            "saturation": saturated,
+            "in_flight": self.shedder.in_flight,
+            "lag_ms": round(self.shedder.monitor.lag * 1000, 3),
+        }
+
+
+health_monitor = HealthMonitor()
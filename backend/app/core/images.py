@@ -0,0 +1,249 @@
+# app/core/images.py
+"""
+Resized and re-encoded variants of restaurant images.
+
+After an upload, the original is queued for a background worker that writes
+thumbnails at ``IMAGE_VARIANT_WIDTHS`` in the original format plus WebP (and
+AVIF when Pillow supports it), then records them on the restaurant as
+``image_variants``. ``pick_variant`` chooses the smallest variant that fits a
+requested width in a format the client accepts.
+
+Run ``python -m app.core.images`` to backfill variants for existing images.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import warnings
+from typing import List, Optional
+
+from PIL import Image, ImageOps, features
+
+from app.core.catalog import catalog
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATIC_ROOT = "static"
+VARIANT_DIR = os.path.join(STATIC_ROOT, "restaurant_images", "variants")
+
+# Preferred order when the client accepts several formats
+FORMAT_PREFERENCE = ("avif", "webp", "jpeg", "png")
+MIME_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+EXTENSIONS = {"avif": ".avif", "webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+ENCODER_OPTIONS = {
+    "avif": {"quality": 55},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+
+def _supports(feature: str) -> bool:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            return bool(features.check(feature))
+        except Exception:
+            return False
+
+
+def variant_formats(has_alpha: bool) -> List[str]:
+    """Formats generated for an image: a compatible fallback plus modern codecs"""
+    formats = ["png" if has_alpha else "jpeg"]
+    if _supports("webp"):
+        formats.append("webp")
+    if _supports("avif"):
+        formats.append("avif")
+    return formats
+
+
+def url_to_path(url: str) -> str:
+    """Map a /static/... URL to its path on disk"""
+    return os.path.join(STATIC_ROOT, url[len("/static/"):]) if url.startswith("/static/") else url
+
+
+def path_to_url(path: str) -> str:
+    return "/" + os.path.relpath(path, ".").replace(os.sep, "/")
+
+
+def generate_variants(source_path: str, output_dir: str = VARIANT_DIR) -> List[dict]:
+    """
+    Write resized variants of an image (blocking; run in a worker thread)
+
+    Args:
+        source_path (str): The original image on disk
+        output_dir (str): Directory for the generated files
+
+    Returns:
+        list: One dict per variant with url, width, height, format and bytes
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    variants = []
+
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ("RGBA", "LA") or "transparency" in original.info
+        image = original.convert("RGBA" if has_alpha else "RGB")
+
+        # Never upscale: widths beyond the original collapse to the original width
+        widths = sorted({min(width, image.width) for width in settings.IMAGE_VARIANT_WIDTHS})
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+            for image_format in variant_formats(has_alpha):
+                path = os.path.join(output_dir, f"{stem}-{width}{EXTENSIONS[image_format]}")
+                temp_path = f"{path}.part"
+                resized.save(temp_path, format=image_format.upper(), **ENCODER_OPTIONS[image_format])
+                os.replace(temp_path, path)
+                variants.append({
+                    "url": path_to_url(path),
+                    "width": width,
+                    "height": height,
+                    "format": image_format,
+                    "bytes": os.path.getsize(path)
+                })
+
+    return variants
+
+
+def accepted_formats(accept_header: Optional[str]) -> set:
+    """Image formats a client can display, judged from its Accept header"""
+    accepted = {"jpeg", "png"}
+    accept_header = accept_header or ""
+    for image_format in ("webp", "avif"):
+        if MIME_TYPES[image_format] in accept_header:
+            accepted.add(image_format)
+    return accepted
+
+
+def pick_variant(variants: List[dict], max_width: int, accept_header: Optional[str] = None) -> Optional[dict]:
+    """
+    Choose the smallest variant that still covers the requested width
+
+    Args:
+        variants (list): The restaurant's ``image_variants``
+        max_width (int): The width the image will be displayed at
+        accept_header (Optional[str]): The client's Accept header
+
+    Returns:
+        Optional[dict]: The chosen variant, or None if none is usable
+    """
+    accepted = accepted_formats(accept_header)
+    usable = [variant for variant in variants or [] if variant["format"] in accepted]
+    if not usable:
+        return None
+
+    covering = [variant for variant in usable if variant["width"] >= max_width]
+    if covering:
+        width = min(variant["width"] for variant in covering)
+    else:
+        width = max(variant["width"] for variant in usable)
+    candidates = [variant for variant in usable if variant["width"] == width]
+    return min(candidates, key=lambda variant: (variant.get("bytes", 0), FORMAT_PREFERENCE.index(variant["format"])))
+
+
+def process_restaurant_image(db, restaurant_id: str, image_url: str) -> List[dict]:
+    """Generate variants for one restaurant image and store them on the restaurant"""
+    # Content-addressed images shared by several restaurants reuse their variants
+    existing = db["restaurants"].find_one(
+        {"image_url": image_url, "image_variants": {"$exists": True}},
+        {"_id": 0, "image_variants": 1}
+    )
+    if existing:
+        variants = existing["image_variants"]
+    else:
+        variants = generate_variants(url_to_path(image_url))
+    result = db["restaurants"].update_one(
+        {"id": restaurant_id, "image_url": image_url},
+        {"$set": {"image_variants": variants}}
+    )
+    if result.modified_count:
+        catalog.mark_changed(db, restaurant_id)
+    return variants
+
+
+class ImageProcessingQueue:
+    """
+    Bounded in-process queue drained by a background task.
+
+    Jobs are dropped (and logged) when the queue is full; the backfill CLI
+    picks up anything that was missed.
+    """
+
+    def __init__(self, maxsize: int = 100):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self, db) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def enqueue(self, restaurant_id: str, image_url: str) -> bool:
+        try:
+            self._queue.put_nowait((restaurant_id, image_url))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"Image queue full, skipping variants for restaurant {restaurant_id}")
+            return False
+
+    async def _run(self, db) -> None:
+        while True:
+            restaurant_id, image_url = await self._queue.get()
+            try:
+                await asyncio.to_thread(process_restaurant_image, db, restaurant_id, image_url)
+            except Exception as e:
+                logger.error(f"Failed to generate image variants for {restaurant_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+
+image_queue = ImageProcessingQueue()
+
+
+def backfill(db, force: bool = False) -> int:
+    """
+    Generate variants for restaurants that have an image but no variants
+
+    Args:
+        db: The MongoDB database instance
+        force (bool): Regenerate variants even if they already exist
+
+    Returns:
+        int: Number of restaurants processed
+    """
+    query = {"image_url": {"$exists": True}}
+    if not force:
+        query["image_variants"] = {"$exists": False}
+
+    processed = 0
+    for restaurant in db["restaurants"].find(query, {"_id": 0, "id": 1, "image_url": 1}):
+        try:
+            process_restaurant_image(db, restaurant["id"], restaurant["image_url"])
+            processed += 1
+        except Exception as e:
+            logger.error(f"Skipping {restaurant['id']}: {str(e)}")
+    return processed
+
+
+if __name__ == "__main__":
+    from app.dbConnection.mongoRepository import get_database
+
+    parser = argparse.ArgumentParser(description="Generate thumbnails and WebP/AVIF variants for restaurant images")
+    parser.add_argument("--force", action="store_true", help="Regenerate existing variants")
+    args = parser.parse_args()
+
+    count = backfill(get_database(), force=args.force)
+    print(f"Generated variants for {count} restaurants")
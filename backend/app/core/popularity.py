@@ -0,0 +1,255 @@
+# app/core/popularity.py
+"""
+Time-decayed popularity rankings for restaurants and dishes.
+
+Scores are exponentially decayed order counts with a configurable half-life.
+To keep refreshes incremental, every contribution is stored relative to a
+fixed reference epoch: an order placed at time t adds 2 ** ((t - epoch) / H)
+to ``score``, and the current score is ``score * 2 ** (-(now - epoch) / H)``.
+Because the decay factor is the same for every document, sorting by the
+stored ``score`` already gives the current ranking, and only orders created
+since the last refresh ever have to be read.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RANKINGS_COLLECTION = "popularity"
+STATE_COLLECTION = "popularity_state"
+STATE_ID = "refresh"
+
+RESTAURANT = "restaurant"
+DISH = "dish"
+
+# Orders are only read once they are this old, so that an order whose
+# created_at was stamped just before a refresh but inserted just after it
+# is not skipped
+INGEST_LAG = timedelta(seconds=5)
+
+# Move the reference epoch forward before 2 ** exponent gets anywhere near
+# float overflow
+REBASE_EXPONENT = 256
+
+HISTORY_START = datetime(1970, 1, 1)
+
+
+def _half_life() -> timedelta:
+    return timedelta(hours=settings.POPULARITY_HALF_LIFE_HOURS)
+
+
+def decay_factor(epoch: datetime, now: datetime) -> float:
+    """Multiplier turning a stored score into the score at ``now``"""
+    return 2 ** (-(now - epoch) / _half_life())
+
+
+def ensure_indexes(db) -> None:
+    db[RANKINGS_COLLECTION].create_index([("kind", 1), ("score", DESCENDING)])
+    db[RANKINGS_COLLECTION].create_index([("kind", 1), ("quantity", DESCENDING)])
+
+
+def _weight_expression(epoch: datetime) -> dict:
+    half_life_ms = _half_life().total_seconds() * 1000
+    return {"$pow": [2, {"$divide": [{"$subtract": ["$created_at", epoch]}, half_life_ms]}]}
+
+
+def _restaurant_pipeline(start: datetime, end: datetime, epoch: datetime) -> List[dict]:
+    return [
+        {"$match": {"created_at": {"$gt": start, "$lte": end}}},
+        {"$project": {"items": 1, "created_at": 1, "weight": _weight_expression(epoch)}},
+        {"$unwind": "$items"},
+        # A multi-restaurant order counts once for each restaurant in it
+        {"$group": {
+            "_id": {"restaurant_id": "$items.restaurant_id", "order": "$_id"},
+            "weight": {"$first": "$weight"},
+            "created_at": {"$first": "$created_at"},
+            "quantity": {"$sum": "$items.quantity"}
+        }},
+        {"$group": {
+            "_id": "$_id.restaurant_id",
+            "score": {"$sum": "$weight"},
+            "order_count": {"$sum": 1},
+            "quantity": {"$sum": "$quantity"},
+            "last_ordered_at": {"$max": "$created_at"}
+        }}
+    ]
+
+
+def _dish_pipeline(start: datetime, end: datetime, epoch: datetime) -> List[dict]:
+    return [
+        {"$match": {"created_at": {"$gt": start, "$lte": end}}},
+        {"$project": {"items": 1, "created_at": 1, "weight": _weight_expression(epoch)}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {"restaurant_id": "$items.restaurant_id", "name": "$items.name"},
+            "score": {"$sum": {"$multiply": ["$weight", "$items.quantity"]}},
+            "order_count": {"$sum": 1},
+            "quantity": {"$sum": "$items.quantity"},
+            "last_ordered_at": {"$max": "$created_at"}
+        }}
+    ]
+
+
+def _increment(key: str, fields: dict, row: dict, window_end: datetime) -> UpdateOne:
+    # An update pipeline that skips documents already holding this window, so
+    # retrying a window after a partly applied bulk write never counts twice
+    fresh = {"$lt": [{"$ifNull": ["$folded_until", HISTORY_START]}, window_end]}
+
+    def add(field: str, amount) -> dict:
+        return {"$cond": [fresh, {"$add": [{"$ifNull": [f"${field}", 0]}, amount]}, f"${field}"]}
+
+    return UpdateOne(
+        {"_id": key},
+        [{"$set": {
+            # Literal, since names and ids may start with "$"
+            **{name: {"$literal": value} for name, value in fields.items()},
+            "score": add("score", row["score"]),
+            "order_count": add("order_count", row["order_count"]),
+            "quantity": add("quantity", row["quantity"]),
+            "last_ordered_at": {"$max": ["$last_ordered_at", row["last_ordered_at"]]},
+            "folded_until": {"$max": ["$folded_until", window_end]}
+        }}],
+        upsert=True
+    )
+
+
+def refresh(db, now: datetime = None) -> int:
+    """
+    Fold orders created since the previous refresh into the rankings.
+
+    The time window is claimed with a compare-and-set on the state document,
+    so several workers running the job never count the same orders twice.
+    If folding fails, the window is handed back with its end kept as
+    ``retry_until``; the next refresh folds exactly that window again, and
+    ranking documents that already record it (``folded_until``) are skipped.
+
+    Args:
+        db: The MongoDB database instance
+        now (datetime): Current time, for tests
+
+    Returns:
+        int: Number of ranking documents updated (0 if another worker
+            claimed the window)
+    """
+    now = now or datetime.utcnow()
+    state = db[STATE_COLLECTION].find_one_and_update(
+        {"_id": STATE_ID},
+        {"$setOnInsert": {"processed_until": HISTORY_START, "epoch": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    start, epoch = state["processed_until"], state["epoch"]
+    end = state.get("retry_until") or now - INGEST_LAG
+    if end <= start:
+        return 0
+
+    new_epoch = epoch
+    if (end - epoch) / _half_life() > REBASE_EXPONENT:
+        new_epoch = end
+
+    claimed = db[STATE_COLLECTION].update_one(
+        {"_id": STATE_ID, "processed_until": start, "epoch": epoch},
+        {
+            "$set": {"processed_until": end, "epoch": new_epoch, "refreshed_at": now},
+            "$unset": {"retry_until": ""}
+        }
+    )
+    if claimed.modified_count == 0:
+        return 0
+
+    rebased = False
+    try:
+        if new_epoch != epoch:
+            db[RANKINGS_COLLECTION].update_many({}, {"$mul": {"score": decay_factor(epoch, new_epoch)}})
+            rebased = True
+        return _fold_window(db, start, end, new_epoch)
+    except Exception:
+        # Hand the same window back so the next refresh counts these orders instead
+        # of losing them; keep the new epoch only if the scores were rescaled to it
+        db[STATE_COLLECTION].update_one(
+            {"_id": STATE_ID, "processed_until": end, "epoch": new_epoch},
+            {"$set": {"processed_until": start, "epoch": new_epoch if rebased else epoch, "retry_until": end}}
+        )
+        raise
+
+
+def _fold_window(db, start: datetime, end: datetime, epoch: datetime) -> int:
+    """Add the orders created in [start, end) to the rankings"""
+    operations = []
+    for row in db["orders"].aggregate(_restaurant_pipeline(start, end, epoch)):
+        operations.append(_increment(
+            f"{RESTAURANT}:{row['_id']}",
+            {"kind": RESTAURANT, "restaurant_id": row["_id"]},
+            row,
+            end
+        ))
+    for row in db["orders"].aggregate(_dish_pipeline(start, end, epoch)):
+        restaurant_id, name = row["_id"]["restaurant_id"], row["_id"]["name"]
+        operations.append(_increment(
+            f"{DISH}:{restaurant_id}:{name}",
+            {"kind": DISH, "restaurant_id": restaurant_id, "name": name},
+            row,
+            end
+        ))
+
+    if operations:
+        db[RANKINGS_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def _current_epoch(db) -> datetime:
+    state = db[STATE_COLLECTION].find_one({"_id": STATE_ID}, {"epoch": 1})
+    return state["epoch"] if state else datetime.utcnow()
+
+
+def top(db, kind: str, limit: int = 10, by: str = "score") -> List[dict]:
+    """
+    Return the highest ranked restaurants or dishes
+
+    Args:
+        db: The MongoDB database instance
+        kind (str): ``restaurant`` or ``dish``
+        limit (int): Maximum number of entries
+        by (str): ``score`` for trending (time-decayed) or ``quantity``
+            for most ordered of all time
+
+    Returns:
+        list: Ranking entries with their current decayed score
+    """
+    factor = decay_factor(_current_epoch(db), datetime.utcnow())
+    entries = list(
+        db[RANKINGS_COLLECTION]
+        .find({"kind": kind}, {"_id": 0})
+        .sort(by, DESCENDING)
+        .limit(limit)
+    )
+    for entry in entries:
+        entry["score"] = round(entry.get("score", 0) * factor, 4)
+    return entries
+
+
+def restaurant_scores(db) -> Dict[str, float]:
+    """Map every ranked restaurant id to its (undecayed) stored score"""
+    return {
+        entry["restaurant_id"]: entry.get("score", 0)
+        for entry in db[RANKINGS_COLLECTION].find(
+            {"kind": RESTAURANT}, {"_id": 0, "restaurant_id": 1, "score": 1}
+        )
+    }
+
+
+async def run_refresh_loop(db, interval_seconds: int = settings.POPULARITY_REFRESH_SECONDS) -> None:
+    """Refresh the rankings forever, off the event loop"""
+    ensure_indexes(db)
+    while True:
+        try:
+            await asyncio.to_thread(refresh, db)
+        except Exception as e:
+            logger.error(f"Popularity refresh failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
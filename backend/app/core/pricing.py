@@ -0,0 +1,295 @@
+# app/core/pricing.py
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+CENT = Decimal("0.01")
+
+# Only the fields needed to price a cart are read from the restaurant document
+PRICE_TABLE_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "delivery_fee": 1,
+    "quantity_discounts": 1,
+    "menu.id": 1,
+    "menu.name": 1,
+    "menu.price": 1,
+    "menu.available": 1,
+}
+
+
+def to_cents(amount) -> int:
+    """
+    Convert a money amount to integer cents without float drift
+
+    Args:
+        amount: The amount as float, int, str or Decimal
+
+    Returns:
+        int: The amount in cents, rounded half up
+    """
+    return int((Decimal(str(amount)) / CENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """
+    Convert integer cents back to a float amount for JSON responses
+
+    Args:
+        cents (int): The amount in cents
+
+    Returns:
+        float: The amount in currency units
+    """
+    return float(Decimal(cents) * CENT)
+
+
+@dataclass(frozen=True)
+class PriceEntry:
+    menu_item_id: Optional[str]
+    name: str
+    unit_cents: int
+    available: bool = True
+
+
+@dataclass(frozen=True)
+class PriceTable:
+    """Immutable per-restaurant lookup of menu prices and pricing rules"""
+    restaurant_id: str
+    by_id: Dict[str, PriceEntry]
+    by_name: Dict[str, PriceEntry]
+    delivery_fee_cents: int = 0
+    # (min_quantity, percent_off) sorted by min_quantity descending
+    quantity_discounts: Tuple[Tuple[int, Decimal], ...] = ()
+
+    @classmethod
+    def from_document(cls, restaurant: dict) -> "PriceTable":
+        by_id = {}
+        by_name = {}
+        for item in restaurant.get("menu", []):
+            entry = PriceEntry(
+                menu_item_id=item.get("id"),
+                name=item["name"],
+                unit_cents=to_cents(item["price"]),
+                available=item.get("available", True),
+            )
+            if entry.menu_item_id:
+                by_id[entry.menu_item_id] = entry
+            by_name.setdefault(entry.name, entry)
+
+        delivery_fee = restaurant.get("delivery_fee")
+        if delivery_fee is None:
+            delivery_fee = settings.DEFAULT_DELIVERY_FEE
+
+        discounts = sorted(
+            (
+                (int(rule["min_quantity"]), Decimal(str(rule["percent_off"])))
+                for rule in restaurant.get("quantity_discounts") or []
+            ),
+            reverse=True,
+        )
+
+        return cls(
+            restaurant_id=restaurant["id"],
+            by_id=by_id,
+            by_name=by_name,
+            delivery_fee_cents=to_cents(delivery_fee),
+            quantity_discounts=tuple(discounts),
+        )
+
+    def lookup(self, menu_item_id: Optional[str], name: str) -> Optional[PriceEntry]:
+        """Find a menu entry by id, falling back to its name for legacy items"""
+        entry = self.by_id.get(menu_item_id) if menu_item_id else None
+        return entry or self.by_name.get(name)
+
+    def discount_percent(self, quantity: int) -> Decimal:
+        for min_quantity, percent_off in self.quantity_discounts:
+            if quantity >= min_quantity:
+                return percent_off
+        return Decimal(0)
+
+
+class PriceTableCache:
+    """
+    In-process cache of PriceTable objects keyed by restaurant id.
+
+    Entries are dropped by invalidate() whenever a restaurant or its menu is
+    written, and expire after a TTL so that writes made by other workers are
+    eventually picked up.
+    """
+
+    def __init__(self, ttl_seconds: int = settings.PRICE_TABLE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, PriceTable]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, db, restaurant_ids: Iterable[str]) -> Dict[str, PriceTable]:
+        """
+        Return price tables for the given restaurants, loading all misses
+        with a single query
+
+        Args:
+            db: The MongoDB database instance
+            restaurant_ids: The restaurant ids to look up
+
+        Returns:
+            dict: Price tables for the restaurants that exist
+        """
+        now = time.monotonic()
+        tables = {}
+        missing = []
+        with self._lock:
+            for restaurant_id in restaurant_ids:
+                cached = self._entries.get(restaurant_id)
+                if cached and now - cached[0] < self.ttl_seconds:
+                    tables[restaurant_id] = cached[1]
+                elif restaurant_id not in missing:
+                    missing.append(restaurant_id)
+
+        if missing:
+            documents = db["restaurants"].find(
+                {"id": {"$in": missing}},
+                PRICE_TABLE_PROJECTION
+            )
+            loaded = {doc["id"]: PriceTable.from_document(doc) for doc in documents}
+            with self._lock:
+                for restaurant_id, table in loaded.items():
+                    self._entries[restaurant_id] = (now, table)
+            tables.update(loaded)
+
+        return tables
+
+    def invalidate(self, restaurant_id: Optional[str] = None) -> None:
+        """Drop one restaurant's price table, or all of them if no id is given"""
+        with self._lock:
+            if restaurant_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(restaurant_id, None)
+
+
+@dataclass
+class PricedLine:
+    restaurant_id: str
+    menu_item_id: Optional[str]
+    name: str
+    quantity: int
+    unit_cents: int
+    discount_cents: int = 0
+
+    @property
+    def line_cents(self) -> int:
+        return self.unit_cents * self.quantity - self.discount_cents
+
+
+@dataclass
+class PriceQuote:
+    lines: List[PricedLine] = field(default_factory=list)
+    restaurant_ids: List[str] = field(default_factory=list)
+    delivery_fee_cents: int = 0
+
+    @property
+    def subtotal_cents(self) -> int:
+        return sum(line.unit_cents * line.quantity for line in self.lines)
+
+    @property
+    def discount_cents(self) -> int:
+        return sum(line.discount_cents for line in self.lines)
+
+    @property
+    def total_cents(self) -> int:
+        return self.subtotal_cents - self.discount_cents + self.delivery_fee_cents
+
+
+# A pricing stage adjusts a quote in place using the restaurants' price tables
+PricingStage = Callable[[PriceQuote, Dict[str, PriceTable]], None]
+
+
+def quantity_discount_stage(quote: PriceQuote, tables: Dict[str, PriceTable]) -> None:
+    """Apply each restaurant's quantity discount rules per order line"""
+    for line in quote.lines:
+        percent_off = tables[line.restaurant_id].discount_percent(line.quantity)
+        if percent_off:
+            gross = Decimal(line.unit_cents * line.quantity)
+            line.discount_cents = int(
+                (gross * percent_off / 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+            )
+
+
+def delivery_fee_stage(quote: PriceQuote, tables: Dict[str, PriceTable]) -> None:
+    """Charge one delivery fee per restaurant in the order"""
+    quote.delivery_fee_cents = sum(
+        tables[restaurant_id].delivery_fee_cents for restaurant_id in quote.restaurant_ids
+    )
+
+
+DEFAULT_PIPELINE: Tuple[PricingStage, ...] = (
+    quantity_discount_stage,
+    delivery_fee_stage,
+)
+
+
+def price_order(
+        items: Sequence,
+        tables: Dict[str, PriceTable],
+        pipeline: Sequence[PricingStage] = DEFAULT_PIPELINE
+) -> PriceQuote:
+    """
+    Price order items from the catalog in a single pass
+
+    Args:
+        items: The OrderItem objects submitted by the client
+        tables (dict): Price tables keyed by restaurant id
+        pipeline: Pricing stages applied after the base prices are resolved
+
+    Returns:
+        PriceQuote: The server-side price breakdown
+
+    Raises:
+        HTTPException: If a restaurant or menu item is unknown, unavailable,
+            or the client price no longer matches the catalog
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="Order must contain at least one item")
+
+    quote = PriceQuote()
+    for item in items:
+        table = tables.get(item.restaurant_id)
+        if table is None:
+            raise HTTPException(status_code=404,
+                                detail=f"Restaurant {item.restaurant_id} not found")
+
+        entry = table.lookup(item.menu_item_id, item.name)
+        if entry is None:
+            raise HTTPException(status_code=404,
+                                detail=f"Menu item {item.name} not found in restaurant")
+        if not entry.available:
+            raise HTTPException(status_code=400,
+                                detail=f"Menu item {item.name} is not available")
+        if to_cents(item.price) != entry.unit_cents:
+            raise HTTPException(status_code=400,
+                                detail=f"Price mismatch for {item.name}")
+
+        if item.restaurant_id not in quote.restaurant_ids:
+            quote.restaurant_ids.append(item.restaurant_id)
+        quote.lines.append(PricedLine(
+            restaurant_id=item.restaurant_id,
+            menu_item_id=entry.menu_item_id or item.menu_item_id,
+            name=entry.name,
+            quantity=item.quantity,
+            unit_cents=entry.unit_cents,
+        ))
+
+    for stage in pipeline:
+        stage(quote, tables)
+
+    return quote
+
+
+price_tables = PriceTableCache()
@@ -0,0 +1,245 @@
+# app/core/profiles.py
+"""
+Per-user taste profiles materialized from orders.
+
+One document per user in ``user_profiles`` holds running totals that are
+updated incrementally (``$inc``) whenever an order is created:
+
+- quantities per menu category
+- number of items and total spend, for the average item price
+- vegetarian items and the spiciness of rated items
+- per-item counts, trimmed to the ``PROFILE_MAX_ITEMS`` most ordered
+
+``summarize`` turns the totals into the fixed-size profile the
+recommenders score with, so they never scan a user's order history.
+``backfill`` rebuilds the documents from ``orders``.
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReplaceOne, ReturnDocument
+
+from app.core.analytics import field_key
+from app.core.config import settings
+from app.core.pricing import to_cents, from_cents
+
+logger = logging.getLogger(__name__)
+
+PROFILES_COLLECTION = "user_profiles"
+
+# Menu fields a profile is built from
+ATTRIBUTES_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "menu.id": 1,
+    "menu.name": 1,
+    "menu.category": 1,
+    "menu.is_vegetarian": 1,
+    "menu.spiciness_level": 1,
+}
+
+ItemKey = Tuple[str, str]
+
+
+def menu_attributes(db, restaurant_ids: Iterable[str]) -> Dict[ItemKey, dict]:
+    """
+    Look up category, vegetarian flag and spiciness of menu items
+
+    Args:
+        db: The MongoDB database instance
+        restaurant_ids (Iterable[str]): Restaurants to read
+
+    Returns:
+        Dict[ItemKey, dict]: Attributes keyed by (restaurant_id, menu item id)
+            and by (restaurant_id, menu item name)
+    """
+    attributes = {}
+    restaurants = db["restaurants"].find({"id": {"$in": list(set(restaurant_ids))}}, ATTRIBUTES_PROJECTION)
+    for restaurant in restaurants:
+        for item in restaurant.get("menu", []):
+            if item.get("id"):
+                attributes[(restaurant["id"], item["id"])] = item
+            attributes[(restaurant["id"], item.get("name"))] = item
+    return attributes
+
+
+def order_increments(order: dict, attributes: Dict[ItemKey, dict]) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """
+    Profile counters an order adds
+
+    Args:
+        order (dict): The order document as inserted into ``orders``
+        attributes (Dict[ItemKey, dict]): Result of ``menu_attributes``
+
+    Returns:
+        Tuple[Dict[str, int], Dict[str, str]]: ``$inc`` counters and the
+            ``$set`` item names, keyed by profile field path
+    """
+    increments: Dict[str, int] = {"order_count": 1}
+    names: Dict[str, str] = {}
+
+    def add(field: str, amount: int) -> None:
+        increments[field] = increments.get(field, 0) + amount
+
+    for line in order.get("items", []):
+        quantity = int(line.get("quantity", 1))
+        item = (
+            attributes.get((line.get("restaurant_id"), line.get("menu_item_id")))
+            or attributes.get((line.get("restaurant_id"), line.get("name")))
+            or {}
+        )
+        add("item_count", quantity)
+        add("spend_cents", to_cents(line.get("price", 0)) * quantity)
+
+        category = item.get("category")
+        if category:
+            add(f"categories.{field_key(category)}", quantity)
+        if item.get("is_vegetarian"):
+            add("vegetarian_count", quantity)
+        if item.get("spiciness_level") is not None:
+            add("spiciness_count", quantity)
+            add("spiciness_sum", int(item["spiciness_level"]) * quantity)
+
+        key = field_key(line["name"])
+        add(f"items.{key}.count", quantity)
+        names[f"items.{key}.name"] = line["name"]
+
+    return increments, names
+
+
+def _trimmed_items(items: Dict[str, dict], limit: int) -> List[str]:
+    """Keys of the least ordered items beyond the ``limit`` most ordered"""
+    ranked = sorted(items, key=lambda key: items[key].get("count", 0), reverse=True)
+    return ranked[limit:]
+
+
+def record_order(db, order: dict) -> None:
+    """
+    Add a newly created order to its user's profile
+
+    Args:
+        db: The MongoDB database instance
+        order (dict): The order document as inserted into ``orders``
+    """
+    if not order.get("user_id"):
+        return
+    attributes = menu_attributes(db, (line.get("restaurant_id") for line in order.get("items", [])))
+    increments, names = order_increments(order, attributes)
+
+    profile = db[PROFILES_COLLECTION].find_one_and_update(
+        {"_id": order["user_id"]},
+        {
+            "$inc": increments,
+            "$set": {**names, "updated_at": datetime.utcnow()}
+        },
+        upsert=True,
+        projection={"items": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+    # Keep the document fixed-size: forget the least ordered items
+    stale = _trimmed_items(profile.get("items", {}), settings.PROFILE_MAX_ITEMS)
+    if stale:
+        db[PROFILES_COLLECTION].update_one(
+            {"_id": order["user_id"]},
+            {"$unset": {f"items.{key}": "" for key in stale}}
+        )
+
+
+def get_profile(db, user_id: str) -> Optional[dict]:
+    return db[PROFILES_COLLECTION].find_one({"_id": user_id})
+
+
+def summarize(profile: Optional[dict], favorites: int = settings.PROFILE_FAVORITES) -> Optional[dict]:
+    """
+    Compact taste profile used by the recommenders
+
+    Args:
+        profile (Optional[dict]): A ``user_profiles`` document
+        favorites (int): Number of favorite items to include
+
+    Returns:
+        Optional[dict]: Category shares, average item price, vegetarian
+            ratio, spiciness tolerance and favorite items, or None for a
+            user without orders
+    """
+    if not profile or not profile.get("item_count"):
+        return None
+
+    item_count = profile["item_count"]
+    categories = profile.get("categories", {})
+    spiciness_count = profile.get("spiciness_count", 0)
+    items = profile.get("items", {})
+    ranked = sorted(items.values(), key=lambda item: (-item.get("count", 0), item.get("name", "")))
+
+    return {
+        "order_count": profile.get("order_count", 0),
+        "category_shares": {
+            category.replace("．", ".").replace("＄", "$"): round(count / item_count, 4)
+            for category, count in categories.items()
+        },
+        "average_price": round(from_cents(profile.get("spend_cents", 0)) / item_count, 2),
+        "vegetarian_ratio": round(profile.get("vegetarian_count", 0) / item_count, 4),
+        "spiciness_tolerance": (
+            round(profile["spiciness_sum"] / spiciness_count, 2) if spiciness_count else None
+        ),
+        "favorite_items": [item["name"] for item in ranked[:favorites] if item.get("name")],
+    }
+
+
+def backfill(db, user_id: Optional[str] = None) -> int:
+    """
+    Rebuild profiles from the ``orders`` collection
+
+    Profiles are replaced wholesale, so run it while the affected users are
+    not placing orders.
+
+    Args:
+        db: The MongoDB database instance
+        user_id (Optional[str]): Only rebuild this user's profile
+
+    Returns:
+        int: Number of profiles written
+    """
+    query = {"user_id": user_id} if user_id else {"user_id": {"$ne": None}}
+    orders = list(db["orders"].find(query, {"_id": 0, "user_id": 1, "items": 1}))
+    attributes = menu_attributes(
+        db, (line.get("restaurant_id") for order in orders for line in order.get("items", []))
+    )
+
+    profiles: Dict[str, dict] = {}
+    for order in orders:
+        increments, names = order_increments(order, attributes)
+        profile = profiles.setdefault(order["user_id"], {"_id": order["user_id"]})
+        for path, amount in increments.items():
+            *parents, leaf = path.split(".")
+            target = profile
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = target.get(leaf, 0) + amount
+        for path, name in names.items():
+            _, key, _ = path.split(".", 2)
+            profile["items"][key]["name"] = name
+
+    operations = []
+    for profile in profiles.values():
+        for key in _trimmed_items(profile.get("items", {}), settings.PROFILE_MAX_ITEMS):
+            del profile["items"][key]
+        profile["updated_at"] = datetime.utcnow()
+        operations.append(ReplaceOne({"_id": profile["_id"]}, profile, upsert=True))
+
+    if operations:
+        db[PROFILES_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+if __name__ == "__main__":
+    from app.dbConnection.mongoRepository import get_database
+
+    parser = argparse.ArgumentParser(description="Rebuild user taste profiles from orders")
+    parser.add_argument("--user", help="Only rebuild this user's profile")
+    args = parser.parse_args()
+    written = backfill(get_database(), args.user)
+    print(f"Rebuilt {written} user profiles")
@@ -0,0 +1,222 @@
+# app/core/profiling.py
+"""
+On-demand sampling profiles of single requests.
+
+A request is profiled when its path starts with one of ``PROFILE_ROUTES``
+or when an admin sends ``X-Profile: 1``. Requests without the header, or
+whose token lacks the ``admin`` claim, are decided without a database
+query; otherwise the claim is confirmed against the user record, so
+revoking admin rights takes effect at once rather than when the token
+expires. While it runs, a sampler thread records the event-loop thread's stack every ``PROFILE_SAMPLE_INTERVAL_MS``,
+so the profile covers everything the request does on the loop: route code,
+sync PyMongo calls, Pydantic validation, JSON serialization and
+compression (the middleware wraps the whole stack). Time spent awaiting
+I/O shows up under the event loop's ``select``.
+
+Other requests running concurrently on the same loop appear in the samples
+too, so profile on a quiet worker when the numbers matter. Only one
+request is profiled at a time.
+
+The last ``PROFILE_KEEP`` profiles are kept in memory and served in
+collapsed-stack format ("frame;frame;frame count" per line), which
+flamegraph.pl, speedscope and inferno read directly.
+"""
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.ratelimit import token_claims
+
+PROFILE_HEADER = "x-profile"
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(ROOT):
+        filename = os.path.relpath(filename, ROOT)
+    else:
+        # Keep library paths short: ".../site-packages/pymongo/cursor.py" -> "pymongo/cursor.py"
+        parts = filename.replace("\\", "/").split("/")
+        filename = "/".join(parts[-2:])
+    # Semicolons separate frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse(frame) -> str:
+    """One stack as "outermost;...;innermost" """
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+@dataclass
+class Profile:
+    id: int
+    method: str
+    path: str
+    started_at: float
+    interval_ms: float
+    status_code: Optional[int] = None
+    duration_ms: float = 0.0
+    stacks: Counter = field(default_factory=Counter)
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "samples": self.samples,
+            "interval_ms": self.interval_ms,
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    """Samples one thread's stack from a background thread until stopped"""
+
+    def __init__(self, thread_id: int, interval: float, profile: Profile):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.profile = profile
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.profile.stacks[collapse(frame)] += 1
+
+
+class ProfileStore:
+    def __init__(self, keep: int = settings.PROFILE_KEEP):
+        self.profiles: Deque[Profile] = deque(maxlen=keep)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.active = False
+
+    def begin(self, scope: Scope) -> Optional[Profile]:
+        """A new profile, or None while another request is being profiled"""
+        with self._lock:
+            if self.active:
+                return None
+            self.active = True
+        return Profile(
+            id=next(self._ids),
+            method=scope["method"],
+            path=scope["path"],
+            started_at=time.time(),
+            interval_ms=settings.PROFILE_SAMPLE_INTERVAL_MS
+        )
+
+    def finish(self, profile: Profile) -> None:
+        with self._lock:
+            self.profiles.append(profile)
+            self.active = False
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def summaries(self) -> List[dict]:
+        return [profile.summary() for profile in reversed(self.profiles)]
+
+
+def matches_routes(path: str, routes: List[str]) -> bool:
+    return any(route and path.startswith(route) for route in routes)
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when its route is enabled or an admin asks for it
+
+    Args:
+        app: The ASGI app
+        store (ProfileStore): Where finished profiles go
+        routes (List[str]): Path prefixes to always profile (defaults to ``PROFILE_ROUTES``)
+        db: Database holding ``users`` (defaults to the app database, opened on first use)
+    """
+
+    def __init__(self, app: ASGIApp, store: Optional[ProfileStore] = None,
+                 routes: Optional[List[str]] = None, db=None):
+        self.app = app
+        self.store = store or profile_store
+        self.routes = routes if routes is not None else settings.PROFILE_ROUTES
+        self.db = db
+
+    def _user_is_admin(self, email: str) -> bool:
+        if self.db is None:
+            from app.dbConnection.mongoRepository import get_database
+            self.db = get_database()
+        user = self.db["users"].find_one({"email": email}, {"is_admin": 1})
+        return bool(user and user.get("is_admin"))
+
+    async def _is_admin(self, scope: Scope) -> bool:
+        # The claim rules out most tokens for free; the user record has the final say
+        claims = token_claims(scope)
+        if not (claims and claims.get("admin") and claims.get("sub")):
+            return False
+        return await asyncio.to_thread(self._user_is_admin, claims["sub"])
+
+    async def _wanted(self, scope: Scope) -> bool:
+        if matches_routes(scope["path"], self.routes):
+            return True
+        return Headers(scope=scope).get(PROFILE_HEADER) == "1" and await self._is_admin(scope)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.store.begin(scope)
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = str(profile.id)
+            await send(message)
+
+        sampler = Sampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000, profile)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            self.store.finish(profile)
+
+
+profile_store = ProfileStore()
@@ -0,0 +1,326 @@
+# app/core/ratelimit.py
+"""
+Token-bucket rate limiting and adaptive load shedding.
+
+Rate limits apply per route class:
+
+- ``auth``: login and registration (bcrypt is deliberately slow), per client IP
+- ``recommend``: recommendation calls (each may call an LLM), per user
+- ``write``: other POST/PUT/PATCH/DELETE requests, per user
+- ``read``: everything else, per user
+
+Requests without a valid bearer token are keyed by client IP instead of
+user. Every request also draws from a per-IP bucket (``RATE_LIMIT_IP``).
+Buckets live in process memory, or in Redis when ``RATE_LIMIT_REDIS_URL``
+is set so that all workers share them. Without Redis, ``app.serve`` runs a
+single worker unless told otherwise, since each worker would enforce the
+full rates on its own. Rejected requests get 429 with ``Retry-After``.
+
+Load shedding rejects requests with 503 before they reach a route when too
+many are already in flight, and with growing probability as event-loop lag
+exceeds ``SHED_MAX_LAG_MS``. Health checks are never limited or shed.
+
+``menu-recommendations-service/app/ratelimit.py`` uses the same token
+bucket script and stores. It is a separate copy because the two apps are
+built as separate Docker contexts, and because who a request is charged to
+differs: the JWT subject here, the user the backend forwards there.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.loop_lag import lag_monitor
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; buckets stay per process
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+EXEMPT_PATHS = ("/health", "/livez", "/readyz")
+AUTH_PATHS = ("/users/token", "/users/register")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# Atomic token bucket: refill by elapsed time, then take ``cost`` if available.
+# Returns the seconds to wait (0 when allowed), as a string to keep precision.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * refill)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return tostring(wait)
+"""
+
+
+@dataclass(frozen=True)
+class Rate:
+    requests: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        """
+        Parse a rate such as "10/minute"
+
+        Args:
+            value (str): "<requests>/<second|minute|hour>"
+
+        Returns:
+            Rate: The parsed rate; its burst capacity is ``requests``
+        """
+        requests, _, unit = value.strip().partition("/")
+        return cls(int(requests), PERIODS[unit.strip().rstrip("s") or "second"])
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.requests / self.period
+
+
+class MemoryStore:
+    """Token buckets in process memory, evicting the least recently used keys"""
+
+    def __init__(self, max_keys: int = settings.RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: Rate, cost: float = 1.0) -> float:
+        """
+        Take ``cost`` tokens from a bucket
+
+        Returns:
+            float: 0 when allowed, otherwise seconds until enough tokens refill
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(rate.requests), now))
+            tokens = min(float(rate.requests), tokens + (now - updated) * rate.refill_per_second)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate.refill_per_second
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisStore:
+    """Token buckets shared by every worker through Redis"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        # Used while Redis is unreachable, so an outage does not disable limits
+        self._fallback = MemoryStore()
+
+    async def take(self, key: str, rate: Rate, cost: float = 1.0) -> float:
+        try:
+            wait = await self._script(keys=[self.prefix + key], args=[rate.requests, rate.refill_per_second, cost])
+            return float(wait)
+        except Exception as e:
+            logger.error(f"Rate limit store unavailable, limiting per process: {str(e)}")
+            return await self._fallback.take(key, rate, cost)
+
+
+def create_store():
+    if settings.RATE_LIMIT_REDIS_URL and aioredis is not None:
+        return RedisStore(settings.RATE_LIMIT_REDIS_URL)
+    if settings.RATE_LIMIT_REDIS_URL:
+        logger.error("RATE_LIMIT_REDIS_URL is set but redis is not installed; limiting per process")
+    return MemoryStore()
+
+
+def client_ip(scope: Scope) -> str:
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def token_claims(scope: Scope) -> Optional[dict]:
+    """The claims of a valid bearer token, without a database lookup"""
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return None
+
+
+def token_subject(scope: Scope) -> Optional[str]:
+    """The user of a valid bearer token, without a database lookup"""
+    claims = token_claims(scope)
+    return claims.get("sub") if claims else None
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """The rate limit class of a request, or None for exempt paths"""
+    if path in EXEMPT_PATHS:
+        return None
+    if path.rstrip("/") in AUTH_PATHS:
+        return "auth"
+    if path.startswith("/recommendations"):
+        return "recommend"
+    if method in WRITE_METHODS:
+        return "write"
+    return "read"
+
+
+class RateLimiter:
+    def __init__(self, store=None, rates: Optional[Dict[str, str]] = None):
+        self.store = store or create_store()
+        rates = rates or {
+            "ip": settings.RATE_LIMIT_IP,
+            "auth": settings.RATE_LIMIT_AUTH,
+            "recommend": settings.RATE_LIMIT_RECOMMEND,
+            "write": settings.RATE_LIMIT_WRITE,
+            "read": settings.RATE_LIMIT_READ,
+        }
+        self.rates = {name: Rate.parse(rate) for name, rate in rates.items()}
+        self.allowed = 0
+        self.limited: Dict[str, int] = {}
+
+    async def check(self, scope: Scope, request_class: str) -> float:
+        """
+        Charge a request to its buckets
+
+        Returns:
+            float: 0 when allowed, otherwise seconds the client should wait
+        """
+        ip = client_ip(scope)
+        wait = await self.store.take(f"ip:{ip}", self.rates["ip"])
+        if wait:
+            self.limited["ip"] = self.limited.get("ip", 0) + 1
+            return wait
+
+        identity = ip if request_class == "auth" else (token_subject(scope) or ip)
+        wait = await self.store.take(f"{request_class}:{identity}", self.rates[request_class])
+        if wait:
+            self.limited[request_class] = self.limited.get(request_class, 0) + 1
+            return wait
+
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self.store).__name__,
+            "allowed": self.allowed,
+            "limited": dict(self.limited),
+            "rates": {name: f"{rate.requests}/{rate.period:g}s" for name, rate in self.rates.items()},
+        }
+
+
+class LoadShedder:
+    def __init__(self, max_in_flight: int = settings.SHED_MAX_IN_FLIGHT,
+                 max_lag_ms: float = settings.SHED_MAX_LAG_MS, monitor=lag_monitor):
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag_ms / 1000
+        self.monitor = monitor
+        self.in_flight = 0
+        self.shed: Dict[str, int] = {"in_flight": 0, "lag": 0}
+
+    def reject_reason(self) -> Optional[str]:
+        """Why a new request should be shed right now, or None to admit it"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.max_lag and self.monitor.lag > self.max_lag:
+            # Shed a growing share of traffic: all of it at twice the threshold
+            if random.random() < (self.monitor.lag - self.max_lag) / self.max_lag:
+                return "lag"
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_lag_ms": self.max_lag * 1000,
+            "shed": dict(self.shed),
+            **self.monitor.stats(),
+        }
+
+
+def _too_many(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_class = route_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if request_class is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        wait = await self.limiter.check(scope, request_class)
+        if wait:
+            await _too_many(429, "Too many requests", wait)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class LoadSheddingMiddleware:
+    def __init__(self, app: ASGIApp, shedder: Optional[LoadShedder] = None):
+        self.app = app
+        self.shedder = shedder or load_shedder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.shedder.reject_reason()
+        if reason:
+            self.shedder.shed[reason] += 1
+            await _too_many(503, "Server is overloaded, try again shortly", 1)(scope, receive, send)
+            return
+
+        self.shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.in_flight -= 1
+
+
+rate_limiter = RateLimiter()
+load_shedder = LoadShedder()
@@ -0,0 +1,265 @@
+# app/core/recommendations.py
+"""
+Server-side client for the menu recommendations service.
+
+The browser used to upload the whole menu and its order history with every
+recommendation request. Instead, the backend assembles both from Mongo:
+
+- the menu is read with a projection of the fields the service prompts on
+  and cached per restaurant until the catalog version changes
+- the user's history is their taste profile (see ``app.core.profiles``);
+  users without one fall back to the distinct item names of their most
+  recent orders, read through an index on ``(user_id, created_at)``
+
+and forwards them over one pooled, keep-alive ``httpx.AsyncClient`` that
+lives for the lifetime of the application.
+"""
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from pymongo import DESCENDING
+
+from app.core.catalog import catalog
+from app.core.config import settings
+
+# Only the fields the recommendations service reads
+MENU_PROJECTION = {
+    "_id": 0,
+    "menu.name": 1,
+    "menu.price": 1,
+    "menu.description": 1,
+    "menu.category": 1,
+    "menu.is_vegetarian": 1,
+    "menu.spiciness_level": 1,
+    "menu.available": 1,
+}
+ORDER_HISTORY_PROJECTION = {"_id": 0, "items.name": 1}
+
+
+def ensure_indexes(db) -> None:
+    db["orders"].create_index([("user_id", 1), ("created_at", DESCENDING)])
+
+
+def menu_for_prompt(restaurant: dict) -> List[dict]:
+    """
+    Shape a projected restaurant document as the service's ``restaurant_menu``
+
+    Unavailable items are left out so they are never recommended.
+
+    Args:
+        restaurant (dict): Restaurant document read with ``MENU_PROJECTION``
+
+    Returns:
+        List[dict]: Menu items with the fields the service scores on
+    """
+    return [
+        {
+            "name": item["name"],
+            "price": item["price"],
+            "description": item.get("description"),
+            "category": item.get("category"),
+            "is_vegetarian": item.get("is_vegetarian"),
+            "spiciness_level": item.get("spiciness_level"),
+        }
+        for item in restaurant.get("menu") or []
+        if item.get("available", True) and "name" in item and "price" in item
+    ]
+
+
+def distinct_item_names(orders: List[dict], limit: int) -> List[str]:
+    """
+    Distinct ordered item names, most recent order first
+
+    Args:
+        orders (List[dict]): Orders read with ``ORDER_HISTORY_PROJECTION``, newest first
+        limit (int): Maximum number of names to return
+
+    Returns:
+        List[str]: Item names in order of first appearance
+    """
+    names = []
+    seen = set()
+    for order in orders:
+        for item in order.get("items") or []:
+            name = item.get("name")
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+                if len(names) >= limit:
+                    return names
+    return names
+
+
+class MenuCache:
+    """Projected menus per restaurant, valid for one catalog version"""
+
+    def __init__(self, max_entries: int = settings.CATALOG_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, List[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db, restaurant_id: str) -> Optional[List[dict]]:
+        """
+        Return a restaurant's menu as sent to the recommendations service
+
+        Args:
+            db: The MongoDB database instance
+            restaurant_id (str): The restaurant ID
+
+        Returns:
+            Optional[List[dict]]: The menu, or None if the restaurant does not exist
+        """
+        version = catalog.version(db)
+        with self._lock:
+            entry = self._entries.get(restaurant_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(restaurant_id)
+                return entry[1]
+
+        restaurant = db["restaurants"].find_one({"id": restaurant_id}, MENU_PROJECTION)
+        if restaurant is None:
+            return None
+        menu = menu_for_prompt(restaurant)
+
+        with self._lock:
+            self._entries[restaurant_id] = (version, menu)
+            self._entries.move_to_end(restaurant_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return menu
+
+
+def recent_order_items(db, user_id: str, limit: int = settings.RECOMMENDATION_HISTORY_ITEMS) -> List[str]:
+    """
+    Distinct item names from a user's most recent orders
+
+    Args:
+        db: The MongoDB database instance
+        user_id (str): The user ID
+        limit (int): Maximum number of names to return
+
+    Returns:
+        List[str]: Item names, most recently ordered first
+    """
+    orders = db["orders"].find(
+        {"user_id": user_id},
+        ORDER_HISTORY_PROJECTION
+    ).sort("created_at", DESCENDING).limit(settings.RECOMMENDATION_HISTORY_ORDERS)
+    return distinct_item_names(list(orders), limit)
+
+
+def _raise_if_busy(response: httpx.Response) -> None:
+    # Pass the service's backpressure on instead of reporting it as a failure
+    if response.status_code in (429, 503):
+        raise HTTPException(
+            status_code=503,
+            detail="Recommendations service is busy, try again shortly",
+            headers={"Retry-After": response.headers.get("retry-after", "1")}
+        )
+
+
+def _user_headers(user_id: Optional[str]) -> dict:
+    # The service keys its rate limits on the user only when the shared secret comes with it
+    if not user_id or not settings.RECOMMENDATIONS_SHARED_SECRET:
+        return {}
+    return {"X-User-Id": user_id, "X-Internal-Token": settings.RECOMMENDATIONS_SHARED_SECRET}
+
+
+class RecommendationsClient:
+    """Pooled HTTP client for the recommendations service"""
+
+    def __init__(self, base_url: str = settings.RECOMMENDATIONS_URL,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(
+                    settings.RECOMMENDATIONS_TIMEOUT_SECONDS,
+                    connect=settings.RECOMMENDATIONS_CONNECT_TIMEOUT_SECONDS
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.RECOMMENDATIONS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.RECOMMENDATIONS_MAX_CONNECTIONS
+                ),
+                transport=self.transport
+            )
+        return self._client
+
+    async def recommend(self, payload: dict, user_id: Optional[str] = None) -> dict:
+        """
+        Ask the service for a recommendation
+
+        Args:
+            payload (dict): A ``RecommendationRequest`` body
+            user_id (Optional[str]): The user asked for, so the service rate limits per user
+
+        Returns:
+            dict: The service's ``Recommendation``
+
+        Raises:
+            HTTPException: 504 on timeout, 503 if the service is shedding load or
+                rate limiting, 502 if it fails or is unreachable
+        """
+        try:
+            response = await self.client.post("/recommend/", json=payload, headers=_user_headers(user_id))
+            _raise_if_busy(response)
+            response.raise_for_status()
+            return response.json()
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Recommendations service timed out")
+        except (httpx.HTTPError, ValueError) as e:
+            raise HTTPException(status_code=502, detail=f"Recommendations service error: {str(e)}")
+
+    async def open_stream(self, payload: dict, user_id: Optional[str] = None) -> httpx.Response:
+        """
+        Start a server-sent events recommendation and return the open response
+
+        The caller must ``aclose()`` the response once the body is consumed.
+        ``user_id`` is forwarded as in ``recommend``.
+
+        Raises:
+            HTTPException: 504 on timeout, 503 if the service is busy, 502 if it fails
+        """
+        request = self.client.build_request("POST", "/recommend/stream", json=payload, headers=_user_headers(user_id))
+        try:
+            response = await self.client.send(request, stream=True)
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Recommendations service timed out")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Recommendations service error: {str(e)}")
+        if response.status_code >= 400:
+            await response.aclose()
+            _raise_if_busy(response)
+            raise HTTPException(status_code=502, detail=f"Recommendations service returned {response.status_code}")
+        return response
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def relay(response: httpx.Response) -> AsyncIterator[bytes]:
+    """Pass a streamed response body through and release its connection"""
+    try:
+        async for chunk in response.aiter_bytes():
+            yield chunk
+    except httpx.HTTPError:
+        # The service went away mid-stream; end the stream so the client sees it close
+        pass
+    finally:
+        await response.aclose()
+
+
+menu_cache = MenuCache()
+recommendations_client = RecommendationsClient()
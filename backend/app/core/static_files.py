@@ -0,0 +1,291 @@
+# app/core/static_files.py
+"""
+Static asset serving for uploaded images.
+
+``StaticAssets`` extends Starlette's StaticFiles with:
+
+- an in-memory stat cache, so repeated requests for the same file do not
+  touch the filesystem until the entry expires
+- strong ETags and Last-Modified with 304 answers for conditional requests
+- single-range ``Range`` requests (206 / 416), honouring ``If-Range``
+- precompressed ``.br`` / ``.gz`` siblings chosen by ``Accept-Encoding``
+- zero-copy responses through the ASGI ``http.response.pathsend`` extension
+  when the server offers it, falling back to chunked reads in a worker thread
+- immutable Cache-Control for content-addressed files
+"""
+import os
+import re
+import stat
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.core.compression import accepted_encodings
+from app.core.config import settings
+from app.core.uploads import CONTENT_ADDRESSED_NAME
+
+# Content-addressed files never change, so they can be cached for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Precompressed siblings in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@dataclass(frozen=True)
+class FileVariant:
+    path: str
+    size: int
+    etag: str
+
+
+@dataclass
+class AssetEntry:
+    """Everything needed to answer a request for one file without a stat call"""
+    identity: FileVariant
+    media_type: str
+    last_modified: str
+    mtime: float
+    cache_control: str
+    encoded: Dict[str, FileVariant] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+
+def _etag(digest_name: Optional[str], stat_result: os.stat_result, suffix: str = "") -> str:
+    if digest_name:
+        return f'"{digest_name}{suffix}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}{suffix}"'
+
+
+def build_entry(full_path: str, stat_result: os.stat_result) -> AssetEntry:
+    """Stat a file and its precompressed siblings (blocking)"""
+    filename = os.path.basename(full_path)
+    content_addressed = bool(CONTENT_ADDRESSED_NAME.match(filename))
+    digest_name = os.path.splitext(filename)[0] if content_addressed else None
+
+    encoded = {}
+    for encoding, extension in ENCODINGS:
+        try:
+            sibling = os.stat(full_path + extension)
+        except OSError:
+            continue
+        if stat.S_ISREG(sibling.st_mode):
+            encoded[encoding] = FileVariant(
+                path=full_path + extension,
+                size=sibling.st_size,
+                etag=_etag(digest_name, stat_result, f"-{encoding}")
+            )
+
+    return AssetEntry(
+        identity=FileVariant(path=full_path, size=stat_result.st_size, etag=_etag(digest_name, stat_result)),
+        media_type=guess_type(filename)[0] or "application/octet-stream",
+        last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+        mtime=stat_result.st_mtime,
+        cache_control=IMMUTABLE_CACHE_CONTROL if content_addressed else settings.STATIC_CACHE_CONTROL,
+        encoded=encoded,
+        loaded_at=time.monotonic()
+    )
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range
+
+    Args:
+        range_header (str): The Range header value
+        size (int): The size of the representation
+
+    Returns:
+        Optional[Tuple[int, int]]: Inclusive (start, end), or None if the
+            header is not a single byte range (the full file is served)
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+class AssetResponse(Response):
+    """Sends a file (or a byte range of it) with zero-copy when available"""
+
+    def __init__(self, variant: FileVariant, headers: dict, start: int, end: int, status_code: int = 200):
+        super().__init__(status_code=status_code, headers=headers)
+        self.variant = variant
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1 if end >= start else 0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start_message = {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        if scope["method"] == "HEAD":
+            await send(start_message)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        whole_file = self.start == 0 and self.end == self.variant.size - 1
+        if whole_file and "http.response.pathsend" in scope.get("extensions", {}):
+            await send(start_message)
+            await send({"type": "http.response.pathsend", "path": self.variant.path})
+            return
+
+        try:
+            file = await anyio.open_file(self.variant.path, mode="rb")
+        except FileNotFoundError:
+            # Deleted since it was stat-cached
+            await Response(status_code=404)(scope, receive, send)
+            return
+
+        remaining = self.end - self.start + 1
+        chunk_size = settings.STATIC_CHUNK_BYTES
+        async with file:
+            await send(start_message)
+            if self.start:
+                await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if not remaining:
+                    return
+        # Empty files, and files that shrank since they were stat-cached, still need a final message
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class StaticAssets(StaticFiles):
+    def __init__(self, *args, stat_ttl_seconds: float = settings.STATIC_STAT_TTL_SECONDS,
+                 max_entries: int = 4096, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stat_ttl_seconds = stat_ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, AssetEntry] = {}
+        self._lock = threading.Lock()
+
+    def _cached_entry(self, path: str) -> Optional[AssetEntry]:
+        entry = self._entries.get(path)
+        if entry and time.monotonic() - entry.loaded_at < self.stat_ttl_seconds:
+            return entry
+        return None
+
+    def _load_entry(self, path: str) -> Optional[AssetEntry]:
+        try:
+            full_path, stat_result = self.lookup_path(path)
+        except (OSError, ValueError):
+            # Let StaticFiles produce the proper error response
+            return None
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        entry = build_entry(full_path, stat_result)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Evict the oldest entry
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[path] = entry
+        return entry
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            entry = self._cached_entry(path)
+            if entry is None:
+                entry = await anyio.to_thread.run_sync(self._load_entry, path)
+            if entry is not None:
+                return self.asset_response(entry, scope)
+        # Directories, 404s and method errors are handled by StaticFiles
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        # Used by StaticFiles for html index files
+        return self.asset_response(build_entry(str(full_path), stat_result), scope, status_code)
+
+    def asset_response(self, entry: AssetEntry, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+
+        variant = entry.identity
+        headers = {
+            "content-type": entry.media_type,
+            "last-modified": entry.last_modified,
+            "cache-control": entry.cache_control,
+            "accept-ranges": "bytes",
+        }
+        if entry.encoded:
+            headers["vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, _ in ENCODINGS:
+                if encoding in entry.encoded and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                    variant = entry.encoded[encoding]
+                    headers["content-encoding"] = encoding
+                    break
+        headers["etag"] = variant.etag
+
+        if status_code != 200:
+            # An error page (the html 404) is sent whole, whatever the validators or Range say
+            return AssetResponse(variant, headers, 0, variant.size - 1, status_code=status_code)
+
+        if self.is_not_modified(Headers(headers=headers), request_headers):
+            return NotModifiedResponse(Headers(headers=headers))
+
+        start, end = 0, variant.size - 1
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers.get("if-range"), variant, entry):
+            try:
+                byte_range = parse_range(range_header, variant.size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={"content-range": f"bytes */{variant.size}", "accept-ranges": "bytes"}
+                )
+            if byte_range:
+                start, end = byte_range
+                headers["content-range"] = f"bytes {start}-{end}/{variant.size}"
+                return AssetResponse(variant, headers, start, end, status_code=206)
+
+        return AssetResponse(variant, headers, start, end)
+
+    @staticmethod
+    def _if_range_matches(if_range: Optional[str], variant: FileVariant, entry: AssetEntry) -> bool:
+        if not if_range:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == variant.etag
+        try:
+            return parsedate_to_datetime(if_range).timestamp() >= int(entry.mtime)
+        except (TypeError, ValueError):
+            return False
@@ -0,0 +1,343 @@
+# app/core/uploads.py
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.images import VARIANT_DIR
+
+# Bytes needed to recognise every supported image format
+SNIFF_BYTES = 32
+
+IMAGE_DIR = os.path.join("static", "restaurant_images")
+IMAGE_URL_PREFIX = "/static/restaurant_images/"
+IMAGE_REFS_COLLECTION = "image_refs"
+
+# How long an upload waits for a concurrent deletion of the same content
+IMAGE_REF_WAIT_SECONDS = 5
+# A deletion claim older than this belongs to a crashed worker
+IMAGE_DELETE_CLAIM = timedelta(seconds=60)
+
+# 16-byte BLAKE2b digests, hex encoded
+DIGEST_SIZE = 16
+
+# Originals are "<digest>.<ext>", variants "<digest>-<width>.<ext>"
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{32}(-\d+)?\.[a-z0-9]+$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Detect an image format from its leading bytes
+
+    Args:
+        head (bytes): The first bytes of the file
+
+    Returns:
+        Optional[Tuple[str, str]]: (content type, file extension), or None
+            if the bytes are not a supported image
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif", ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "image/avif", ".avif"
+    return None
+
+
+@dataclass
+class PendingImage:
+    """An upload whose content has been sniffed but not yet written to disk"""
+    upload: UploadFile
+    content_type: str
+    extension: str
+
+
+async def inspect_upload(upload: UploadFile) -> PendingImage:
+    """
+    Validate an uploaded image before anything is written
+
+    Args:
+        upload (UploadFile): The uploaded file
+
+    Returns:
+        PendingImage: The upload with its detected type
+
+    Raises:
+        HTTPException: 413 if the file is too large, 415 if it is not a
+            supported image
+    """
+    if upload.size is not None and upload.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image exceeds the {settings.MAX_UPLOAD_BYTES} byte limit"
+        )
+
+    head = await upload.read(SNIFF_BYTES)
+    await upload.seek(0)
+
+    detected = sniff_image_type(head)
+    if detected is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported image type; upload a JPEG, PNG, GIF, WebP or AVIF file"
+        )
+
+    content_type, extension = detected
+    return PendingImage(upload=upload, content_type=content_type, extension=extension)
+
+
+@dataclass
+class StoredImage:
+    """An image stored on disk under the BLAKE2 digest of its content"""
+    filename: str
+    digest: str
+    size: int
+    # True when this upload took the first reference, i.e. the content was new
+    created: bool
+
+    @property
+    def url(self) -> str:
+        return f"{IMAGE_URL_PREFIX}{self.filename}"
+
+
+def _stream_to_temp(source, directory: str, max_bytes: int, chunk_size: int) -> Tuple[str, str, int]:
+    """Copy an upload into a temporary file next to its destination; returns (path, digest, size)"""
+    # Write into the target directory so the final rename is atomic
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge()
+                hasher.update(chunk)
+                buffer.write(chunk)
+        return temp_path, hasher.hexdigest(), written
+    except BaseException:
+        _remove(temp_path)
+        raise
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def take_image_ref(db, filename: str, size: int) -> dict:
+    """
+    Take a reference on a stored image before its file is checked or written
+
+    While ``release_image`` deletes an unused image it marks the ref with
+    ``deleting``; the upsert below then conflicts on ``_id`` and is retried
+    until the deletion has finished, so a new upload never deduplicates
+    against a file that is about to disappear. Claims older than
+    ``IMAGE_DELETE_CLAIM`` (a crashed deleter) are taken over.
+
+    Returns:
+        dict: The ref after the increment
+    """
+    deadline = time.monotonic() + IMAGE_REF_WAIT_SECONDS
+    while True:
+        stale = datetime.utcnow() - IMAGE_DELETE_CLAIM
+        try:
+            return db[IMAGE_REFS_COLLECTION].find_one_and_update(
+                {"_id": filename, "$or": [{"deleting": {"$exists": False}}, {"deleting": {"$lt": stale}}]},
+                {"$inc": {"refcount": 1}, "$setOnInsert": {"size": size}, "$unset": {"deleting": ""}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _store(source, db, directory: str, extension: str, max_bytes: int, chunk_size: int) -> StoredImage:
+    temp_path, digest, size = _stream_to_temp(source, directory, max_bytes, chunk_size)
+    filename = f"{digest}{extension}"
+    try:
+        # The ref comes first: once it is held, no release can delete the file under us
+        ref = take_image_ref(db, filename, size)
+    except BaseException:
+        _remove(temp_path)
+        raise
+    destination = os.path.join(directory, filename)
+    if os.path.exists(destination):
+        _remove(temp_path)
+    else:
+        os.replace(temp_path, destination)
+    return StoredImage(filename=filename, digest=digest, size=size, created=ref["refcount"] == 1)
+
+
+async def save_upload(pending: PendingImage, db, directory: str = IMAGE_DIR) -> StoredImage:
+    """
+    Stream an upload to content-addressed storage in a worker thread
+
+    The returned image holds a reference; drop it with ``release_image``.
+
+    Args:
+        pending (PendingImage): The inspected upload
+        db: The MongoDB database instance holding the image refs
+        directory (str): Directory the image is stored in
+
+    Returns:
+        StoredImage: Where the content ended up
+    """
+    await pending.upload.seek(0)
+    try:
+        return await run_in_threadpool(
+            _store,
+            pending.upload.file,
+            db,
+            directory,
+            pending.extension,
+            settings.MAX_UPLOAD_BYTES,
+            settings.UPLOAD_CHUNK_BYTES
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image exceeds the {settings.MAX_UPLOAD_BYTES} byte limit"
+        )
+
+
+async def save_upload_with(
+        pending: PendingImage,
+        db,
+        insert: Callable[[], Any],
+        rollback: Callable[[Any], Any],
+        attach: Callable[[StoredImage], Any],
+        directory: str = IMAGE_DIR
+) -> Tuple[StoredImage, Any]:
+    """
+    Store an upload while running a blocking database insert, then attach it
+
+    The upload and the insert run concurrently off the event loop; once both
+    succeed, ``attach`` points the inserted record at the image. If any step
+    fails, everything done so far is undone: the image reference is released
+    (deleting the file if nothing else uses it) and ``rollback`` is called
+    with the insert result.
+
+    Args:
+        pending (PendingImage): The inspected upload
+        db: The MongoDB database instance holding the image refs
+        insert: Blocking callable performing the insert
+        rollback: Blocking callable undoing the insert
+        attach: Blocking callable storing the image on the inserted record
+        directory (str): Directory the image is stored in
+
+    Returns:
+        Tuple[StoredImage, Any]: The stored image and the value returned by ``insert``
+    """
+    stored, inserted = await asyncio.gather(
+        save_upload(pending, db, directory),
+        run_in_threadpool(insert),
+        return_exceptions=True
+    )
+
+    error = next((result for result in (stored, inserted) if isinstance(result, BaseException)), None)
+    if error is None:
+        try:
+            await run_in_threadpool(attach, stored)
+            return stored, inserted
+        except Exception as e:
+            error = e
+    if not isinstance(inserted, BaseException):
+        await run_in_threadpool(rollback, inserted)
+    if not isinstance(stored, BaseException):
+        await run_in_threadpool(release_image, db, stored.url, directory)
+    raise error
+
+
+def attach_image(db, restaurant_id: str, stored: StoredImage) -> None:
+    """
+    Point a restaurant at a stored image
+
+    Args:
+        db: The MongoDB database instance
+        restaurant_id (str): The restaurant using the image
+        stored (StoredImage): The stored image, whose reference the restaurant now owns
+    """
+    result = db["restaurants"].update_one(
+        {"id": restaurant_id},
+        {"$set": {"image_url": stored.url, "image_digest": stored.digest}}
+    )
+    if result.matched_count == 0:
+        raise LookupError(f"Restaurant {restaurant_id} disappeared before its image was attached")
+
+
+def release_image(db, image_url: Optional[str], directory: str = IMAGE_DIR) -> bool:
+    """
+    Drop a reference on a stored image, deleting it and its variants when unused
+
+    Images stored before content addressing are not reference counted and
+    are left alone. Deletion is claimed on the ref document first, so an
+    upload of the same content waits for it instead of reusing the file.
+
+    Args:
+        db: The MongoDB database instance
+        image_url (Optional[str]): The image URL a deleted restaurant pointed at
+        directory (str): Directory the image is stored in
+
+    Returns:
+        bool: True if the file was deleted
+    """
+    if not image_url or not image_url.startswith(IMAGE_URL_PREFIX):
+        return False
+    filename = image_url[len(IMAGE_URL_PREFIX):]
+    if not CONTENT_ADDRESSED_NAME.match(filename):
+        return False
+
+    refs = db[IMAGE_REFS_COLLECTION]
+    ref = refs.find_one_and_update(
+        {"_id": filename},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if ref is None or ref["refcount"] > 0:
+        return False
+    # Re-check under the claim: an upload may have taken a new reference since the decrement
+    claim = datetime.utcnow()
+    claimed = refs.update_one(
+        {"_id": filename, "refcount": {"$lte": 0}, "deleting": {"$exists": False}},
+        {"$set": {"deleting": claim}}
+    )
+    if claimed.modified_count == 0:
+        return False
+
+    digest = os.path.splitext(filename)[0]
+    paths = [os.path.join(directory, filename)]
+    paths += glob.glob(os.path.join(VARIANT_DIR, f"{digest}-*"))
+    for path in paths:
+        _remove(path)
+    refs.delete_one({"_id": filename, "deleting": claim})
+    return True
@@ -15,24 +15,28 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # MongoDB connection details
-MONGO_URI = os.getenv("MONGO_URI", "")
+# An unset or empty MONGO_URI (docker-compose passes "") means a local server; PyMongo rejects an empty host
+MONGO_URI = os.getenv("MONGO_URI") or "mongodb://localhost:27017"
 DATABASE_NAME = os.getenv("DATABASE_NAME", "BiteMeDB")
 
+# One client per process, shared by every router and request
+_client = None
+
+
 def get_mongo_client():
     """
-    Establish a connection to the MongoDB server.
+    Get the process-wide MongoDB client, creating it on first use.
+
+    The client is created with ``connect=False``, so this does no network
+    I/O: importing a module that holds a database handle stays cheap, and the
+    first query (or ``ping_database``) opens the connection pool.
     Returns:
         MongoClient: The MongoDB client instance.
-    Raises:
-        ConnectionFailure: If the connection to MongoDB fails.
     """
-    try:
-        client = MongoClient(MONGO_URI)
-        client.admin.command('ping')  # Verify connection
-        return client
-    except ConnectionFailure as e:
-        logger.error(f"Failed to connect to MongoDB: {e}")
-        raise
+    global _client
+    if _client is None:
+        _client = MongoClient(MONGO_URI, connect=False)
+    return _client
 
 def get_database():
     """
@@ -43,6 +47,31 @@ def get_database():
     client = get_mongo_client()
     return client[DATABASE_NAME]
 
+def ping_database():
+    """
+    Verify that MongoDB is reachable.
+    Raises:
+        ConnectionFailure: If the connection to MongoDB fails.
+    """
+    try:
+        get_mongo_client().admin.command('ping')
+    except ConnectionFailure as e:
+        logger.error(f"Failed to connect to MongoDB: {e}")
+        raise
+
+def close_mongo_client():
+    """
+    Close the process-wide client's connections at shutdown.
+
+    The next ``get_mongo_client`` creates a new client. PyMongo clients
+    cannot be reopened, so database handles obtained earlier must not be
+    used afterwards.
+    """
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
 def insert_item(collection_name, item):
     """
     Insert a single document into the specified collection.
@@ -1,11 +1,13 @@
 # app/main.py
 import logging
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from fastapi import File, UploadFile, Form
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import asyncio
+from contextlib import asynccontextmanager
 
 
 # Configure logging
@@ -21,21 +23,76 @@ logging.getLogger("pymongo").setLevel(logging.ERROR)
 logging.getLogger("motor").setLevel(logging.ERROR)
 
 from app.core.config import settings
-from app.dbConnection.mongoRepository import get_database
+from app.dbConnection.mongoRepository import close_mongo_client, get_database, ping_database
+from app.core import images, popularity, uploads
+from app.core.analytics import ensure_indexes as ensure_analytics_indexes
+from app.core.static_files import StaticAssets
+from app.core.compression import CompressionMiddleware
+from app.core.recommendations import ensure_indexes as ensure_recommendation_indexes, recommendations_client
+from app.core.ratelimit import LoadSheddingMiddleware, RateLimitMiddleware
+from app.core.loop_lag import lag_monitor
+from app.core.health import health_monitor
+from app.core.profiling import ProfilingMiddleware
 
 # Import routers
-from app.api import orders, restaurants, users, admin
+from app.api import orders, restaurants, users, admin, analytics, recommendations, monitoring
+
+# Get database instance; no connection is made until startup or the first query
+db = get_database()
+
+# Background jobs started with the application
+background_tasks = []
+
+
+def prepare_storage() -> None:
+    """Connect to MongoDB, create indexes and the upload directories"""
+    ping_database()
+    ensure_analytics_indexes(db)
+    ensure_recommendation_indexes(db)
+    os.makedirs(uploads.IMAGE_DIR, exist_ok=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown
+
+    All I/O happens here rather than at import, so importing the app (tests,
+    each worker process) is fast and does not need a database.
+    """
+    logging.info("Application is starting up...")
+    await asyncio.to_thread(prepare_storage)
+    background_tasks.append(asyncio.create_task(popularity.run_refresh_loop(db)))
+    images.image_queue.start(db)
+    lag_monitor.start()
+    health_monitor.start()
+
+    yield
+
+    logging.info("Application is shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await images.image_queue.stop()
+    await recommendations_client.aclose()
+    await health_monitor.stop()
+    await lag_monitor.stop()
+    close_mongo_client()
 
-os.makedirs("static", exist_ok=True)
-os.makedirs("static/restaurant_images", exist_ok=True)
 
 app = FastAPI(
     title="BiteMe Food Delivery API",
     description="A comprehensive food delivery API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
+# Throttle per client and shed load under pressure; added before CORS so
+# rejections still carry CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+app.add_middleware(LoadSheddingMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -46,58 +103,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Get database instance
-db = get_database()
+# Compress JSON and text responses above COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
+# Profile requests on demand; outermost, so profiles include compression
+app.add_middleware(ProfilingMiddleware)
 
 
 # Mount static files
-static_dir = os.path.abspath("static")
-app.mount("/static", StaticFiles(directory="static", html=True), name="static")
+# The directory is created at startup, so it may not exist yet at import
+app.mount("/static", StaticAssets(directory="static", html=True, check_dir=False), name="static")
 
 
 # Include routers
 app.include_router(orders.router, prefix="/orders", tags=["orders"])
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
+app.include_router(analytics.router, prefix="/admin", tags=["analytics"])
+app.include_router(monitoring.router, prefix="/admin", tags=["monitoring"])
 app.include_router(restaurants.router, prefix="/restaurants", tags=["restaurants"])  # Fixed missing parenthesis
+app.include_router(recommendations.router, prefix="/recommendations", tags=["recommendations"])
 
-@app.get("/static/{path:path}")
-async def read_static(path: str):
-    print(f"Requested static path: {path}")
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"Static directory exists: {os.path.exists('static')}")
-    print(f"Full static path: {os.path.abspath('static')}")
-    print(f"Requested file exists: {os.path.exists(os.path.join('static', path))}")
 # Root endpoint
 @app.get("/")
 async def root():
     return {"message": "Welcome to BiteMe!"}
 
-# Health check endpoint
+# Liveness: no I/O, so a slow database never gets a healthy worker restarted
+@app.get("/livez")
+async def liveness():
+    return {"status": "alive"}
+
+# Readiness: cached dependency checks plus live saturation; 503 drains the worker
+@app.get("/readyz")
+async def readiness():
+    ready, report = health_monitor.readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+# Kept for existing probes; same answer as /readyz
 @app.get("/health")
 async def health_check():
-    try:
-        db.command("ping")
-        return {
-            "status": "healthy",
-            "database": "connected"
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Service unhealthy: {str(e)}"
-        )
-
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    logging.info("Application is starting up...")
-
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    logging.info("Application is shutting down...")
+    return await readiness()
 
+# Development server with auto-reload; production runs `python -m app.serve`
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
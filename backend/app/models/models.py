@@ -22,6 +22,19 @@ class OrderStatus(str, Enum):
     DELIVERED = "DELIVERED"
     CANCELLED = "CANCELLED"
 
+class RestaurantSort(str, Enum):
+    POPULARITY = "popularity"
+    RATING = "rating"
+    NAME = "name"
+
+class RankingKind(str, Enum):
+    RESTAURANTS = "restaurants"
+    DISHES = "dishes"
+
+    @property
+    def ranking_kind(self) -> str:
+        return "restaurant" if self is RankingKind.RESTAURANTS else "dish"
+
 class MenuItem(BaseModel):
     name: str
     description: str
@@ -33,6 +46,12 @@ class MenuItem(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class QuantityDiscount(BaseModel):
+    min_quantity: int = Field(gt=1)
+    percent_off: float = Field(gt=0, lt=100)
+
+    model_config = ConfigDict(from_attributes=True)
+
 class Restaurant(BaseModel):
     id: Optional[str] = None
     name: str
@@ -41,6 +60,8 @@ class Restaurant(BaseModel):
     address: str
     description: Optional[str] = None
     menu: List[MenuItem] = []
+    delivery_fee: Optional[float] = Field(None, ge=0)
+    quantity_discounts: List[QuantityDiscount] = []
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -70,7 +91,11 @@ class Order(BaseModel):
     user_id: Optional[str] = None
     restaurant_id: Optional[str] = None
     items: List[OrderItem]
-    total_price: float = Field(gt=0)
+    # Computed by the server from the catalog; client values are ignored
+    subtotal: Optional[float] = None
+    discount_total: Optional[float] = None
+    delivery_fee: Optional[float] = None
+    total_price: Optional[float] = Field(None, gt=0)
     status: OrderStatus = OrderStatus.PENDING
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -81,7 +106,7 @@ class Order(BaseModel):
 
     @validator('total_price')
     def validate_total_price(cls, v):
-        if v <= 0:
+        if v is not None and v <= 0:
             raise ValueError('Total price must be positive')
         return v
 
@@ -143,4 +168,9 @@ class ReviewCreate(BaseModel):
 class Review(ReviewCreate):
     id: str
     user_id: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RecommendationQuery(BaseModel):
+    user_preference: Optional[str] = Field(None, max_length=500)
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,207 @@
+"""
+Production server: a pre-forking supervisor around uvicorn workers.
+
+    python -m app.serve [app.main:app]
+
+The supervisor imports the app once, binds the listening socket with
+``SERVER_BACKLOG``, then forks ``SERVER_WORKERS`` (``WEB_CONCURRENCY``)
+workers that share the socket, so the kernel spreads connections between
+them. By default there is one worker per usable CPU when rate limit
+buckets are shared through ``RATE_LIMIT_REDIS_URL``, and a single worker
+otherwise: per-process buckets give each worker the full rates, so N
+workers would let a client through at up to N times the configured
+limits. Setting ``WEB_CONCURRENCY`` without Redis accepts that, with a
+warning. Importing the app does no I/O, and its MongoDB client is created
+with ``connect=False``, so every worker opens its own connection pool after
+the fork, during its own startup. Workers use uvloop and httptools when
+installed (``uvicorn[standard]``).
+
+On SIGTERM or SIGINT the supervisor tells every worker to stop accepting
+connections and finish in-flight requests; workers still running after
+``SERVER_GRACEFUL_TIMEOUT_SECONDS`` (plus a few seconds for shutdown hooks)
+are killed. A worker that dies is replaced; one that fails to start (for
+example, MongoDB is unreachable) stops the whole server, as retrying would
+only fail the same way.
+"""
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from app.core.config import settings
+from app.core.ratelimit import MemoryStore, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Exit code of a worker whose app failed to start (uvicorn's own STARTUP_FAILURE)
+WORKER_BOOT_ERROR = 3
+# Time for shutdown hooks after the graceful timeout, before workers are killed
+SHUTDOWN_HOOKS_SECONDS = 5
+
+
+def usable_cpus() -> int:
+    # A container often sees the host's count in os.cpu_count()
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count(configured: int, shared_buckets: bool, cpus: int,
+                 max_workers: int = settings.SERVER_MAX_WORKERS) -> int:
+    """
+    Number of workers to fork
+
+    Args:
+        configured (int): ``SERVER_WORKERS``; 0 picks the default
+        shared_buckets (bool): Whether rate limit buckets are shared between workers
+        cpus (int): CPUs this process may run on
+        max_workers (int): Upper bound of the default
+
+    Returns:
+        int: ``configured`` if set, else one per CPU (at most ``max_workers``)
+            with shared buckets and 1 without
+    """
+    if configured > 0:
+        return configured
+    return max(1, min(cpus, max_workers)) if shared_buckets else 1
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # proto must be IPPROTO_TCP: asyncio only sets TCP_NODELAY on accepted sockets that say so,
+    # and without it Nagle's algorithm and delayed ACKs add ~40 ms to every keep-alive response
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket) -> int:
+    """Serve on the inherited socket until told to stop; returns the exit code"""
+    config = uvicorn.Config(
+        app,
+        loop="auto",
+        http="auto",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        log_level="error",
+        access_log=False,
+    )
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return 0 if server.started else WORKER_BOOT_ERROR
+
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.exit_code = 0
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        # Worker: leave the supervisor's process group so a terminal Ctrl-C reaches
+        # only the supervisor, which then stops each worker exactly once
+        code = 1
+        try:
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # Forked workers would otherwise share the supervisor's random state (load shedding draws)
+            random.seed()
+            code = run_worker(self.app, self.sock)
+        except SystemExit as e:
+            # uvicorn exits with 3 when the app's startup fails
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception("Worker crashed")
+        finally:
+            os._exit(code)
+
+    def stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGTERM)
+        signal.alarm(settings.SERVER_GRACEFUL_TIMEOUT_SECONDS + SHUTDOWN_HOOKS_SECONDS)
+
+    def kill(self, signum, frame) -> None:
+        logger.error(f"Workers {sorted(self.children)} did not stop in time; killing them")
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGKILL)
+
+    def _signal(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def run(self) -> int:
+        if threading.active_count() > 1:
+            # fork() copies only the calling thread; locks held by others stay locked forever
+            logger.error("Threads were started before forking workers; importing the app must not start any")
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGALRM, self.kill)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        while self.children:
+            pid, status = os.wait()
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == WORKER_BOOT_ERROR:
+                logger.error(f"Worker {pid} failed to start; shutting down")
+                self.exit_code = 1
+                self.stop(None, None)
+                continue
+            logger.error(f"Worker {pid} exited with {code}; starting a replacement")
+            if time.monotonic() - started < 1:
+                time.sleep(1)  # do not spin if workers keep dying
+            self.spawn()
+        return self.exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked uvicorn workers")
+    parser.add_argument("app", nargs="?", default="app.main:app", help="ASGI app as module:attribute")
+    args = parser.parse_args()
+
+    # Preload once; workers inherit the imported app instead of importing it again
+    app = import_from_string(args.app)
+    shared_buckets = not isinstance(rate_limiter.store, MemoryStore)
+    workers = worker_count(settings.SERVER_WORKERS, shared_buckets, usable_cpus())
+    if workers > 1 and not shared_buckets:
+        logger.warning(
+            f"RATE_LIMIT_REDIS_URL is not set: each of {workers} workers keeps its own rate limit buckets, "
+            f"so clients may get up to {workers} times the configured rates"
+        )
+    sock = bind_socket(settings.SERVER_HOST, settings.SERVER_PORT, settings.SERVER_BACKLOG)
+    sys.exit(Supervisor(app, sock, workers).run())
+
+
+if __name__ == "__main__":
+    main()
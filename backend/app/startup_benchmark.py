@@ -0,0 +1,66 @@
+"""
+Benchmark cold start: importing the app and serving the first request.
+
+    python -m app.startup_benchmark [--runs 5] [--path /] [--lifespan]
+
+Every run is a fresh interpreter, so module caches do not carry over
+(bytecode caches do, as they would for a restarted worker). Without
+``--lifespan`` no database is needed: the request goes straight to the
+app, which is what test collection and import-time checks see. With it,
+startup (MongoDB ping, indexes, background jobs) is timed as well.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in the child interpreter; prints one JSON line of timings in ms
+CHILD = """
+import json, sys, time
+path, lifespan = sys.argv[1], sys.argv[2] == "1"
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+timings = {"import_ms": (imported - start) * 1000}
+if lifespan:
+    before = time.perf_counter()
+    client.__enter__()
+    timings["startup_ms"] = (time.perf_counter() - before) * 1000
+for label in ("first_request_ms", "second_request_ms"):
+    before = time.perf_counter()
+    status = client.get(path).status_code
+    timings[label] = (time.perf_counter() - before) * 1000
+timings["status"] = status
+if lifespan:
+    client.__exit__(None, None, None)
+print(json.dumps(timings))
+"""
+
+
+def measure(path: str, lifespan: bool) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, path, "1" if lifespan else "0"],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int, path: str, lifespan: bool) -> None:
+    samples = [measure(path, lifespan) for _ in range(runs)]
+    print(f"{runs} cold starts, GET {path} -> {samples[-1]['status']}")
+    for key in ("import_ms", "startup_ms", "first_request_ms", "second_request_ms"):
+        values = [sample[key] for sample in samples if key in sample]
+        if values:
+            print(f"  {key:<18} median {statistics.median(values):8.1f}   max {max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--lifespan", action="store_true", help="Also time startup; needs MongoDB")
+    args = parser.parse_args()
+    run(args.runs, args.path, args.lifespan)
@@ -0,0 +1,130 @@
+"""
+Benchmark requests per second: single uvicorn process vs. ``app.serve``.
+
+    python -m app.throughput_benchmark [--workers 4] [--path /livez] [--duration 10]
+
+Starts the app the way the Docker image used to (``uvicorn app.main:app``,
+one process), then with ``python -m app.serve`` and ``--workers`` workers,
+and drives each with keep-alive HTTP/1.1 GETs from ``--clients`` load
+processes holding ``--connections`` connections in total. Both servers need
+whatever the app's startup needs (MongoDB for ``app.main``). Run the load on
+other cores than the server, or on another machine, for numbers that mean
+anything: on a single core, workers only add context switches.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, Tuple
+
+
+async def _connection(host: str, port: int, path: str, deadline: float, latencies: List[float]) -> int:
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    errors = 0
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors += 1
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            errors += 1
+            writer = None
+    if writer is not None:
+        writer.close()
+    return errors
+
+
+def _load(host: str, port: int, path: str, connections: int, duration: float) -> Tuple[List[float], int]:
+    async def run():
+        latencies: List[float] = []
+        deadline = time.perf_counter() + duration
+        errors = await asyncio.gather(*(
+            _connection(host, port, path, deadline, latencies) for _ in range(connections)
+        ))
+        return latencies, sum(errors)
+    return asyncio.run(run())
+
+
+def _wait_until_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer 200 within {timeout:g}s")
+
+
+def measure(label: str, command: List[str], env: dict, args) -> None:
+    server = subprocess.Popen(command, env=env)
+    try:
+        _wait_until_ready(f"http://{args.host}:{args.port}{args.ready_path}")
+        per_client = max(1, args.connections // args.clients)
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.starmap(
+                _load, [(args.host, args.port, args.path, per_client, args.duration)] * args.clients
+            )
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    latencies = sorted(latency for client, _ in results for latency in client)
+    errors = sum(count for _, count in results)
+    if not latencies:
+        print(f"{label:<28} no successful requests ({errors} errors)")
+        return
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    print(
+        f"{label:<28} {len(latencies) / args.duration:9.0f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms   errors {errors}"
+    )
+
+
+def run(args) -> None:
+    env = {**os.environ, "SERVER_HOST": args.host, "SERVER_PORT": str(args.port)}
+    print(f"GET {args.path} for {args.duration:g}s, {args.connections} connections, {os.cpu_count()} CPUs")
+    measure(
+        "uvicorn, 1 process",
+        [sys.executable, "-m", "uvicorn", args.app, "--host", args.host, "--port", str(args.port), "--log-level", "error"],
+        env, args
+    )
+    measure(
+        f"app.serve, {args.workers} workers",
+        [sys.executable, "-m", "app.serve", args.app],
+        {**env, "WEB_CONCURRENCY": str(args.workers)}, args
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--path", default="/livez")
+    parser.add_argument("--ready-path", default="/livez")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    run(parser.parse_args())
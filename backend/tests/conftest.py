@@ -6,6 +6,9 @@ from fastapi.testclient import TestClient
 import uuid
 from datetime import datetime
 
+# The suite logs in far more often than the auth rate limit allows
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
 # Add the app directory to Python path
 backend_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(backend_dir))
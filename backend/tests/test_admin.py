@@ -259,4 +259,23 @@ def test_admin_delete_restaurant(test_client, admin_headers):
         print("Response Content:", response.text)
 
     assert response.status_code == 200, "Failed to delete restaurant"
-    assert "successfully" in response.json()["message"].lower()
\ No newline at end of file
+    assert "successfully" in response.json()["message"].lower()
+
+
+def test_admin_profiles_request(test_client, admin_headers, auth_headers):
+    """Test on-demand request profiling for admins only"""
+    response = test_client.get("/restaurants/", headers={**admin_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profiles = test_client.get("/admin/monitoring/profiles", headers=admin_headers).json()
+    assert any(str(profile["id"]) == profile_id for profile in profiles)
+
+    collapsed = test_client.get(f"/admin/monitoring/profiles/{profile_id}", headers=admin_headers)
+    assert collapsed.status_code == 200
+    assert collapsed.headers["content-type"].startswith("text/plain")
+
+    # Regular users cannot trigger profiles or read them
+    response = test_client.get("/restaurants/", headers={**auth_headers, "X-Profile": "1"})
+    assert "X-Profile-Id" not in response.headers
+    assert test_client.get("/admin/monitoring/profiles", headers=auth_headers).status_code == 403
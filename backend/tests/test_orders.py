@@ -78,4 +78,55 @@ def test_get_user_orders(test_client, auth_headers):
     """Test retrieving user's orders"""
     response = test_client.get("/orders/", headers=auth_headers)
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
\ No newline at end of file
+    assert isinstance(response.json(), list)
+
+def test_create_order_uses_server_side_total(test_client, auth_headers):
+    """Test that the order total is computed from the catalog, not the client"""
+    img = Image.new('RGB', (100, 100), color = 'red')
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format='JPEG')
+    img_bytes.seek(0)
+
+    restaurant_response = test_client.post(
+        "/restaurants/add",
+        data={
+            "name": f"Test Restaurant {uuid.uuid4().hex[:6]}",
+            "cuisine_type": "Italian",
+            "rating": "4.5",
+            "address": "123 Test St",
+            "description": "Test Description"
+        },
+        files={'image': ('test.jpg', img_bytes, 'image/jpeg')},
+        headers=auth_headers
+    )
+    restaurant = restaurant_response.json()["restaurant"]
+
+    menu_response = test_client.post(
+        f"/restaurants/{restaurant['id']}/add-item",
+        data={
+            "name": "Test Pizza",
+            "description": "A test pizza",
+            "price": "19.99",
+            "category": "Italian"
+        },
+        headers=auth_headers
+    )
+    menu_item_id = menu_response.json()["menu_item"]["id"]
+
+    order_data = {
+        "items": [
+            {
+                "menu_item_id": menu_item_id,
+                "restaurant_id": restaurant["id"],
+                "name": "Test Pizza",
+                "quantity": 3,
+                "price": 19.99
+            }
+        ],
+        "total_price": 0.01
+    }
+
+    response = test_client.post("/orders/", json=order_data, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["subtotal"] == 59.97
+    assert response.json()["total_price"] == pytest.approx(59.97 + response.json()["delivery_fee"])
@@ -0,0 +1,92 @@
+# tests/test_recommendations.py
+import io
+import json
+import uuid
+
+import httpx
+from PIL import Image
+
+from app.core.config import settings
+from app.core.recommendations import recommendations_client
+
+
+def _create_restaurant_with_order(test_client, auth_headers):
+    img_bytes = io.BytesIO()
+    Image.new('RGB', (100, 100), color='red').save(img_bytes, format='JPEG')
+    img_bytes.seek(0)
+
+    restaurant = test_client.post(
+        "/restaurants/add",
+        data={
+            "name": f"Test Restaurant {uuid.uuid4().hex[:6]}",
+            "cuisine_type": "Italian",
+            "rating": "4.5",
+            "address": "123 Test St",
+            "description": "Test Description"
+        },
+        files={'image': ('test.jpg', img_bytes, 'image/jpeg')},
+        headers=auth_headers
+    ).json()["restaurant"]
+
+    menu_item = test_client.post(
+        f"/restaurants/{restaurant['id']}/add-item",
+        data={"name": "Test Pizza", "description": "A test pizza", "price": "12.5", "category": "Italian"},
+        headers=auth_headers
+    ).json()["menu_item"]
+
+    test_client.post("/orders/", json={
+        "id": f"order_{uuid.uuid4().hex[:8]}",
+        "items": [{
+            "menu_item_id": menu_item["id"],
+            "restaurant_id": restaurant["id"],
+            "name": "Test Pizza",
+            "quantity": 1,
+            "price": 12.5
+        }],
+        "total_price": 12.5
+    }, headers=auth_headers)
+    return restaurant
+
+
+def test_recommendation_built_server_side(test_client, auth_headers, monkeypatch):
+    """Test that the backend sends the menu and taste profile to the service"""
+    restaurant = _create_restaurant_with_order(test_client, auth_headers)
+    sent = []
+    user_ids = []
+    tokens = []
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        user_ids.append(request.headers.get("x-user-id"))
+        tokens.append(request.headers.get("x-internal-token"))
+        return httpx.Response(200, json={"recommended_items": ["Test Pizza"], "reasoning": "You liked it"})
+
+    monkeypatch.setattr(recommendations_client, "transport", httpx.MockTransport(handler))
+    monkeypatch.setattr(recommendations_client, "_client", None)
+    monkeypatch.setattr(settings, "RECOMMENDATIONS_SHARED_SECRET", "backend-secret")
+
+    response = test_client.post(
+        f"/recommendations/{restaurant['id']}",
+        json={"user_preference": "pizza"},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["recommended_items"] == ["Test Pizza"]
+
+    payload = sent[0]
+    assert user_ids[0]
+    assert tokens[0] == "backend-secret"
+    assert payload["restaurant_id"] == restaurant["id"]
+    assert payload["restaurant_menu"][0]["name"] == "Test Pizza"
+    assert payload["restaurant_menu"][0]["spiciness_level"] == 1
+    assert payload["restaurant_menu"][0]["is_vegetarian"] is False
+    assert payload["user_previous_orders"] == ["Test Pizza"]
+    assert payload["user_profile"]["favorite_items"] == ["Test Pizza"]
+    assert payload["user_profile"]["category_shares"] == {"Italian": 1.0}
+    assert payload["user_preference"] == "pizza"
+
+
+def test_recommendation_unknown_restaurant(test_client, auth_headers):
+    """Test recommending for a restaurant that does not exist"""
+    response = test_client.post("/recommendations/missing", json={}, headers=auth_headers)
+    assert response.status_code == 404
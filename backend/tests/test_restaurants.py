@@ -0,0 +1,171 @@
+# tests/test_restaurants.py
+import io
+import uuid
+import pytest
+from PIL import Image
+
+
+def test_get_restaurants_sorted_by_rating(test_client):
+    """Test the sort option on the restaurant list"""
+    response = test_client.get("/restaurants/", params={"sort": "rating"})
+    assert response.status_code == 200
+    ratings = [restaurant.get("rating", 0) for restaurant in response.json()]
+    assert ratings == sorted(ratings, reverse=True)
+
+def test_get_restaurants_rejects_unknown_sort(test_client):
+    """Test that an unknown sort option is rejected"""
+    response = test_client.get("/restaurants/", params={"sort": "random"})
+    assert response.status_code == 422
+
+def test_get_trending(test_client):
+    """Test trending restaurants and dishes"""
+    for kind in ("restaurants", "dishes"):
+        response = test_client.get("/restaurants/trending", params={"kind": kind, "limit": 5})
+        assert response.status_code == 200
+        assert len(response.json()) <= 5
+
+def test_get_most_ordered(test_client):
+    """Test most ordered restaurants"""
+    response = test_client.get("/restaurants/most-ordered")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+def test_add_restaurant_rejects_non_image(test_client):
+    """Test that uploads are validated by content, not by filename"""
+    files = {
+        'image': ('test.jpg', b"definitely not an image", 'image/jpeg')
+    }
+    restaurant_data = {
+        "name": "Test Restaurant Upload",
+        "cuisine_type": "Italian",
+        "rating": "4.5",
+        "address": "123 Test St"
+    }
+
+    response = test_client.post("/restaurants/add", data=restaurant_data, files=files)
+    assert response.status_code == 415
+
+def test_identical_images_are_stored_once(test_client, admin_headers):
+    """Test content-addressed image storage and immutable caching"""
+    img = Image.new('RGB', (100, 100), color = 'blue')
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format='JPEG')
+
+    image_urls = []
+    for _ in range(2):
+        response = test_client.post(
+            "/restaurants/add",
+            data={
+                "name": f"Test Restaurant {uuid.uuid4().hex[:6]}",
+                "cuisine_type": "Italian",
+                "rating": "4.5",
+                "address": "123 Test St"
+            },
+            files={'image': ('test.jpg', io.BytesIO(img_bytes.getvalue()), 'image/jpeg')},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        image_urls.append(response.json()["restaurant"]["image_url"])
+
+    assert image_urls[0] == image_urls[1]
+
+    image_response = test_client.get(image_urls[0])
+    assert image_response.status_code == 200
+    assert "immutable" in image_response.headers["cache-control"]
+
+    cached_response = test_client.get(
+        image_urls[0],
+        headers={"If-None-Match": image_response.headers["etag"]}
+    )
+    assert cached_response.status_code == 304
+
+def test_restaurant_list_conditional_get(test_client):
+    """Test ETag revalidation of the restaurant list"""
+    response = test_client.get("/restaurants/")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "cache-control" in response.headers
+
+    cached_response = test_client.get("/restaurants/", headers={"If-None-Match": etag})
+    assert cached_response.status_code == 304
+    assert cached_response.headers["etag"] == etag
+
+def test_restaurant_etag_changes_after_update(test_client):
+    """Test that a write invalidates the restaurant's ETag"""
+    created = test_client.post(
+        "/restaurants/add",
+        data={
+            "name": f"Test Restaurant {uuid.uuid4().hex[:6]}",
+            "cuisine_type": "Italian",
+            "rating": "4.0",
+            "address": "123 Test St"
+        },
+        files={'image': ('test.png', _png_bytes(), 'image/png')}
+    )
+    assert created.status_code == 200
+    restaurant_id = created.json()["restaurant"]["id"]
+
+    response = test_client.get(f"/restaurants/{restaurant_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    test_client.put(
+        f"/restaurants/{restaurant_id}",
+        data={"name": "Test Restaurant Renamed", "cuisine_type": "Italian", "rating": "4.0", "address": "123 Test St"}
+    )
+
+    response = test_client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Test Restaurant Renamed"
+    assert response.headers["etag"] != etag
+
+def test_get_restaurant_not_found(test_client):
+    """Test reading a restaurant that does not exist"""
+    response = test_client.get(f"/restaurants/{uuid.uuid4()}")
+    assert response.status_code == 404
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), color='red').save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer
+
+def test_get_restaurant_filters_menu(test_client):
+    """Test server-side menu filtering on the restaurant detail endpoint"""
+    created = test_client.post(
+        "/restaurants/add",
+        data={
+            "name": f"Test Restaurant {uuid.uuid4().hex[:6]}",
+            "cuisine_type": "Italian",
+            "rating": "4.0",
+            "address": "123 Test St"
+        },
+        files={'image': ('test.png', _png_bytes(), 'image/png')}
+    )
+    restaurant_id = created.json()["restaurant"]["id"]
+
+    for name, price, vegetarian, spiciness in (("Margherita", 9.0, True, 1), ("Diavola", 14.0, False, 4)):
+        response = test_client.post(
+            f"/restaurants/{restaurant_id}/add-item",
+            data={
+                "name": name,
+                "description": "Pizza",
+                "price": str(price),
+                "category": "Italian",
+                "spiciness_level": str(spiciness),
+                "is_vegetarian": str(vegetarian).lower()
+            }
+        )
+        assert response.status_code == 200
+
+    response = test_client.get(f"/restaurants/{restaurant_id}")
+    assert len(response.json()["menu"]) == 2
+
+    response = test_client.get(f"/restaurants/{restaurant_id}", params={"is_vegetarian": "true"})
+    assert [item["name"] for item in response.json()["menu"]] == ["Margherita"]
+
+    response = test_client.get(f"/restaurants/{restaurant_id}", params={"min_price": 10, "max_spiciness": 5})
+    assert [item["name"] for item in response.json()["menu"]] == ["Diavola"]
+
+    response = test_client.get(f"/restaurants/{restaurant_id}", params={"min_price": 20, "max_price": 10})
+    assert response.status_code == 400
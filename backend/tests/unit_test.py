@@ -28,4 +28,746 @@ def test_order_model_validation():
     invalid_order = valid_order.copy()
     invalid_order["total_price"] = -10.0
     with pytest.raises(ValueError):
-        Order(**invalid_order)
\ No newline at end of file
+        Order(**invalid_order)
+
+
+def test_to_cents_avoids_float_drift():
+    """Test money conversion to integer cents"""
+    from app.core.pricing import to_cents, from_cents
+
+    assert to_cents(0.1) + to_cents(0.2) == to_cents(0.3)
+    assert to_cents(19.999) == 2000
+    assert from_cents(to_cents(45.0) * 3) == 135.0
+
+
+def test_price_order_applies_pipeline():
+    """Test server-side pricing with quantity discounts and delivery fees"""
+    from fastapi import HTTPException
+    from app.core.pricing import PriceTable, price_order
+    from app.models.models import OrderItem
+
+    tables = {
+        "rest_1": PriceTable.from_document({
+            "id": "rest_1",
+            "delivery_fee": 5.0,
+            "quantity_discounts": [{"min_quantity": 3, "percent_off": 10}],
+            "menu": [{"id": "pizza", "name": "Test Pizza", "price": 45.0}]
+        }),
+        "rest_2": PriceTable.from_document({
+            "id": "rest_2",
+            "delivery_fee": 2.5,
+            "menu": [{"name": "Test Sushi", "price": 12.1}]
+        }),
+    }
+    items = [
+        OrderItem(menu_item_id="pizza", restaurant_id="rest_1", name="Test Pizza", quantity=3, price=45.0),
+        OrderItem(menu_item_id="x", restaurant_id="rest_2", name="Test Sushi", quantity=2, price=12.1),
+    ]
+
+    quote = price_order(items, tables)
+    assert quote.subtotal_cents == 13500 + 2420
+    assert quote.discount_cents == 1350
+    assert quote.delivery_fee_cents == 750
+    assert quote.total_cents == 13500 + 2420 - 1350 + 750
+
+    # Stale client prices are rejected
+    items[1].price = 11.0
+    with pytest.raises(HTTPException):
+        price_order(items, tables)
+
+
+def test_analytics_summarize():
+    """Test turning a daily stats document into a report"""
+    from app.core.analytics import summarize
+
+    stats = {
+        "restaurant_id": "rest_1",
+        "day": "2025-01-01",
+        "order_count": 4,
+        "revenue_cents": 10000,
+        "items": {
+            "Pizza": {"name": "Pizza", "quantity": 5, "revenue_cents": 7500},
+            "Salad": {"name": "Salad", "quantity": 2, "revenue_cents": 2500}
+        },
+        "status_counts": {"PENDING": 3, "DELIVERED": 1}
+    }
+
+    report = summarize(stats, top_n=1)
+    assert report["revenue"] == 100.0
+    assert report["average_basket"] == 25.0
+    assert [item["name"] for item in report["top_items"]] == ["Pizza"]
+    assert report["status_counts"]["PENDING"] == 3
+
+
+def test_analytics_backfill_deletes_stale_days():
+    """Test that a backfill drops days that no longer have orders"""
+    import mongomock
+    from datetime import datetime
+    from app.core import analytics
+
+    db = mongomock.MongoClient().db
+    db["orders"].insert_one({
+        "created_at": datetime(2025, 1, 1, 9), "status": "PENDING",
+        "items": [{"restaurant_id": "rest_1", "name": "Pizza", "quantity": 1, "price": 10.0}]
+    })
+    db[analytics.STATS_COLLECTION].insert_many([
+        {"restaurant_id": "rest_1", "day": "2025-01-01", "order_count": 1},
+        {"restaurant_id": "rest_1", "day": "2025-01-02", "order_count": 1},
+    ])
+
+    # The whole day of ``since`` is rebuilt, even though its orders were all deleted
+    assert analytics.backfill(db, since=datetime(2025, 1, 2, 10)) == 0
+    assert [stats["day"] for stats in db[analytics.STATS_COLLECTION].find()] == ["2025-01-01"]
+
+
+def test_update_order_status_to_current_status(monkeypatch):
+    """Test that repeating an order's status succeeds without moving the status funnel"""
+    import asyncio
+    import mongomock
+    from datetime import datetime
+    from fastapi import HTTPException
+    from app.api import orders
+    from app.core import analytics
+    from app.models.models import OrderStatus, User
+
+    db = mongomock.MongoClient().db
+    order_id = "65a000000000000000000001"
+    db["orders"].insert_one({
+        "id": order_id, "user_id": "user_1", "status": "PENDING", "created_at": datetime(2025, 1, 1, 9),
+        "items": [{"restaurant_id": "rest_1", "name": "Pizza", "quantity": 1, "price": 10.0}]
+    })
+    db[analytics.STATS_COLLECTION].insert_one(
+        {"restaurant_id": "rest_1", "day": "2025-01-01", "status_counts": {"PENDING": 1}}
+    )
+    user = User(id="user_1", email="user@example.com", full_name="User")
+
+    def update(order_id, status, current_user=user):
+        return asyncio.run(orders.update_order_status(order_id, status, current_user))
+
+    monkeypatch.setattr(orders, "db", db)
+    assert update(order_id, OrderStatus.PENDING)["message"] == "Order status updated successfully"
+    assert db[analytics.STATS_COLLECTION].find_one()["status_counts"] == {"PENDING": 1}
+
+    update(order_id, OrderStatus.CONFIRMED)
+    assert db[analytics.STATS_COLLECTION].find_one()["status_counts"] == {"PENDING": 0, "CONFIRMED": 1}
+
+    other_user = User(id="user_2", email="other@example.com", full_name="Other")
+    with pytest.raises(HTTPException) as error:
+        update(order_id, OrderStatus.DELIVERED, other_user)
+    assert error.value.status_code == 404
+
+
+def test_popularity_decay_factor():
+    """Test that popularity scores halve every half-life"""
+    from datetime import datetime, timedelta
+    from app.core.config import settings
+    from app.core.popularity import decay_factor
+
+    epoch = datetime(2025, 1, 1)
+    half_life = timedelta(hours=settings.POPULARITY_HALF_LIFE_HOURS)
+    assert decay_factor(epoch, epoch) == 1
+    assert decay_factor(epoch, epoch + half_life) == pytest.approx(0.5)
+    assert decay_factor(epoch, epoch + 3 * half_life) == pytest.approx(0.125)
+
+
+def test_popularity_refresh_returns_window_on_failure():
+    """Test that a failed refresh hands its window back instead of losing the orders"""
+    from datetime import datetime
+    from app.core import popularity
+
+    now = datetime(2025, 1, 1, 12)
+    state = {"_id": popularity.STATE_ID, "processed_until": datetime(2025, 1, 1, 11), "epoch": now}
+
+    class StateCollection:
+        def find_one_and_update(self, filter, update, upsert, return_document):
+            return dict(state)
+
+        def update_one(self, filter, update):
+            matched = all(state.get(key) == value for key, value in filter.items())
+            if matched:
+                state.update(update["$set"])
+            return type("Result", (), {"modified_count": int(matched)})()
+
+    class Orders:
+        def aggregate(self, pipeline):
+            raise RuntimeError("aggregation failed")
+
+    db = {popularity.STATE_COLLECTION: StateCollection(), "orders": Orders()}
+
+    with pytest.raises(RuntimeError):
+        popularity.refresh(db, now=now)
+    assert state["processed_until"] == datetime(2025, 1, 1, 11)
+    assert state["epoch"] == now
+
+
+def test_popularity_retry_skips_partly_applied_writes(monkeypatch):
+    """Test that a window retried after a partly applied bulk write counts every order once"""
+    import mongomock
+    from datetime import datetime
+    from pymongo.errors import BulkWriteError
+    from app.core import popularity
+
+    db = mongomock.MongoClient().db
+    rankings = db[popularity.RANKINGS_COLLECTION]
+    db["orders"].insert_many([
+        {"created_at": datetime(2025, 1, 1, 10), "items": [{"restaurant_id": "rest_1", "name": "Pizza", "quantity": 2}]},
+        {"created_at": datetime(2025, 1, 1, 11), "items": [{"restaurant_id": "rest_2", "name": "Sushi", "quantity": 1}]},
+    ])
+    failures = [1]
+
+    def bulk_write(operations, ordered):
+        # mongomock's bulk_write predates current PyMongo operations, so apply them one at a time;
+        # the first attempt fails after its first write
+        for number, operation in enumerate(operations):
+            if failures and number == failures[0]:
+                failures.clear()
+                raise BulkWriteError({"writeErrors": [{"index": number, "code": 6, "errmsg": "host unreachable"}]})
+            rankings.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+
+    monkeypatch.setattr(rankings, "bulk_write", bulk_write)
+    now = datetime(2025, 1, 1, 12)
+
+    with pytest.raises(BulkWriteError):
+        popularity.refresh(db, now=now)
+    assert popularity.refresh(db, now=datetime(2025, 1, 1, 13)) == 4
+
+    counts = {entry["_id"]: entry["order_count"] for entry in rankings.find()}
+    assert counts == {"restaurant:rest_1": 1, "restaurant:rest_2": 1, "dish:rest_1:Pizza": 1, "dish:rest_2:Sushi": 1}
+    state = db[popularity.STATE_COLLECTION].find_one()
+    assert state["processed_until"] == now - popularity.INGEST_LAG
+    assert "retry_until" not in state
+
+def test_sniff_image_type():
+    """Test image type detection from leading bytes"""
+    from app.core.uploads import sniff_image_type
+
+    assert sniff_image_type(b"\xff\xd8\xff\xe0" + b"\x00" * 28) == ("image/jpeg", ".jpg")
+    assert sniff_image_type(b"\x89PNG\r\n\x1a\n" + b"\x00" * 24) == ("image/png", ".png")
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ("image/webp", ".webp")
+    assert sniff_image_type(b"<?php echo 'hi'; ?>") is None
+
+
+def test_image_refs_protect_deduplicated_files(tmp_path, monkeypatch):
+    """Test that image files are only deleted once no upload holds a reference"""
+    import asyncio
+    import io
+    import mongomock
+    from pymongo.errors import DuplicateKeyError
+    from starlette.datastructures import UploadFile
+    from app.core import uploads
+
+    monkeypatch.setattr(uploads, "IMAGE_REF_WAIT_SECONDS", 0.1)
+    db = mongomock.MongoClient().db
+    refs = db[uploads.IMAGE_REFS_COLLECTION]
+    content = b"\x89PNG\r\n\x1a\n" + b"pixels" * 10
+
+    first = uploads._store(io.BytesIO(content), db, str(tmp_path), ".png", 1024, 16)
+    second = uploads._store(io.BytesIO(content), db, str(tmp_path), ".png", 1024, 16)
+    assert first.created and not second.created
+    assert refs.find_one({"_id": first.filename})["refcount"] == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == [first.filename]
+
+    assert not uploads.release_image(db, first.url, str(tmp_path))
+    assert (tmp_path / first.filename).exists()
+
+    # A deletion in progress makes new references wait rather than reuse the file
+    refs.update_one({"_id": first.filename}, {"$set": {"deleting": uploads.datetime.utcnow()}})
+    with pytest.raises(DuplicateKeyError):
+        uploads.take_image_ref(db, first.filename, len(content))
+    refs.update_one({"_id": first.filename}, {"$unset": {"deleting": ""}})
+
+    assert uploads.release_image(db, second.url, str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+    assert refs.count_documents({}) == 0
+
+    # A failed attach rolls back the insert and releases the new file
+    rolled_back = []
+
+    def attach(stored):
+        raise LookupError("restaurant vanished")
+
+    pending = uploads.PendingImage(
+        upload=UploadFile(io.BytesIO(content), filename="logo.png"), content_type="image/png", extension=".png"
+    )
+    with pytest.raises(LookupError):
+        asyncio.run(uploads.save_upload_with(
+            pending, db, insert=lambda: "inserted", rollback=rolled_back.append, attach=attach,
+            directory=str(tmp_path)
+        ))
+    assert rolled_back == ["inserted"]
+    assert list(tmp_path.iterdir()) == []
+    assert refs.count_documents({}) == 0
+
+
+def test_pick_image_variant():
+    """Test choosing the smallest image variant for a width and Accept header"""
+    from app.core.images import pick_variant
+
+    variants = [
+        {"url": "/a-320.jpg", "width": 320, "format": "jpeg", "bytes": 900},
+        {"url": "/a-320.webp", "width": 320, "format": "webp", "bytes": 300},
+        {"url": "/a-640.jpg", "width": 640, "format": "jpeg", "bytes": 2000},
+        {"url": "/a-640.webp", "width": 640, "format": "webp", "bytes": 700},
+    ]
+
+    assert pick_variant(variants, 300, "image/webp,*/*")["url"] == "/a-320.webp"
+    assert pick_variant(variants, 300, "text/html")["url"] == "/a-320.jpg"
+    assert pick_variant(variants, 500, "image/webp")["url"] == "/a-640.webp"
+    assert pick_variant(variants, 2000, None)["url"] == "/a-640.jpg"
+    assert pick_variant([], 320) is None
+
+
+def test_content_addressed_names():
+    """Test which static file names are treated as immutable"""
+    from app.core.uploads import CONTENT_ADDRESSED_NAME
+
+    assert CONTENT_ADDRESSED_NAME.match("0123456789abcdef0123456789abcdef.jpg")
+    assert CONTENT_ADDRESSED_NAME.match("0123456789abcdef0123456789abcdef-320.webp")
+    assert not CONTENT_ADDRESSED_NAME.match("0f8fad5b-d9cb-469f-a165-70867728950e.jpg")
+
+
+def test_parse_range():
+    """Test byte range parsing for static assets"""
+    from app.core.static_files import parse_range
+
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_range("bytes=900-", 1000) == (900, 999)
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=0-5000", 1000) == (0, 999)
+    assert parse_range("bytes=0-1,5-9", 1000) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=1000-", 1000)
+
+
+def test_static_assets_edge_cases(tmp_path):
+    """Test empty files, refused encodings and html 404 pages in static assets"""
+    import gzip
+    from fastapi.testclient import TestClient
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from app.core.static_files import StaticAssets
+
+    (tmp_path / "empty.txt").write_bytes(b"")
+    (tmp_path / "page.txt").write_bytes(b"plain text")
+    (tmp_path / "page.txt.gz").write_bytes(gzip.compress(b"plain text"))
+    (tmp_path / "404.html").write_bytes(b"<h1>Not here</h1>")
+    client = TestClient(Starlette(routes=[
+        Mount("/files", StaticAssets(directory=str(tmp_path))),
+        Mount("/site", StaticAssets(directory=str(tmp_path), html=True)),
+    ]))
+
+    response = client.get("/files/empty.txt")
+    assert response.status_code == 200
+    assert response.content == b""
+
+    assert client.get("/files/page.txt", headers={"accept-encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    refused = client.get("/files/page.txt", headers={"accept-encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in refused.headers
+    assert refused.content == b"plain text"
+
+    missing = client.get("/site/missing.html")
+    assert missing.status_code == 404
+    assert missing.content == b"<h1>Not here</h1>"
+
+
+def test_negotiate_encoding():
+    """Test Accept-Encoding negotiation for compressed responses"""
+    from app.core.compression import available_encodings, negotiate
+
+    preferred = available_encodings()[0]
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("gzip;q=0, br;q=0") is None
+    assert negotiate("gzip, deflate, br") == preferred
+    assert negotiate("*") == preferred
+
+
+def test_compression_middleware():
+    """Test that only large, compressible responses are compressed"""
+    import gzip
+    import json
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    from fastapi.testclient import TestClient
+    from app.core.compression import CompressionMiddleware
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    async def large():
+        return {"items": ["dish"] * 200}
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    client = TestClient(app)
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == {"items": ["dish"] * 200}
+    # The client decodes transparently; check that the bytes sent are gzip
+    with client.stream("GET", "/large", headers={"Accept-Encoding": "gzip"}) as streamed:
+        raw = b"".join(streamed.iter_raw())
+    assert json.loads(gzip.decompress(raw)) == {"items": ["dish"] * 200}
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "ok"
+
+
+def test_menu_filter_expression():
+    """Test the server-side menu filter"""
+    from app.core.catalog import menu_filter
+
+    assert menu_filter() is None
+
+    expression = menu_filter(category="Italian", is_vegetarian=True, max_price=20)
+    conditions = expression["$filter"]["cond"]["$and"]
+    assert {"$eq": ["$$item.category", "Italian"]} in conditions
+    assert {"$eq": ["$$item.is_vegetarian", True]} in conditions
+    assert {"$lte": ["$$item.price", 20]} in conditions
+    assert len(conditions) == 3
+
+
+def test_recommendation_history_and_menu():
+    """Test the order history and menu sent to the recommendations service"""
+    from app.core.recommendations import distinct_item_names, menu_for_prompt
+
+    orders = [
+        {"items": [{"name": "Ramen"}, {"name": "Gyoza"}]},
+        {"items": [{"name": "Gyoza"}, {"name": "Sushi"}]},
+        {"items": [{"name": "Udon"}]},
+    ]
+    assert distinct_item_names(orders, limit=10) == ["Ramen", "Gyoza", "Sushi", "Udon"]
+    assert distinct_item_names(orders, limit=2) == ["Ramen", "Gyoza"]
+
+    menu = menu_for_prompt({"menu": [
+        {"name": "Ramen", "price": 12.0, "category": "Japanese", "available": True},
+        {"name": "Sold Out", "price": 9.0, "available": False},
+    ]})
+    assert menu == [{
+        "name": "Ramen", "price": 12.0, "description": None, "category": "Japanese",
+        "is_vegetarian": None, "spiciness_level": None
+    }]
+
+
+def test_recommendations_client_errors():
+    """Test that service failures map to gateway errors"""
+    import asyncio
+    import httpx
+    from fastapi import HTTPException
+    from app.core.recommendations import RecommendationsClient
+
+    def handler(request):
+        if request.url.path == "/recommend/":
+            return httpx.Response(200, json={"recommended_items": ["Ramen"], "reasoning": "ok"})
+        return httpx.Response(500)
+
+    async def run():
+        client = RecommendationsClient("http://recommendations", transport=httpx.MockTransport(handler))
+        try:
+            result = await client.recommend({"restaurant_menu": []})
+            with pytest.raises(HTTPException) as error:
+                await client.open_stream({"restaurant_menu": []})
+            return result, error.value.status_code
+        finally:
+            await client.aclose()
+
+    result, status_code = asyncio.run(run())
+    assert result["recommended_items"] == ["Ramen"]
+    assert status_code == 502
+
+
+
+def test_compose_points_backend_at_recommendations_service():
+    """Test that the backend container is told where the recommendations service is"""
+    from pathlib import Path
+    from urllib.parse import urlsplit
+    import yaml
+
+    compose = yaml.safe_load((Path(__file__).resolve().parents[2] / "docker-compose.yml").read_text())
+    environment = dict(entry.split("=", 1) for entry in compose["services"]["backend"]["environment"])
+
+    # Unset, the backend falls back to localhost, which is the backend container itself
+    url = urlsplit(environment.get("RECOMMENDATIONS_URL", ""))
+    assert url.hostname not in (None, "localhost", "127.0.0.1", "backend")
+    assert url.hostname in compose["services"]
+    assert any(port.endswith(f":{url.port}") for port in compose["services"][url.hostname]["ports"])
+
+def test_taste_profile_from_orders():
+    """Test that order counters summarize into a fixed-size taste profile"""
+    from app.core.profiles import order_increments, summarize
+
+    attributes = {
+        ("rest_1", "1"): {"name": "Paneer Tikka", "category": "Indian", "is_vegetarian": True, "spiciness_level": 2},
+        ("rest_1", "Lamb Curry"): {"name": "Lamb Curry", "category": "Indian", "spiciness_level": 4},
+    }
+    order = {"items": [
+        {"menu_item_id": "1", "restaurant_id": "rest_1", "name": "Paneer Tikka", "quantity": 3, "price": 10.0},
+        {"menu_item_id": None, "restaurant_id": "rest_1", "name": "Lamb Curry", "quantity": 1, "price": 14.0},
+    ]}
+    increments, names = order_increments(order, attributes)
+    assert increments["item_count"] == 4
+    assert increments["spend_cents"] == 4400
+    assert increments["categories.Indian"] == 4
+    assert increments["vegetarian_count"] == 3
+    assert increments["spiciness_sum"] == 10
+    assert names["items.Paneer Tikka.name"] == "Paneer Tikka"
+
+    profile = summarize({
+        "order_count": 1, "item_count": 4, "spend_cents": 4400, "categories": {"Indian": 4},
+        "vegetarian_count": 3, "spiciness_count": 4, "spiciness_sum": 10,
+        "items": {"Paneer Tikka": {"name": "Paneer Tikka", "count": 3}, "Lamb Curry": {"name": "Lamb Curry", "count": 1}},
+    })
+    assert profile["category_shares"] == {"Indian": 1.0}
+    assert profile["average_price"] == 11.0
+    assert profile["vegetarian_ratio"] == 0.75
+    assert profile["spiciness_tolerance"] == 2.5
+    assert profile["favorite_items"] == ["Paneer Tikka", "Lamb Curry"]
+    assert summarize(None) is None
+
+
+def test_rate_limit_middleware():
+    """Test per-class token buckets and the 429 response"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.ratelimit import MemoryStore, RateLimiter, RateLimitMiddleware, route_class
+
+    assert route_class("POST", "/users/token") == "auth"
+    assert route_class("POST", "/recommendations/r1") == "recommend"
+    assert route_class("DELETE", "/orders/1") == "write"
+    assert route_class("GET", "/restaurants/") == "read"
+    assert route_class("GET", "/health") is None
+
+    limiter = RateLimiter(MemoryStore(), rates={
+        "ip": "100/minute", "auth": "2/minute", "recommend": "1/minute", "write": "5/minute", "read": "5/minute"
+    })
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+
+    @app.post("/users/token")
+    async def login():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert [client.post("/users/token").status_code for _ in range(3)] == [200, 200, 429]
+    response = client.post("/users/token")
+    assert int(response.headers["retry-after"]) >= 1
+    assert all(client.get("/health").status_code == 200 for _ in range(10))
+    assert limiter.stats()["limited"]["auth"] == 2
+
+
+def test_load_shedding():
+    """Test that load is shed on in-flight requests and loop lag"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.loop_lag import LagMonitor
+    from app.core.ratelimit import LoadShedder, LoadSheddingMiddleware
+
+    monitor = LagMonitor()
+    shedder = LoadShedder(max_in_flight=1, max_lag_ms=100, monitor=monitor)
+    app = FastAPI()
+    app.add_middleware(LoadSheddingMiddleware, shedder=shedder)
+
+    @app.get("/")
+    async def root():
+        return {"in_flight": shedder.in_flight}
+
+    client = TestClient(app)
+    assert client.get("/").json() == {"in_flight": 1}
+
+    shedder.in_flight = 1
+    assert client.get("/").status_code == 503
+    shedder.in_flight = 0
+
+    monitor.record(0.25)
+    assert client.get("/").status_code == 503
+    assert shedder.stats()["shed"] == {"in_flight": 1, "lag": 1}
+
+
+def test_blocking_call_detector():
+    """Test that a route blocking the event loop is reported with its stack"""
+    import time
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.loop_lag import LagMonitor
+
+    monitor = LagMonitor(interval=0.01, debug=True)
+    monitor.detector.threshold = 0.05
+    app = FastAPI()
+
+    @app.on_event("startup")
+    async def startup():
+        monitor.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await monitor.stop()
+
+    @app.get("/slow/{item_id}")
+    async def slow(item_id: str):
+        time.sleep(0.2)
+        return {"item_id": item_id}
+
+    with TestClient(app) as client:
+        assert client.get("/slow/1").status_code == 200
+        time.sleep(0.05)
+
+    report = monitor.blocking_stats()
+    assert report["blocked"] >= 1
+    assert report["routes"]["GET /slow/{item_id}"]["max_ms"] >= 150
+    assert any("time.sleep" in line for line in report["reports"][0]["stack"])
+    assert monitor.stats()["max_lag_ms"] >= 100
+
+
+def test_profiling_middleware():
+    """Test that enabled routes are profiled into collapsed stacks"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.profiling import ProfileStore, ProfilingMiddleware
+
+    import mongomock
+
+    db = mongomock.MongoClient().db
+    db["users"].insert_many([
+        {"email": "admin@example.com", "is_admin": True},
+        {"email": "revoked@example.com", "is_admin": False},
+    ])
+    store = ProfileStore(keep=2)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=store, routes=["/busy"], db=db)
+
+    def crunch():
+        return sum(i * i for i in range(2_000_000))
+
+    @app.get("/busy")
+    async def busy():
+        return {"total": crunch()}
+
+    @app.get("/other")
+    async def other():
+        return {"ok": True}
+
+    client = TestClient(app)
+    response = client.get("/busy")
+    assert response.headers["x-profile-id"] == "1"
+    assert "x-profile-id" not in client.get("/other", headers={"X-Profile": "1"}).headers
+
+    profile = store.get(1)
+    assert profile.summary()["status_code"] == 200
+    assert profile.samples > 0
+    lines = profile.collapsed().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("crunch (tests/unit_test.py" in line for line in lines)
+
+    # X-Profile is honoured for admin tokens whose user is still an admin
+    from app.core.security import create_access_token
+    for email, admin, profiled in (
+            ("admin@example.com", True, True),
+            ("admin@example.com", False, False),
+            ("revoked@example.com", True, False),
+            ("unknown@example.com", True, False)
+    ):
+        token = create_access_token({"sub": email, "admin": admin})
+        headers = {"Authorization": f"Bearer {token}", "X-Profile": "1"}
+        assert ("x-profile-id" in client.get("/other", headers=headers).headers) is profiled
+
+
+def test_app_import_has_no_side_effects(tmp_path):
+    """Test that importing the app neither connects to MongoDB nor touches the filesystem"""
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    backend_dir = Path(__file__).resolve().parent.parent
+    script = "import threading, app.main; print(threading.active_count())"
+    # Unroutable, so any connection attempt would fail the import; then unset, as in a bare checkout
+    for mongo_uri in ("mongodb://10.255.255.1:27017/?serverSelectionTimeoutMS=200", ""):
+        env = {**os.environ, "PYTHONPATH": str(backend_dir), "MONGO_URI": mongo_uri}
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60
+        )
+
+        assert result.returncode == 0, result.stderr
+        # No PyMongo monitor threads, no static directories
+        assert result.stdout.strip() == "1"
+        assert list(tmp_path.iterdir()) == []
+
+
+def test_readiness_from_cached_checks():
+    """Test readiness served from background check results and live saturation"""
+    import asyncio
+    from app.core.health import HealthMonitor
+    from app.core.loop_lag import LagMonitor
+    from app.core.ratelimit import LoadShedder
+
+    calls = {"mongo": 0}
+
+    async def mongo():
+        calls["mongo"] += 1
+        return "connected"
+
+    async def recommendations():
+        raise RuntimeError("connection refused")
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    shedder = LoadShedder(max_in_flight=10, max_lag_ms=100, monitor=LagMonitor())
+    monitor = HealthMonitor(
+        {"mongo": (mongo, True), "recommendations": (recommendations, False)},
+        interval=60, timeout=0.05, shedder=shedder
+    )
+    ready, report = monitor.readiness()
+    assert not ready and report["status"] == "starting"
+
+    asyncio.run(monitor.run_checks())
+    for _ in range(5):
+        ready, report = monitor.readiness()
+    # Probes read the cache; only the background round touched the dependency
+    assert calls["mongo"] == 1
+    assert ready and report["status"] == "degraded"
+    assert report["checks"]["recommendations"]["detail"] == "connection refused"
+
+    shedder.in_flight = 9
+    ready, report = monitor.readiness()
+    assert not ready and report["status"] == "saturated"
+    shedder.in_flight = 0
+
+    monitor.checks["mongo"] = (hanging, True)
+    asyncio.run(monitor.run_checks())
+    ready, report = monitor.readiness()
+    assert not ready and report["status"] == "unavailable"
+    assert "timed out" in report["checks"]["mongo"]["detail"]
+
+
+def test_server_socket_enables_nodelay():
+    """Test that the pre-fork listening socket lets asyncio disable Nagle's algorithm"""
+    import socket
+    from app.serve import bind_socket
+
+    sock = bind_socket("127.0.0.1", 0, 16)
+    try:
+        # asyncio only sets TCP_NODELAY on accepted sockets whose proto is TCP
+        assert sock.proto == socket.IPPROTO_TCP
+        assert sock.get_inheritable()
+    finally:
+        sock.close()
+
+
+def test_worker_count_defaults_to_one_without_shared_buckets():
+    """Test that per-process rate limit buckets keep the server to one worker unless configured"""
+    from app.serve import worker_count
+
+    assert worker_count(0, shared_buckets=False, cpus=16) == 1
+    assert worker_count(0, shared_buckets=True, cpus=16, max_workers=8) == 8
+    assert worker_count(0, shared_buckets=True, cpus=2, max_workers=8) == 2
+    assert worker_count(4, shared_buckets=False, cpus=16) == 4
@@ -1,5 +1,5 @@
 import React, { useState, useCallback } from 'react';
-import { orderService } from '../../services/api';
+import { recommendationService } from '../../services/api';
 import { useAuth } from '../../context/AuthContext';
 import { Sparkles, Wand2 } from 'lucide-react';
 
@@ -16,43 +16,46 @@ const MenuRecommendations = ({ restaurant, onAddToCart }) => {
         try {
             setLoading(true);
 
-            let orderHistory = [];
-            try {
-                const orders = await orderService.getOrders();
-                orderHistory = [...new Set(orders.flatMap(order =>
-                    order.items.map(item => item.name)
-                ))];
-            } catch (error) {
-                console.log('No previous orders found');
+            const response = await recommendationService.streamRecommendation(restaurant.id, userPreference);
+
+            // Server-sent events: show the item as soon as it arrives, then the reasoning as it streams
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let reasoning = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+
+                for (const rawEvent of events) {
+                    const lines = rawEvent.split('\n');
+                    const event = lines.find(line => line.startsWith('event: '))?.slice(7);
+                    const dataLine = lines.find(line => line.startsWith('data: '));
+                    if (!event || !dataLine) continue;
+                    const data = JSON.parse(dataLine.slice(6));
+
+                    if (event === 'item') {
+                        setRecommendations({ recommended_items: data, reasoning: '' });
+                        setLoading(false);
+                    } else if (event === 'reasoning') {
+                        reasoning += data;
+                        const text = reasoning.replace(/\*\*.*?\*\*/g, '').trim();
+                        setRecommendations(current => current && { ...current, reasoning: text });
+                    } else if (event === 'done') {
+                        setRecommendations({
+                            ...data,
+                            reasoning: data.reasoning.replace(/\*\*.*?\*\*/g, '').trim()
+                        });
+                    } else if (event === 'error') {
+                        throw new Error(data);
+                    }
+                }
             }
-
-            const response = await fetch('http://localhost:8001/recommend/', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    restaurant_menu: restaurant.menu.map(item => ({
-                        name: item.name,
-                        price: item.price,
-                        description: item.description,
-                        category: item.category
-                    })),
-                    user_previous_orders: orderHistory,
-                    user_preference: userPreference
-                })
-            });
-
-            if (!response.ok) {
-                throw new Error('Failed to fetch recommendations');
-            }
-
-            const data = await response.json();
-
-            setRecommendations({
-                ...data,
-                reasoning: data.reasoning.replace(/\*\*.*?\*\*/g, '').trim()
-            });
         } catch (error) {
             console.error('Error fetching recommendations:', error);
             setRecommendations(null);
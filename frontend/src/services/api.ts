@@ -168,6 +168,20 @@ export const restaurantService = {
 
   },
 
+  async getRestaurant(restaurantId: string, menuFilters: Record<string, string | number | boolean> = {}) {
+    try {
+      // Menu filters: category, is_vegetarian, max_spiciness, available, min_price, max_price
+      const response = await axios.get(`${BASE_URL}/restaurants/${restaurantId}`, {
+        headers: getAuthHeaders(),
+        params: menuFilters
+      });
+      return response.data;
+    } catch (error: any) {
+      console.error('Failed to fetch restaurant:', error);
+      throw error;
+    }
+  },
+
   async createRestaurant(restaurantData: RestaurantData) {
     try {
       console.log('Restaurant Creation Request:', restaurantData);
@@ -346,6 +360,22 @@ export const orderService = {
   }
 };
 
+// Recommendation services: the backend adds the menu and order history
+export const recommendationService = {
+  // Returns the raw response so the caller can read server-sent events as they stream
+  async streamRecommendation(restaurantId: string, userPreference: string) {
+    const response = await fetch(`${BASE_URL}/recommendations/${restaurantId}/stream`, {
+      method: 'POST',
+      headers: getAuthHeaders(),
+      body: JSON.stringify({ user_preference: userPreference })
+    });
+    if (!response.ok) {
+      throw new Error('Failed to fetch recommendations');
+    }
+    return response;
+  }
+};
+
 // Cart-related services
 export const cartService = {
   saveCart(cartItems: any[]) {
@@ -367,5 +397,6 @@ export default {
   user: userService,
   restaurant: restaurantService,
   order: orderService,
+  recommendation: recommendationService,
   cart: cartService
 };
\ No newline at end of file
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List
+
+from dotenv import load_dotenv
+
+from .cache import recommendation_cache, request_fingerprint
+from .embeddings import menu_digest
+from .models import Recommendation, RecommendationRequest
+from .utils import get_agent, get_current_meal_time, use_local_recommender
+
+load_dotenv()
+
+# Groups (model prompts) executed at once for one batch
+RECOMMENDATION_BATCH_CONCURRENCY = int(os.getenv("RECOMMENDATION_BATCH_CONCURRENCY", 4))
+# Customers of the same menu folded into one prompt
+RECOMMENDATION_BATCH_GROUP_SIZE = int(os.getenv("RECOMMENDATION_BATCH_GROUP_SIZE", 5))
+
+
+def plan_groups(requests: Dict[str, RecommendationRequest], group_size: int) -> List[List[str]]:
+    """
+    Group unique request keys into model calls
+
+    Requests the local recommender can answer run alone; the rest are
+    grouped by restaurant menu, at most ``group_size`` per prompt.
+    """
+    groups = []
+    by_menu = defaultdict(list)
+    for key, request in requests.items():
+        if use_local_recommender(request):
+            groups.append([key])
+        else:
+            by_menu[(request.restaurant_id, menu_digest(request.restaurant_menu))].append(key)
+
+    for keys in by_menu.values():
+        groups.extend(keys[start:start + group_size] for start in range(0, len(keys), group_size))
+    return groups
+
+
+async def run_batch(requests: List[RecommendationRequest]) -> AsyncIterator[dict]:
+    """
+    Recommend for many requests, yielding results as they complete
+
+    Identical requests are computed once and answered under every index
+    they were submitted at. Yields ``{"index", "recommendation"}`` or
+    ``{"index", "error"}`` dicts.
+    """
+    meal_time = get_current_meal_time()
+    positions: Dict[str, List[int]] = defaultdict(list)
+    unique: Dict[str, RecommendationRequest] = {}
+    for position, request in enumerate(requests):
+        key = request_fingerprint(request, meal_time)
+        positions[key].append(position)
+        unique.setdefault(key, request)
+
+    def results(key: str, recommendation: Recommendation) -> List[dict]:
+        payload = recommendation.model_dump()
+        return [{"index": position, "recommendation": payload} for position in positions[key]]
+
+    pending = {}
+    for key in list(unique):
+        cached = recommendation_cache.peek(key)
+        if cached is not None:
+            for result in results(key, cached):
+                yield result
+        else:
+            pending[key] = unique[key]
+
+    agent = get_agent()
+    slots = asyncio.Semaphore(RECOMMENDATION_BATCH_CONCURRENCY)
+
+    async def run_group(keys: List[str]):
+        async with slots:
+            group = [pending[key] for key in keys]
+            try:
+                recommendations = await agent.recommend_group(group)
+            except Exception as e:
+                return keys, e
+            for key, recommendation in zip(keys, recommendations):
+                await recommendation_cache.store_result(key, recommendation)
+            return keys, recommendations
+
+    tasks = [asyncio.create_task(run_group(keys)) for keys in plan_groups(pending, RECOMMENDATION_BATCH_GROUP_SIZE)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            keys, outcome = await finished
+            for number, key in enumerate(keys):
+                if isinstance(outcome, Exception):
+                    for position in positions[key]:
+                        yield {"index": position, "error": str(outcome)}
+                else:
+                    for result in results(key, outcome[number]):
+                        yield result
+    finally:
+        # The client went away: stop the remaining groups
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from .models import Recommendation, RecommendationRequest, UserProfile
+
+load_dotenv()
+
+# Categories of a taste profile that count towards the cache key
+PROFILE_TOP_CATEGORIES = 3
+
+
+def _normalize_text(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def _coarse_profile(profile: Optional[UserProfile]) -> Optional[dict]:
+    # Rounded, so one more order rarely moves a user to a new cache entry
+    if profile is None:
+        return None
+    shares = sorted((-round(share, 1), _normalize_text(name)) for name, share in profile.category_shares.items())
+    return {
+        "categories": [(name, -share) for share, name in shares[:PROFILE_TOP_CATEGORIES]],
+        "average_price": round(profile.average_price) if profile.average_price is not None else None,
+        "vegetarian": round(profile.vegetarian_ratio, 1),
+        "spiciness": round(profile.spiciness_tolerance) if profile.spiciness_tolerance is not None else None,
+        "favorites": sorted(_normalize_text(item) for item in profile.favorite_items),
+    }
+
+
+def request_fingerprint(request: RecommendationRequest, meal_time: str) -> str:
+    """
+    Stable hash of a recommendation request
+
+    Menu order, letter case and whitespace do not change the fingerprint,
+    so the same menu sent by different clients shares one cache entry. The
+    taste profile is coarsened: its order count is left out and shares and
+    averages are rounded.
+    """
+    menu = sorted(
+        (
+            _normalize_text(item.name),
+            round(item.price, 2),
+            _normalize_text(item.category),
+            _normalize_text(item.description),
+            bool(item.is_vegetarian),
+            item.spiciness_level or 0,
+        )
+        for item in request.restaurant_menu
+    )
+    normalized = {
+        "menu": menu,
+        "previous_orders": sorted(_normalize_text(order) for order in request.user_previous_orders or []),
+        "preference": _normalize_text(request.user_preference),
+        "profile": _coarse_profile(request.user_profile),
+        "meal_time": meal_time,
+    }
+    encoded = json.dumps(normalized, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class SQLiteStore:
+    """Persistent second level so cached recommendations survive restarts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[Recommendation]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM recommendations WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return Recommendation.model_validate_json(row[0]) if row else None
+
+    def set(self, key: str, recommendation: Recommendation, ttl: float) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO recommendations (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, recommendation.model_dump_json(), time.time() + ttl)
+            )
+            self._connection.execute("DELETE FROM recommendations WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM recommendations")
+
+
+class RecommendationCache:
+    """
+    LRU/TTL cache of recommendations with single-flight loading
+
+    Concurrent requests for the same key wait for one computation instead of
+    each calling the model. Degraded (fallback) answers are never cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 900, store: Optional[SQLiteStore] = None):
+        self.ttl = ttl
+        self.store = store
+        self._memory: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(
+            self,
+            key: str,
+            compute: Callable[[], Awaitable[Recommendation]]
+    ) -> Recommendation:
+        cached = self._memory.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached.model_copy(deep=True)
+
+        task = self._in_flight.get(key)
+        if task is None:
+            # Run the load as its own task so a disconnecting client does not
+            # cancel it for everyone else waiting on the same key
+            task = asyncio.create_task(self._load(key, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        recommendation = await asyncio.shield(task)
+        return recommendation.model_copy(deep=True)
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[Recommendation]]) -> Recommendation:
+        if self.store is not None:
+            recommendation = await asyncio.to_thread(self.store.get, key)
+            if recommendation is not None:
+                self.persistent_hits += 1
+                self._memory[key] = recommendation
+                return recommendation
+
+        self.misses += 1
+        recommendation = await compute()
+        if not recommendation.is_degraded:
+            self._memory[key] = recommendation
+            if self.store is not None:
+                await asyncio.to_thread(self.store.set, key, recommendation, self.ttl)
+        return recommendation
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def peek(self, key: str) -> Optional[Recommendation]:
+        """Memory-only lookup for callers that load in bulk (batch requests)"""
+        cached = self._memory.get(key)
+        if cached is None:
+            return None
+        self.hits += 1
+        return cached.model_copy(deep=True)
+
+    async def store_result(self, key: str, recommendation: Recommendation) -> None:
+        self.misses += 1
+        if recommendation.is_degraded:
+            return
+        self._memory[key] = recommendation.model_copy(deep=True)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, key, recommendation, self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.persistent_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._memory),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+def create_cache() -> RecommendationCache:
+    path = os.getenv("RECOMMENDATION_CACHE_DB")
+    return RecommendationCache(
+        maxsize=int(os.getenv("RECOMMENDATION_CACHE_SIZE", 1024)),
+        ttl=float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", 900)),
+        store=SQLiteStore(path) if path else None
+    )
+
+
+recommendation_cache = create_cache()
@@ -0,0 +1,269 @@
+"""
+Hashed text embeddings and per-restaurant menu similarity indexes.
+
+Menu item text is embedded with signed feature hashing over words and
+character trigrams. This needs no model download, is stable across
+processes and tolerates typos and plurals. Each restaurant menu's matrix
+is saved under ``RECOMMENDATION_INDEX_DIR`` (a cache directory by default)
+as ``.npy`` files and memory-mapped on load, so workers share the pages and
+a restart does not re-embed menus. At most
+``RECOMMENDATION_INDEX_MAX_PERSISTED`` indexes are kept on disk; the oldest
+are removed first.
+
+The index serves two purposes:
+
+- retrieve the menu items closest to a preference before prompting
+- map free-text model output back to an exact menu item name
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+from dotenv import load_dotenv
+
+from .models import MenuItem
+
+load_dotenv()
+
+EMBEDDING_DIM = int(os.getenv("RECOMMENDATION_EMBEDDING_DIM", 2048))
+INDEX_DIR = os.getenv(
+    "RECOMMENDATION_INDEX_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "menu-recommendations", "indexes")
+)
+# Restaurant indexes kept on disk; restaurant ids come from clients, so the count is capped
+INDEX_MAX_PERSISTED = int(os.getenv("RECOMMENDATION_INDEX_MAX_PERSISTED", 1000))
+# Minimum cosine similarity for model output to count as naming an item
+MIN_MATCH_SCORE = float(os.getenv("RECOMMENDATION_MIN_MATCH_SCORE", 0.25))
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+SAFE_KEY = re.compile(r"[^A-Za-z0-9_-]")
+# Files making up one saved index
+INDEX_SUFFIXES = (".json", ".text.npy", ".names.npy")
+
+
+def _features(text: str) -> Iterable[Tuple[str, float]]:
+    words = WORD_PATTERN.findall(text.lower())
+    for word in words:
+        yield f"w:{word}", 1.0
+        padded = f"#{word}#"
+        for start in range(len(padded) - 2):
+            yield f"c:{padded[start:start + 3]}", 0.5
+
+
+def embed(texts: Sequence[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Embed texts as L2-normalized hashed feature vectors
+
+    Returns:
+        np.ndarray: (len(texts), dim) float32 matrix
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, weight in _features(text or ""):
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            # The top bit picks the sign so collisions tend to cancel out
+            matrix[row, hashed % dim] += weight if hashed & 0x80000000 else -weight
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def item_text(item: MenuItem) -> str:
+    return f"{item.name} {item.name} {item.category or ''} {item.description or ''}"
+
+
+def menu_digest(menu: Sequence[MenuItem]) -> str:
+    encoded = json.dumps(
+        [[item.name, item.category or "", item.description or ""] for item in menu],
+        separators=(",", ":"),
+        ensure_ascii=False
+    ).encode("utf-8")
+    return hashlib.blake2b(encoded + str(EMBEDDING_DIM).encode(), digest_size=12).hexdigest()
+
+
+class MenuIndex:
+    """Cosine similarity over one menu's item texts and names"""
+
+    def __init__(self, names: List[str], text_matrix: np.ndarray, name_matrix: np.ndarray):
+        self.names = names
+        self.text_matrix = text_matrix
+        self.name_matrix = name_matrix
+
+    @classmethod
+    def build(cls, menu: Sequence[MenuItem]) -> "MenuIndex":
+        return cls(
+            names=[item.name for item in menu],
+            text_matrix=embed([item_text(item) for item in menu]),
+            name_matrix=embed([item.name for item in menu])
+        )
+
+    def similarity(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), len(menu)) cosine similarity of texts to item texts"""
+        if not texts:
+            return np.zeros((0, len(self.names)), dtype=np.float32)
+        return embed(texts) @ self.text_matrix.T
+
+    def top_k(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Menu rows closest to a query, best first"""
+        if not self.names or not query.strip():
+            return []
+        scores = self.similarity([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Map model output to an exact menu item name
+
+        Models name their pick first and often mention other dishes while
+        reasoning, so the earliest name quoted verbatim wins; of names starting
+        at the same place the longest does ("Chicken Tikka Masala" beats
+        "Chicken Tikka"). Otherwise the output's opening is compared with every
+        name and the closest one above ``MIN_MATCH_SCORE`` is returned.
+        """
+        lowered = text.lower()
+        mentions = []
+        for name in self.names:
+            mention = re.search(rf"(?<![a-z0-9]){re.escape(name.lower())}(?![a-z0-9])", lowered)
+            if mention:
+                mentions.append((mention.start(), -len(name), name))
+        if mentions:
+            return min(mentions)[2]
+
+        # Models name their pick first; the rest is reasoning
+        opening = " ".join(text.strip().splitlines()[:2])[:200]
+        if not self.names or not opening:
+            return None
+        scores = embed([opening]) @ self.name_matrix.T
+        best = int(np.argmax(scores[0]))
+        return self.names[best] if scores[0, best] >= MIN_MATCH_SCORE else None
+
+    def save(self, directory: str, key: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, key)
+        for suffix, matrix in ((".text.npy", self.text_matrix), (".names.npy", self.name_matrix)):
+            _write_atomic(f"{base}{suffix}", lambda matrix_file: np.save(matrix_file, matrix))
+        # Names last: load() reads them first, so a complete .json means complete matrices
+        _write_atomic(f"{base}.json", lambda names_file: names_file.write(json.dumps(self.names).encode("utf-8")))
+
+    @classmethod
+    def load(cls, directory: str, key: str) -> Optional["MenuIndex"]:
+        base = os.path.join(directory, key)
+        try:
+            with open(f"{base}.json") as names_file:
+                names = json.load(names_file)
+            return cls(
+                names=names,
+                text_matrix=np.load(f"{base}.text.npy", mmap_mode="r"),
+                name_matrix=np.load(f"{base}.names.npy", mmap_mode="r")
+            )
+        except (OSError, ValueError):
+            return None
+
+
+def _write_atomic(path: str, write) -> None:
+    # A unique temporary file in the same directory, renamed over the target, so readers
+    # never see partial files and concurrent writers (other workers) never share one
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            write(temp_file)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class IndexStore:
+    """Loaded indexes kept in an LRU, backed by memory-mapped files on disk"""
+
+    def __init__(self, directory: str = INDEX_DIR, maxsize: int = 256, max_persisted: int = INDEX_MAX_PERSISTED):
+        self.directory = directory
+        self.max_persisted = max_persisted
+        self._indexes: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def key(self, menu: Sequence[MenuItem], restaurant_id: Optional[str] = None) -> str:
+        digest = menu_digest(menu)
+        return f"{SAFE_KEY.sub('_', restaurant_id)}-{digest}" if restaurant_id else digest
+
+    async def get_async(self, menu: Sequence[MenuItem], restaurant_id: Optional[str] = None) -> MenuIndex:
+        """get() for the event loop: loaded indexes are returned directly, misses are built in a thread"""
+        key = self.key(menu, restaurant_id)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is not None:
+            return index
+        return await asyncio.to_thread(self.get, menu, restaurant_id)
+
+    def get(self, menu: Sequence[MenuItem], restaurant_id: Optional[str] = None) -> MenuIndex:
+        key = self.key(menu, restaurant_id)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        # Only restaurant menus are persisted; ad-hoc menus stay in memory
+        index = MenuIndex.load(self.directory, key) if restaurant_id else None
+        if index is None:
+            index = MenuIndex.build(menu)
+            if restaurant_id and self.max_persisted > 0:
+                try:
+                    self._make_room(restaurant_id, key)
+                    index.save(self.directory, key)
+                except OSError:
+                    # Persistence is an optimisation; keep the in-memory index
+                    pass
+
+        with self._lock:
+            self._indexes[key] = index
+        return index
+
+    def _make_room(self, restaurant_id: str, current_key: str) -> None:
+        """Drop the restaurant's previous menus, then the oldest indexes beyond max_persisted"""
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return
+        stale = re.compile(re.escape(SAFE_KEY.sub("_", restaurant_id)) + r"-[0-9a-f]{24}$")
+        saved = {}
+        for filename in filenames:
+            # Keys never contain dots; temporary files start with one
+            key, _, suffix = filename.partition(".")
+            if not key or key == current_key:
+                continue
+            try:
+                if stale.match(key):
+                    os.remove(os.path.join(self.directory, filename))
+                elif suffix == "json":
+                    saved[key] = os.stat(os.path.join(self.directory, filename)).st_mtime
+            except OSError:
+                # Removed by another worker in the meantime
+                pass
+
+        excess = len(saved) + 1 - self.max_persisted
+        if excess > 0:
+            for key in sorted(saved, key=saved.get)[:excess]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        for suffix in INDEX_SUFFIXES:
+            try:
+                os.remove(os.path.join(self.directory, f"{key}{suffix}"))
+            except OSError:
+                pass
+
+
+index_store = IndexStore()
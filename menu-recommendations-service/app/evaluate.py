@@ -0,0 +1,104 @@
+"""
+Offline evaluation of the local recommender.
+
+    python -m app.evaluate [--cases cases.jsonl] [--k 3]
+
+Each case is a JSON object with ``request`` (a RecommendationRequest),
+optional ``meal_time`` and ``expected`` (acceptable item names). Without
+``--cases`` a small built-in set is used. Reports hit@1, hit@k, MRR and
+per-request latency.
+"""
+import argparse
+import json
+import time
+from typing import List
+
+import numpy as np
+
+from .models import RecommendationRequest
+from .scoring import LocalRecommender
+
+PIZZERIA = [
+    {"name": "Margherita", "price": 9.0, "category": "Italian", "description": "Tomato, mozzarella and basil"},
+    {"name": "Diavola", "price": 12.0, "category": "Italian", "description": "Spicy salami and chili"},
+    {"name": "Truffle Risotto", "price": 19.0, "category": "Italian", "description": "Creamy rice with black truffle"},
+    {"name": "Garden Salad", "price": 7.0, "category": "Italian", "description": "Vegetarian mixed greens"},
+    {"name": "Tiramisu", "price": 6.0, "category": "Dessert", "description": "Coffee soaked dessert"},
+]
+
+CURRY_HOUSE = [
+    {"name": "Masala Omelette", "price": 6.5, "category": "Indian", "description": "Eggs with onion and chili"},
+    {"name": "Chicken Vindaloo", "price": 14.0, "category": "Indian", "description": "Very spicy chicken curry"},
+    {"name": "Paneer Tikka", "price": 12.0, "category": "Indian", "description": "Grilled vegetarian cheese"},
+    {"name": "Lamb Biryani", "price": 16.0, "category": "Indian", "description": "Rice with lamb"},
+    {"name": "Mango Lassi", "price": 4.0, "category": "Drinks", "description": "Yogurt smoothie"},
+]
+
+BUILTIN_CASES = [
+    {"request": {"restaurant_menu": PIZZERIA, "user_preference": "something spicy"},
+     "meal_time": "dinner", "expected": ["Diavola"]},
+    {"request": {"restaurant_menu": PIZZERIA, "user_preference": "vegetarian and light"},
+     "meal_time": "lunch", "expected": ["Garden Salad", "Margherita"]},
+    {"request": {"restaurant_menu": PIZZERIA, "user_preference": "a fancy treat"},
+     "meal_time": "dinner", "expected": ["Truffle Risotto"]},
+    {"request": {"restaurant_menu": PIZZERIA, "user_preference": "dessert"},
+     "meal_time": "late night", "expected": ["Tiramisu"]},
+    {"request": {"restaurant_menu": CURRY_HOUSE, "user_preference": "spicy chicken"},
+     "meal_time": "dinner", "expected": ["Chicken Vindaloo"]},
+    {"request": {"restaurant_menu": CURRY_HOUSE, "user_preference": "eggs"},
+     "meal_time": "breakfast", "expected": ["Masala Omelette"]},
+    {"request": {"restaurant_menu": CURRY_HOUSE, "user_previous_orders": ["Lamb Biryani"]},
+     "meal_time": "dinner", "expected": ["Lamb Biryani"]},
+    {"request": {"restaurant_menu": CURRY_HOUSE, "user_preference": "vegetarian",
+                 "user_previous_orders": ["Paneer Tikka"]},
+     "meal_time": "lunch", "expected": ["Paneer Tikka"]},
+    {"request": {"restaurant_menu": CURRY_HOUSE, "user_preference": "cheap drink"},
+     "meal_time": "lunch", "expected": ["Mango Lassi"]},
+]
+
+
+def load_cases(path: str) -> List[dict]:
+    with open(path) as cases_file:
+        return [json.loads(line) for line in cases_file if line.strip()]
+
+
+def evaluate(cases: List[dict], k: int = 3, recommender: LocalRecommender = None) -> dict:
+    recommender = recommender or LocalRecommender()
+    hits_at_1 = hits_at_k = 0
+    reciprocal_ranks = []
+    latencies = []
+
+    for case in cases:
+        request = RecommendationRequest(**case["request"])
+        expected = {name.lower() for name in case["expected"]}
+
+        start = time.perf_counter()
+        ranked = recommender.rank(request, case.get("meal_time", "dinner"), k=len(request.restaurant_menu))
+        latencies.append(time.perf_counter() - start)
+
+        names = [request.restaurant_menu[row].name.lower() for row, _, _ in ranked]
+        rank = next((position for position, name in enumerate(names, 1) if name in expected), None)
+        hits_at_1 += rank == 1
+        hits_at_k += rank is not None and rank <= k
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "cases": len(cases),
+        "hit@1": round(hits_at_1 / len(cases), 3),
+        f"hit@{k}": round(hits_at_k / len(cases), 3),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 3),
+        "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 3),
+        "latency_ms_p99": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local menu recommender")
+    parser.add_argument("--cases", help="JSONL file of evaluation cases (defaults to the built-in set)")
+    parser.add_argument("--k", type=int, default=3, help="Cut-off for hit@k")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases) if args.cases else BUILTIN_CASES
+    for metric, value in evaluate(cases, k=args.k).items():
+        print(f"{metric}: {value}")
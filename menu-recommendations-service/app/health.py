@@ -0,0 +1,125 @@
+"""
+Liveness and readiness for load balancers.
+
+``/livez`` does no work. ``/readyz`` serves the results of checks that a
+background task refreshes every ``HEALTH_CHECK_INTERVAL_SECONDS`` (model
+configuration, index directory), plus saturation read live: the model's
+slots and queue, in-flight requests and event-loop lag. The service
+answers with fallbacks when the model is missing, so failed checks only
+mark it "degraded"; saturation or stale results make it not ready, so
+balancers move traffic to other instances.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .embeddings import INDEX_DIR
+from .ratelimit import service_protection
+from .utils import get_agent
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", 5))
+HEALTH_MIN_FREE_DISK_MB = int(os.getenv("HEALTH_MIN_FREE_DISK_MB", 100))
+# Share of SHED_MAX_IN_FLIGHT at which the instance reports itself saturated
+HEALTH_SATURATION_RATIO = float(os.getenv("HEALTH_SATURATION_RATIO", 0.9))
+
+
+def check_model() -> Tuple[bool, str]:
+    if get_agent().llm is None:
+        return False, "no GEMINI_API_KEY; serving fallback recommendations"
+    return True, "configured"
+
+
+def check_index_dir() -> Tuple[bool, str]:
+    # The index store creates the directory, and any missing parents, on first write
+    directory = os.path.abspath(INDEX_DIR)
+    while not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+    if not os.access(directory, os.W_OK):
+        return False, f"{directory} is not writable"
+    free_mb = shutil.disk_usage(directory).free // (1024 * 1024)
+    if free_mb < HEALTH_MIN_FREE_DISK_MB:
+        return False, f"{free_mb} MB free, below {HEALTH_MIN_FREE_DISK_MB} MB"
+    return True, f"{free_mb} MB free"
+
+
+CHECKS = {"model": check_model, "index_dir": check_index_dir}
+
+
+class HealthMonitor:
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL_SECONDS, protection=service_protection):
+        self.interval = interval
+        self.protection = protection
+        self.results: Dict[str, dict] = {}
+        self.last_round = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def run_checks(self) -> None:
+        for name, check in CHECKS.items():
+            try:
+                ok, detail = check()
+            except Exception as e:
+                ok, detail = False, str(e)
+            if not ok and self.results.get(name, {}).get("ok", True):
+                logger.error(f"Health check {name} failed: {detail}")
+            self.results[name] = {"ok": ok, "detail": detail, "checked_at": time.time()}
+        self.last_round = time.time()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.run_checks)
+            await asyncio.sleep(self.interval)
+
+    def saturation(self) -> List[str]:
+        reasons = []
+        agent = get_agent()
+        if agent.llm is not None and agent._saturated():
+            reasons.append(f"model queue full ({agent._pending} pending)")
+        protection = self.protection
+        if protection.max_in_flight and protection.in_flight >= HEALTH_SATURATION_RATIO * protection.max_in_flight:
+            reasons.append(f"{protection.in_flight} of {protection.max_in_flight} requests in flight")
+        if protection.max_lag and protection.monitor.lag > protection.max_lag:
+            reasons.append(f"event loop lag {protection.monitor.lag * 1000:.0f} ms")
+        return reasons
+
+    def readiness(self) -> Tuple[bool, dict]:
+        saturated = self.saturation()
+        if not self.last_round:
+            status = "starting"
+        elif time.time() - self.last_round > 3 * self.interval:
+            status = "stale"
+        elif saturated:
+            status = "saturated"
+        elif not all(result["ok"] for result in self.results.values()):
+            status = "degraded"
+        else:
+            status = "ready"
+        return status in ("ready", "degraded"), {
+            "status": status,
+            "checks": dict(self.results),
+            "saturation": saturated,
+        }
+
+
+health_monitor = HealthMonitor()
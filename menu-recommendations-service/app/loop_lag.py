@@ -0,0 +1,202 @@
+"""
+Event-loop lag sampling and blocking-call detection.
+
+A background task sleeps for ``LOOP_LAG_INTERVAL_SECONDS`` and measures how
+late it wakes up. The delay is time the loop spent running other callbacks
+instead of serving requests, so it rises when routes block the loop or the
+process is overloaded. Load shedding reads ``lag_monitor.lag``; recent
+samples are kept for percentiles.
+
+With ``LOOP_DEBUG`` on, a watchdog thread also pings the loop every few
+milliseconds. When a ping goes unanswered for ``LOOP_BLOCK_THRESHOLD_MS``,
+it captures the loop thread's stack, which shows the blocking call (a sync
+model or embedding call, file I/O in the index store, ...) and the route it
+ran for. Reports are logged and kept in memory, with per-route totals, so a
+fix can be proven by the count dropping to zero.
+
+This module is kept in step with
+``backend/app/core/loop_lag.py``: the backend and the recommendations
+service are built as separate Docker contexts with no shared package, so
+each carries its own copy and only where settings come from differs.
+Change both together.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", 0.1))
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", 600))
+LOOP_DEBUG = os.getenv("LOOP_DEBUG", "false").lower() == "true"
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 100))
+LOOP_BLOCK_REPORTS = int(os.getenv("LOOP_BLOCK_REPORTS", 50))
+
+
+def _route_of(frames: List) -> str:
+    """
+    The request a blocked stack was serving, from the ASGI scope on it
+
+    Frames are innermost first; once routed, the scope carries the route
+    template ("/recommend/{restaurant_id}") rather than the raw path.
+    """
+    fallback = "unknown"
+    for frame in frames:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                return f"{scope.get('method', '')} {route.path}"
+            fallback = f"{scope.get('method', '')} {scope.get('path', '')}"
+    return fallback
+
+
+class BlockingDetector:
+    def __init__(self, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 max_reports: int = LOOP_BLOCK_REPORTS):
+        self.threshold = threshold_ms / 1000
+        self.reports: Deque[dict] = deque(maxlen=max_reports)
+        self.routes: Dict[str, dict] = {}
+        self.blocked = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._answered = threading.Event()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._answered.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _watch(self) -> None:
+        # Ping often enough that a block is caught close to the threshold
+        interval = max(self.threshold / 4, 0.005)
+        while not self._stopping.is_set():
+            self._answered.clear()
+            sent = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(self._answered.set)
+            except RuntimeError:
+                return  # the loop was closed
+            if self._answered.wait(self.threshold):
+                self._stopping.wait(interval)
+                continue
+
+            # Blocked: the stack now shows what is running on the loop thread
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = traceback.format_stack(frame) if frame else []
+            route = _route_of([item for item, _ in traceback.walk_stack(frame)] if frame else [])
+            self._answered.wait()
+            self.record(route, time.perf_counter() - sent, stack)
+
+    def record(self, route: str, duration: float, stack: List[str]) -> None:
+        self.blocked += 1
+        totals = self.routes.setdefault(route, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        totals["count"] += 1
+        totals["total_ms"] = round(totals["total_ms"] + duration * 1000, 3)
+        totals["max_ms"] = round(max(totals["max_ms"], duration * 1000), 3)
+        self.reports.append({
+            "route": route,
+            "duration_ms": round(duration * 1000, 3),
+            "at": time.time(),
+            "stack": stack,
+        })
+        logger.warning(
+            f"Event loop blocked for {duration * 1000:.0f} ms serving {route}:\n" + "".join(stack[-8:])
+        )
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "blocked": self.blocked,
+            "routes": dict(self.routes),
+            "reports": list(self.reports),
+        }
+
+
+class LagMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS,
+                 window: int = LOOP_LAG_WINDOW, debug: bool = LOOP_DEBUG):
+        self.interval = interval
+        # Smoothed lag in seconds; a single slow tick decays over a few samples
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self.recent: Deque[float] = deque(maxlen=window)
+        self.detector = BlockingDetector() if debug else None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self.detector is not None:
+            self.detector.start()
+
+    async def stop(self) -> None:
+        if self.detector is not None:
+            self.detector.stop()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, lag: float) -> None:
+        # Rise immediately, fall gradually, so shedding reacts fast and recovers smoothly
+        self.lag = lag if lag > self.lag else 0.8 * self.lag + 0.2 * lag
+        self.max_lag = max(self.max_lag, lag)
+        self.samples += 1
+        self.recent.append(lag)
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - start - self.interval))
+
+    def percentile(self, q: float) -> float:
+        """Lag percentile over the recent window, in seconds"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {
+            "lag_ms": round(self.lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "p50_lag_ms": round(self.percentile(50) * 1000, 3),
+            "p99_lag_ms": round(self.percentile(99) * 1000, 3),
+            "samples": self.samples,
+        }
+
+    def blocking_stats(self) -> Optional[dict]:
+        """Blocking reports, or None unless ``LOOP_DEBUG`` is on"""
+        return self.detector.stats() if self.detector is not None else None
+
+
+lag_monitor = LagMonitor()
@@ -1,14 +1,26 @@
-from fastapi import FastAPI, HTTPException
+import json
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .models import RecommendationRequest, Recommendation
-from .utils import generate_ai_recommendation
+from .batch import run_batch
+from .cache import recommendation_cache, request_fingerprint
+from .health import health_monitor
+from .loop_lag import lag_monitor
+from .models import BatchRecommendationRequest, RecommendationRequest, Recommendation
+from .prompting import prompt_stats
+from .ratelimit import ProtectionMiddleware, is_internal, service_protection
+from .utils import generate_ai_recommendation, get_agent, get_current_meal_time, init_agent
 
 app = FastAPI(
     title="AI Menu Recommendation Service",
     description="Intelligent, interactive menu recommendation microservice"
 )
 
+# Shed load and rate limit model calls; inside CORS so rejections keep CORS headers
+app.add_middleware(ProtectionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
@@ -17,13 +29,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    # Configure the model client once instead of per request
+    init_agent()
+    lag_monitor.start()
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await health_monitor.stop()
+    await lag_monitor.stop()
+
 @app.post("/recommend/", response_model=Recommendation)
 async def get_recommendations(request: RecommendationRequest):
     try:
-        recommendation = await generate_ai_recommendation(
-            menu_items=request.restaurant_menu,
-            previous_orders=request.user_previous_orders,
-            user_preference=request.user_preference
+        # Identical requests within the same meal time share one model call
+        cache_key = request_fingerprint(request, get_current_meal_time())
+        recommendation = await recommendation_cache.get_or_compute(
+            cache_key,
+            lambda: generate_ai_recommendation(
+                menu_items=request.restaurant_menu,
+                previous_orders=request.user_previous_orders,
+                user_preference=request.user_preference,
+                restaurant_id=request.restaurant_id
+            )
         )
         return recommendation
     except Exception as e:
@@ -32,6 +62,82 @@ async def get_recommendations(request: RecommendationRequest):
             detail=f"Error generating recommendation: {str(e)}"
         )
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/recommend/stream")
+async def stream_recommendations(request: RecommendationRequest):
+    """
+    Server-sent events: "item" with the pick as soon as it is known,
+    "reasoning" chunks as they are generated, then "done" with the full
+    recommendation (or "error")
+    """
+    cache_key = request_fingerprint(request, get_current_meal_time())
+
+    async def stream():
+        cached = recommendation_cache.peek(cache_key)
+        if cached is not None:
+            yield sse_event("item", cached.recommended_items)
+            yield sse_event("reasoning", cached.reasoning)
+            yield sse_event("done", cached.model_dump())
+            return
+        try:
+            async for event, data in get_agent().recommend_stream(request):
+                if event == "done":
+                    await recommendation_cache.store_result(cache_key, data)
+                    data = data.model_dump()
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", f"Error generating recommendation: {str(e)}")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/recommend/batch")
+async def get_batch_recommendations(batch: BatchRecommendationRequest):
+    """
+    Recommendations for many requests, streamed as NDJSON lines of
+    {"index", "recommendation"} (or {"index", "error"}) in completion order
+    """
+    async def stream():
+        async for result in run_batch(batch.requests):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return recommendation_cache.stats()
+
+@app.get("/loop/stats")
+async def loop_stats(request: Request):
+    # Blocking reports carry stack traces, so only callers holding the shared secret may read them
+    if not is_internal(request.headers, service_protection.secret):
+        raise HTTPException(status_code=403, detail="Requires the internal token")
+    # "blocking" is null unless LOOP_DEBUG is on
+    return {"lag": lag_monitor.stats(), "blocking": lag_monitor.blocking_stats()}
+
+@app.get("/limits/stats")
+async def limit_stats():
+    return service_protection.stats()
+
+@app.get("/prompt/stats")
+async def get_prompt_stats():
+    return prompt_stats.summary()
+
+@app.get("/livez")
+async def liveness():
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    # Cached check results plus live saturation; 503 tells balancers to drain this instance
+    ready, report = health_monitor.readiness()
+    return JSONResponse({**report, "service": "Menu Recommendations"}, status_code=200 if ready else 503)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "Menu Recommendations"}
\ No newline at end of file
+    return await readiness()
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Dict, List, Optional
 import pydantic_ai
 
 class MenuItem(BaseModel):
@@ -7,15 +7,40 @@ class MenuItem(BaseModel):
     price: float
     description: Optional[str] = None
     category: Optional[str] = None
+    is_vegetarian: Optional[bool] = None
+    spiciness_level: Optional[int] = None
+
+class UserProfile(BaseModel):
+    """Fixed-size taste profile the backend materializes from a user's orders"""
+    order_count: int = 0
+    # Share of ordered items per category, summing to at most 1
+    category_shares: Dict[str, float] = Field(default_factory=dict)
+    average_price: Optional[float] = None
+    vegetarian_ratio: float = 0.0
+    # Average spiciness level (1-5) of ordered items that have one
+    spiciness_tolerance: Optional[float] = None
+    favorite_items: List[str] = Field(default_factory=list)
 
 class RecommendationRequest(BaseModel):
     restaurant_menu: List[MenuItem]
+    # Lets the service keep a persistent similarity index per restaurant
+    restaurant_id: Optional[str] = None
     user_previous_orders: Optional[List[str]] = []
     user_preference: Optional[str] = None
+    user_profile: Optional[UserProfile] = None
+
+class BatchRecommendationRequest(BaseModel):
+    requests: List[RecommendationRequest] = Field(min_length=1, max_length=100)
 
 class Recommendation(BaseModel):
     recommended_items: List[str] = Field(default_factory=list)
     reasoning: str = Field(default="")
+    # Set when the model call failed and a fallback was returned; never cached
+    _degraded: bool = PrivateAttr(default=False)
+
+    @property
+    def is_degraded(self) -> bool:
+        return self._degraded
 
 class RecommendationAgent(pydantic_ai.Agent):
     def recommend(self, request: RecommendationRequest) -> Recommendation:
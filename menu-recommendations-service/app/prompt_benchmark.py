@@ -0,0 +1,84 @@
+"""
+Benchmark prompt compaction on large synthetic menus.
+
+    python -m app.prompt_benchmark [--items 500] [--runs 50]
+
+Prints prompt size before/after compaction and the time spent selecting
+candidates, and checks that the intended item survives the cut.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from .embeddings import MenuIndex
+from .models import MenuItem, RecommendationRequest
+from .prompting import compact_request, menu_chars
+from .utils import build_prompt
+
+CUISINES = ["Italian", "Indian", "Japanese", "Mexican", "American", "Chinese"]
+INGREDIENTS = [
+    "chicken", "beef", "lamb", "tofu", "paneer", "shrimp", "salmon", "mushroom", "spinach",
+    "chickpea", "pork", "eggplant", "potato", "cheese", "rice", "noodles", "beans", "corn",
+]
+STYLES = ["grilled", "fried", "braised", "roasted", "steamed", "spicy", "creamy", "smoked", "crispy"]
+FILLER = (
+    "Prepared fresh every day by our chefs using locally sourced produce, slow cooked with a "
+    "blend of house spices and served with your choice of seasonal sides and sauces."
+)
+
+
+def synthetic_menu(items: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    menu = []
+    for number in range(items):
+        style, ingredient = rng.choice(STYLES), rng.choice(INGREDIENTS)
+        menu.append(MenuItem(
+            name=f"{style.title()} {ingredient.title()} No. {number}",
+            price=round(rng.uniform(4, 40), 2),
+            category=rng.choice(CUISINES),
+            description=f"{style.title()} {ingredient} {FILLER}"
+        ))
+    # The item a customer asking for cheap vegetarian tofu should get
+    menu[rng.randrange(items)] = MenuItem(
+        name="Silken Tofu Bowl", price=9.5, category="Japanese",
+        description="Vegetarian silken tofu over rice with pickled vegetables. " + FILLER
+    )
+    return menu
+
+
+def run(items: int, runs: int) -> None:
+    menu = synthetic_menu(items)
+    request = RecommendationRequest(
+        restaurant_menu=menu,
+        user_preference="something vegetarian with tofu under $12",
+        user_previous_orders=["Steamed Rice Bowl"]
+    )
+    index = MenuIndex.build(menu)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        compact = compact_request(request, index, "dinner")
+        timings.append((time.perf_counter() - start) * 1000)
+
+    full_prompt = build_prompt(request, "dinner")
+    compact_prompt = build_prompt(compact, "dinner")
+    names = {item.name for item in compact.restaurant_menu}
+
+    print(f"menu items:        {len(menu)} -> {len(compact.restaurant_menu)}")
+    print(f"menu chars:        {menu_chars(menu)} -> {menu_chars(compact.restaurant_menu)}")
+    print(f"prompt chars:      {len(full_prompt)} -> {len(compact_prompt)}")
+    print(f"approx tokens:     {len(full_prompt) // 4} -> {len(compact_prompt) // 4}")
+    print(f"reduction:         {1 - len(compact_prompt) / len(full_prompt):.1%}")
+    print(f"selection ms:      p50 {np.percentile(timings, 50):.2f}, p99 {np.percentile(timings, 99):.2f}")
+    print(f"target kept:       {'Silken Tofu Bowl' in names}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark prompt compaction on a large menu")
+    parser.add_argument("--items", type=int, default=500, help="Menu size")
+    parser.add_argument("--runs", type=int, default=50, help="Timed repetitions")
+    args = parser.parse_args()
+    run(args.items, args.runs)
@@ -0,0 +1,250 @@
+"""
+Candidate pre-filtering and compaction of menus before prompting.
+
+Prompt size grows linearly with the menu, so large menus are cut down to
+``RECOMMENDATION_PROMPT_CANDIDATES`` items first:
+
+1. constraints parsed from the preference (a price ceiling such as
+   "under $15", dietary words, a category named on the menu); items that
+   meet them all come first
+2. within that, ranking by local score plus embedding similarity
+
+Groups of customers sharing a menu get an equal share of the candidates
+each, chosen with their own constraints.
+
+Descriptions are then whitespace-normalized and truncated. ``prompt_stats``
+tracks prompt size before and after, served at ``GET /prompt/stats``.
+"""
+import asyncio
+import os
+import re
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .embeddings import MenuIndex
+from .models import MenuItem, RecommendationRequest, UserProfile
+from .scoring import LocalRecommender, MenuFeatures, feature_matrix, local_recommender
+
+load_dotenv()
+
+# Menus larger than this are narrowed before prompting
+RECOMMENDATION_PROMPT_CANDIDATES = int(os.getenv("RECOMMENDATION_PROMPT_CANDIDATES", 25))
+# Descriptions longer than this are cut at a word boundary
+RECOMMENDATION_DESCRIPTION_CHARS = int(os.getenv("RECOMMENDATION_DESCRIPTION_CHARS", 80))
+
+PRICE_CEILING = re.compile(r"(?:under|below|less than|max(?:imum)?|up to|<)\s*\$?\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+# Larger than any combination of feature scores
+CONSTRAINT_BONUS = 100.0
+DIETARY_WORDS = {
+    "vegetarian": {"vegetarian", "veggie", "vegan", "paneer", "tofu", "vegetable", "vegetables", "falafel"},
+    "vegan": {"vegan", "tofu", "plant"},
+    "gluten": {"gluten"},
+}
+
+
+def compact_text(text: Optional[str], limit: int = RECOMMENDATION_DESCRIPTION_CHARS) -> str:
+    text = " ".join((text or "").split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",.;:") + "..."
+
+
+def menu_line(item: MenuItem) -> str:
+    """How one menu item appears in a prompt"""
+    return f"- {item.name}: ${item.price:.2f} ({item.category or 'No category'}) - {item.description or 'No description'}"
+
+
+def profile_text(profile: Optional[UserProfile]) -> str:
+    """One-line summary of a taste profile for prompts, or "" without one"""
+    if profile is None:
+        return ""
+    parts = []
+    top = sorted(profile.category_shares.items(), key=lambda entry: -entry[1])[:3]
+    if top:
+        parts.append("mostly " + ", ".join(f"{category} ({share:.0%})" for category, share in top))
+    if profile.average_price:
+        parts.append(f"usually spends ${profile.average_price:.2f} per item")
+    if profile.vegetarian_ratio >= 0.5:
+        parts.append(f"{profile.vegetarian_ratio:.0%} vegetarian")
+    if profile.spiciness_tolerance is not None:
+        parts.append(f"spiciness around {profile.spiciness_tolerance:.1f}/5")
+    return "; ".join(parts)
+
+
+def menu_chars(menu: Sequence[MenuItem]) -> int:
+    return sum(len(menu_line(item)) + 1 for item in menu)
+
+
+def _mentions(text: str, phrase: str) -> bool:
+    # Whole words only, so "rice" is not found in "price"
+    return re.search(rf"(?<![a-z0-9]){re.escape(phrase)}(?![a-z0-9])", text) is not None
+
+
+def _constraint_mask(request: RecommendationRequest, features: MenuFeatures) -> np.ndarray:
+    preference = (request.user_preference or "").lower()
+    words = set(re.findall(r"[a-z]+", preference))
+    item_words = [
+        set(re.findall(r"[a-z]+", f"{item.name} {item.category or ''} {item.description or ''}".lower()))
+        for item in features.menu
+    ]
+    mask = np.ones(len(item_words), dtype=bool)
+
+    ceiling = PRICE_CEILING.search(preference)
+    if ceiling:
+        mask &= features.prices <= float(ceiling.group(1))
+
+    for word, markers in DIETARY_WORDS.items():
+        if word in words:
+            mask &= np.array([bool(markers & tokens) for tokens in item_words])
+
+    categories = {category for category in features.categories if category}
+    named = {category for category in categories if _mentions(preference, category)}
+    if named:
+        mask &= np.array([category in named for category in features.categories])
+    return mask
+
+
+def meets_constraints(request: RecommendationRequest, name: str) -> bool:
+    """
+    Whether the named item meets the price, diet and category constraints of
+    the request's preference
+
+    Always true when nothing on the menu meets them, since the model then has
+    to pick something else.
+    """
+    features = MenuFeatures(request.restaurant_menu)
+    mask = _constraint_mask(request, features)
+    return not mask.any() or any(mask[row] for row, item in enumerate(features.menu) if item.name == name)
+
+
+def select_candidates(
+        request: RecommendationRequest,
+        index: MenuIndex,
+        meal_time: str,
+        limit: int = RECOMMENDATION_PROMPT_CANDIDATES,
+        recommender: LocalRecommender = local_recommender
+) -> List[int]:
+    """
+    Menu rows worth showing the model, in menu order
+
+    Returns every row when the menu already fits ``limit``.
+    """
+    menu = request.restaurant_menu
+    if len(menu) <= limit:
+        return list(range(len(menu)))
+
+    features = MenuFeatures(menu)
+    scores = feature_matrix(request, meal_time, features) @ recommender.weights
+    query = " ".join([request.user_preference or "", *(request.user_previous_orders or [])]).strip()
+    if query:
+        scores += 2.0 * index.similarity([query])[0]
+
+    # Items meeting every constraint rank first; the best of the rest fill
+    # any remaining slots so the model always has a choice
+    scores += np.where(_constraint_mask(request, features), CONSTRAINT_BONUS, 0.0)
+
+    top = np.argsort(-scores, kind="stable")[:limit]
+    return sorted(int(row) for row in top)
+
+
+def select_group_candidates(
+        requests: Sequence[RecommendationRequest],
+        index: MenuIndex,
+        meal_time: str,
+        limit: int = RECOMMENDATION_PROMPT_CANDIDATES
+) -> List[int]:
+    """
+    Menu rows worth showing the model for customers sharing one menu, in menu order
+
+    Every customer gets an equal share of ``limit`` chosen with their own
+    preference and constraints, so one diner's price ceiling or diet never
+    narrows what the others can be offered.
+    """
+    menu = requests[0].restaurant_menu
+    if len(menu) <= limit:
+        return list(range(len(menu)))
+    share = max(limit // len(requests), 1)
+    rows = set()
+    for request in requests:
+        rows.update(select_candidates(request, index, meal_time, share))
+    return sorted(rows)
+
+
+def _compact_menu(menu: Sequence[MenuItem], rows: Sequence[int]) -> List[MenuItem]:
+    return [
+        menu[row].model_copy(update={"description": compact_text(menu[row].description) or None})
+        for row in rows
+    ]
+
+
+def compact_request(request: RecommendationRequest, index: MenuIndex, meal_time: str,
+                    limit: int = RECOMMENDATION_PROMPT_CANDIDATES) -> RecommendationRequest:
+    """The request with its menu narrowed to candidates and descriptions shortened"""
+    menu = _compact_menu(request.restaurant_menu, select_candidates(request, index, meal_time, limit))
+    return request.model_copy(update={"restaurant_menu": menu})
+
+
+async def compact_request_async(request: RecommendationRequest, index: MenuIndex, meal_time: str,
+                                limit: int = RECOMMENDATION_PROMPT_CANDIDATES) -> RecommendationRequest:
+    """compact_request() for the event loop: menus that need ranking are compacted in a thread"""
+    if len(request.restaurant_menu) <= limit:
+        return compact_request(request, index, meal_time, limit)
+    return await asyncio.to_thread(compact_request, request, index, meal_time, limit)
+
+
+def compact_group(requests: Sequence[RecommendationRequest], index: MenuIndex, meal_time: str,
+                  limit: int = RECOMMENDATION_PROMPT_CANDIDATES) -> List[MenuItem]:
+    """The menu shown to a group: every customer's candidates, descriptions shortened"""
+    return _compact_menu(requests[0].restaurant_menu, select_group_candidates(requests, index, meal_time, limit))
+
+
+async def compact_group_async(requests: Sequence[RecommendationRequest], index: MenuIndex, meal_time: str,
+                              limit: int = RECOMMENDATION_PROMPT_CANDIDATES) -> List[MenuItem]:
+    """compact_group() for the event loop: menus that need ranking are compacted in a thread"""
+    if len(requests[0].restaurant_menu) <= limit:
+        return compact_group(requests, index, meal_time, limit)
+    return await asyncio.to_thread(compact_group, requests, index, meal_time, limit)
+
+
+class PromptStats:
+    """Running totals of prompt size before and after compaction"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.items_before = 0
+        self.items_after = 0
+        self.chars_before = 0
+        self.chars_after = 0
+
+    def record(self, items_before: int, items_after: int, chars_before: int, chars_after: int) -> dict:
+        with self._lock:
+            self.prompts += 1
+            self.items_before += items_before
+            self.items_after += items_after
+            self.chars_before += chars_before
+            self.chars_after += chars_after
+        return {
+            "items_before": items_before,
+            "items_after": items_after,
+            "chars_before": chars_before,
+            "chars_after": chars_after,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "prompts": self.prompts,
+            "items_before": self.items_before,
+            "items_after": self.items_after,
+            "chars_before": self.chars_before,
+            "chars_after": self.chars_after,
+            # Roughly four characters per token for English text
+            "approx_tokens_saved": (self.chars_before - self.chars_after) // 4,
+            "reduction": round(1 - self.chars_after / self.chars_before, 4) if self.chars_before else 0.0,
+        }
+
+
+prompt_stats = PromptStats()
@@ -0,0 +1,263 @@
+"""
+Rate limiting and load shedding in front of the model.
+
+Every request draws from a per-IP bucket (``ip``) and from a bucket for
+its route class:
+
+- ``recommend``: single and streamed recommendations
+- ``batch``: batch recommendations (each can hold many requests)
+- ``read``: stats and everything else
+
+Behind the backend every request would come from the backend's address,
+so one route class bucket would cap all of its users together. The backend
+therefore sends the user it acts for in ``X-User-Id``, together with
+``RECOMMENDATIONS_SHARED_SECRET`` in ``X-Internal-Token``; only requests
+carrying the secret have their route class buckets keyed per user. The
+per-IP bucket is charged either way, so a forged user id never gets a
+client more than the ``ip`` rate. Buckets are per process unless
+``RATE_LIMIT_REDIS_URL`` points at a shared Redis.
+
+Independently, requests are shed with 503 when ``SHED_MAX_IN_FLIGHT``
+requests are already running, or with rising probability once event-loop
+lag passes ``SHED_MAX_LAG_MS``.
+
+The token bucket script and stores mirror ``backend/app/core/ratelimit.py``.
+They are copied rather than shared because the two apps are built as
+separate Docker contexts, and who a request is charged to differs.
+"""
+import hmac
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .loop_lag import lag_monitor
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # without redis, buckets stay per process
+    aioredis = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "<requests>/<second|minute|hour>"; the request count is also the burst size
+RATE_LIMITS = {
+    "ip": os.getenv("RATE_LIMIT_IP", "1200/minute"),
+    "recommend": os.getenv("RATE_LIMIT_RECOMMEND", "120/minute"),
+    "batch": os.getenv("RATE_LIMIT_BATCH", "10/minute"),
+    "read": os.getenv("RATE_LIMIT_READ", "600/minute"),
+}
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 10000))
+# Set only behind a proxy that overwrites X-Forwarded-For
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+# Shared with the backend; without it X-User-Id is never trusted
+RECOMMENDATIONS_SHARED_SECRET = os.getenv("RECOMMENDATIONS_SHARED_SECRET", "")
+USER_ID_HEADER = "x-user-id"
+INTERNAL_TOKEN_HEADER = "x-internal-token"
+# 0 disables a check
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", 64))
+SHED_MAX_LAG_MS = float(os.getenv("SHED_MAX_LAG_MS", 250))
+
+EXEMPT_PATHS = ("/health", "/livez", "/readyz")
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# Refill by elapsed time and take one token atomically; returns seconds to wait
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = math.min(capacity, (tonumber(state[1]) or capacity) + (now - (tonumber(state[2]) or now)) * refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return tostring(wait)
+"""
+
+
+def parse_rate(value: str) -> Tuple[int, float]:
+    """(capacity, tokens refilled per second) for a rate such as "10/minute" """
+    requests, _, unit = value.strip().partition("/")
+    return int(requests), int(requests) / PERIODS[unit.strip().rstrip("s") or "second"]
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, capacity: int, refill: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - updated) * refill)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / refill
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisBuckets:
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = MemoryBuckets()
+
+    async def take(self, key: str, capacity: int, refill: float) -> float:
+        try:
+            return float(await self._script(keys=[f"recommendations:ratelimit:{key}"], args=[capacity, refill]))
+        except Exception as e:
+            logger.error(f"Redis rate limit store failed, using process-local buckets: {str(e)}")
+            return await self._fallback.take(key, capacity, refill)
+
+
+def create_buckets():
+    if RATE_LIMIT_REDIS_URL and aioredis is not None:
+        return RedisBuckets(RATE_LIMIT_REDIS_URL)
+    return MemoryBuckets()
+
+
+def route_class(path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS:
+        return None
+    if path.startswith("/recommend/batch"):
+        return "batch"
+    if path.startswith("/recommend"):
+        return "recommend"
+    return "read"
+
+
+def client_ip(scope: Scope) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def is_internal(headers: Headers, secret: str = RECOMMENDATIONS_SHARED_SECRET) -> bool:
+    """Whether a request carries the secret shared with the backend (never, while it is unset)"""
+    token = headers.get(INTERNAL_TOKEN_HEADER, "")
+    return bool(secret) and hmac.compare_digest(token.encode(), secret.encode())
+
+
+def rate_key(scope: Scope, secret: str = RECOMMENDATIONS_SHARED_SECRET) -> str:
+    """Route class bucket key: the forwarded user when the backend's secret is sent, else the client address"""
+    headers = Headers(scope=scope)
+    user_id = headers.get(USER_ID_HEADER)
+    if user_id and is_internal(headers, secret):
+        return f"user:{user_id}"
+    return client_ip(scope)
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class Protection:
+    """Buckets, in-flight count and counters shared by the middleware and /limits/stats"""
+
+    def __init__(self, rates: Optional[Dict[str, str]] = None, buckets=None,
+                 max_in_flight: int = SHED_MAX_IN_FLIGHT, max_lag_ms: float = SHED_MAX_LAG_MS,
+                 monitor=lag_monitor, rate_limit: bool = RATE_LIMIT_ENABLED,
+                 secret: str = RECOMMENDATIONS_SHARED_SECRET):
+        self.rates = {name: parse_rate(rate) for name, rate in (rates or RATE_LIMITS).items()}
+        self.buckets = buckets or create_buckets()
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag_ms / 1000
+        self.monitor = monitor
+        self.rate_limit = rate_limit
+        self.secret = secret
+        self.in_flight = 0
+        self.counters: Dict[str, int] = {"allowed": 0, "shed_in_flight": 0, "shed_lag": 0}
+
+    def shed_reason(self) -> Optional[str]:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "shed_in_flight"
+        if self.max_lag and self.monitor.lag > self.max_lag:
+            # Shed a growing share of requests, all of them at twice the threshold
+            if random.random() < (self.monitor.lag - self.max_lag) / self.max_lag:
+                return "shed_lag"
+        return None
+
+    async def wait_time(self, scope: Scope, request_class: str) -> float:
+        """0 if the client may proceed, else seconds until its bucket refills"""
+        if not self.rate_limit:
+            return 0.0
+        for name, key in (("ip", client_ip(scope)), (request_class, rate_key(scope, self.secret))):
+            wait = await self.buckets.take(f"{name}:{key}", *self.rates[name])
+            if wait:
+                counter = f"limited_{name}"
+                self.counters[counter] = self.counters.get(counter, 0) + 1
+                return wait
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "buckets": type(self.buckets).__name__,
+            "in_flight": self.in_flight,
+            **self.counters,
+            **self.monitor.stats(),
+        }
+
+
+class ProtectionMiddleware:
+    """Load shedding first (cheap), then the client's rate limit"""
+
+    def __init__(self, app: ASGIApp, protection: Optional[Protection] = None):
+        self.app = app
+        self.protection = protection or service_protection
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_class = route_class(scope["path"]) if scope["type"] == "http" else None
+        if request_class is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        protection = self.protection
+        reason = protection.shed_reason()
+        if reason:
+            protection.counters[reason] += 1
+            await _reject(503, "Service is overloaded, try again shortly", 1)(scope, receive, send)
+            return
+
+        wait = await protection.wait_time(scope, request_class)
+        if wait:
+            await _reject(429, "Too many requests", wait)(scope, receive, send)
+            return
+
+        protection.counters["allowed"] += 1
+        protection.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            protection.in_flight -= 1
+
+
+service_protection = Protection()
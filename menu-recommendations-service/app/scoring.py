@@ -0,0 +1,262 @@
+"""
+Local menu scoring that needs no model call.
+
+Each menu item gets a row of features, computed with NumPy over the whole
+menu at once:
+
+- keyword: overlap between the user's preference and the item's name,
+  category and description
+- category: the item's category was named in the preference, ordered
+  before, or takes a large share of the user's taste profile
+- history: embedding similarity to previously ordered (or favorite) items
+- price: closeness to the price band the preference asks for (or, without
+  one, to the user's usual spend)
+- meal_time: how well the item fits the current meal time
+- taste: fit with the profile's vegetarian ratio and spiciness tolerance
+
+The profile is optional and fixed-size, so scoring never depends on how
+long a user's order history is.
+
+The weighted sum ranks the menu. ``LocalRecommender`` is the primary path
+for simple keyword-style preferences and the fallback when the model fails.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embeddings import index_store
+from .models import MenuItem, Recommendation, RecommendationRequest, UserProfile
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "any", "at", "but", "for", "i", "im", "in", "is", "it", "like", "me",
+    "my", "of", "on", "or", "please", "some", "something", "that", "the", "to", "want",
+    "with", "would", "today", "tonight", "really", "very", "food", "dish", "eat", "have",
+}
+
+CHEAP_WORDS = {"cheap", "budget", "affordable", "inexpensive", "value", "light", "small", "snack"}
+PREMIUM_WORDS = {"premium", "fancy", "expensive", "treat", "special", "big", "hearty", "filling"}
+
+MEAL_TIME_KEYWORDS = {
+    "breakfast": {"breakfast", "egg", "eggs", "omelette", "pancake", "pancakes", "waffle", "toast",
+                  "coffee", "tea", "bagel", "croissant", "yogurt", "granola", "juice", "smoothie"},
+    "lunch": {"salad", "sandwich", "wrap", "bowl", "soup", "burrito", "taco", "tacos", "ramen",
+              "noodle", "noodles", "sushi", "bento", "panini", "lunch"},
+    "dinner": {"steak", "curry", "pasta", "risotto", "pizza", "lasagna", "grill", "grilled",
+               "roast", "biryani", "salmon", "chicken", "beef", "lamb", "dinner"},
+    "late night": {"pizza", "burger", "fries", "wings", "nachos", "dessert", "ice", "cream",
+                   "snack", "hot", "dog", "quesadilla", "dumplings"},
+}
+
+FEATURES = ("keyword", "category", "history", "price", "meal_time", "taste")
+DEFAULT_WEIGHTS = {
+    "keyword": 3.0, "category": 1.5, "history": 1.0, "price": 0.75, "meal_time": 0.5, "taste": 1.0,
+}
+# Spiciness levels run from 1 to 5
+SPICINESS_RANGE = 4.0
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+def _stem(token: str) -> str:
+    # Crude plural folding so "noodles" matches "noodle"
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def _token_set(text: Optional[str]) -> set:
+    return {_stem(token) for token in tokenize(text)}
+
+
+class MenuFeatures:
+    """Token matrix for a menu, built once per request"""
+
+    def __init__(self, menu: Sequence[MenuItem]):
+        self.menu = list(menu)
+        item_tokens = [
+            _token_set(f"{item.name} {item.category or ''} {item.description or ''}")
+            for item in self.menu
+        ]
+        self.vocabulary: Dict[str, int] = {}
+        for tokens in item_tokens:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        self.matrix = np.zeros((len(self.menu), max(len(self.vocabulary), 1)), dtype=np.float32)
+        for row, tokens in enumerate(item_tokens):
+            self.matrix[row, [self.vocabulary[token] for token in tokens]] = 1.0
+
+        self.prices = np.array([item.price for item in self.menu], dtype=np.float32)
+        self.categories = [(item.category or "").lower() for item in self.menu]
+        self.names = [item.name.lower() for item in self.menu]
+        # NaN where the menu does not say
+        self.vegetarian = np.array([
+            np.nan if item.is_vegetarian is None else float(item.is_vegetarian) for item in self.menu
+        ], dtype=np.float32)
+        self.spiciness = np.array([
+            np.nan if item.spiciness_level is None else float(item.spiciness_level) for item in self.menu
+        ], dtype=np.float32)
+
+    def vector(self, tokens: set) -> np.ndarray:
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        indices = [self.vocabulary[token] for token in tokens if token in self.vocabulary]
+        vector[indices] = 1.0
+        return vector
+
+    def covers(self, tokens: set) -> bool:
+        return all(token in self.vocabulary for token in tokens)
+
+
+def feature_matrix(request: RecommendationRequest, meal_time: str,
+                   features: Optional[MenuFeatures] = None) -> np.ndarray:
+    """
+    Score every menu item on every feature
+
+    Returns:
+        np.ndarray: (len(menu), len(FEATURES)) matrix of values in [0, 1]
+    """
+    features = features or MenuFeatures(request.restaurant_menu)
+    count = len(features.menu)
+    profile = request.user_profile
+    preference = _token_set(request.user_preference)
+    content_preference = preference - CHEAP_WORDS - PREMIUM_WORDS
+
+    # Keyword overlap: fraction of the preference found in each item
+    if content_preference:
+        keyword = features.matrix @ features.vector(content_preference) / len(content_preference)
+    else:
+        keyword = np.zeros(count, dtype=np.float32)
+
+    # Previously ordered items on this menu, matched by name
+    previous_orders = request.user_previous_orders or (profile.favorite_items if profile else [])
+    previous_names = {order.lower() for order in previous_orders}
+    ordered_rows = [row for row, name in enumerate(features.names) if name in previous_names]
+
+    ordered_categories = {features.categories[row] for row in ordered_rows}
+    category = np.array([
+        1.0 if name and (_token_set(name) & preference or name in ordered_categories) else 0.0
+        for name in features.categories
+    ], dtype=np.float32)
+    if profile and profile.category_shares:
+        shares = {name.lower(): share for name, share in profile.category_shares.items()}
+        top_share = max(shares.values()) or 1.0
+        category = np.maximum(category, np.array([
+            shares.get(name, 0.0) / top_share for name in features.categories
+        ], dtype=np.float32))
+
+    if previous_orders:
+        # Closest previous order per item, by embedding similarity
+        index = index_store.get(features.menu, request.restaurant_id)
+        history = np.clip(index.similarity(previous_orders).max(axis=0), 0.0, 1.0)
+    else:
+        history = np.zeros(count, dtype=np.float32)
+
+    # Price: preference for cheap/premium, else closeness to the usual spend
+    spread = float(features.prices.max() - features.prices.min()) if count else 0.0
+    if spread > 0:
+        relative = (features.prices - features.prices.min()) / spread
+        if preference & CHEAP_WORDS:
+            price = 1.0 - relative
+        elif preference & PREMIUM_WORDS:
+            price = relative
+        elif ordered_rows:
+            usual = float(features.prices[ordered_rows].mean())
+            price = 1.0 - np.minimum(np.abs(features.prices - usual) / spread, 1.0)
+        elif profile and profile.average_price:
+            price = 1.0 - np.minimum(np.abs(features.prices - profile.average_price) / spread, 1.0)
+        else:
+            price = np.full(count, 0.5, dtype=np.float32)
+    else:
+        price = np.full(count, 0.5, dtype=np.float32)
+
+    meal_words = {_stem(word) for word in MEAL_TIME_KEYWORDS.get(meal_time, ())}
+    meal_time_prior = np.minimum(features.matrix @ features.vector(meal_words), 1.0)
+
+    taste = _taste_fit(profile, features) if profile else np.zeros(count, dtype=np.float32)
+
+    return np.stack([keyword, category, history, price, meal_time_prior, taste], axis=1).astype(np.float32)
+
+
+def _taste_fit(profile: UserProfile, features: MenuFeatures) -> np.ndarray:
+    """
+    How well each item suits the profile's diet and spice tolerance, in [0, 1]
+
+    Non-vegetarian items lose fit as the vegetarian ratio grows (items of
+    unknown diet lose half as much). Items hotter than the usual spiciness
+    lose fit with the difference; milder ones do not.
+    """
+    ratio = profile.vegetarian_ratio
+    diet = np.where(np.isnan(features.vegetarian), 1.0 - ratio / 2, np.where(features.vegetarian > 0, 1.0, 1.0 - ratio))
+    if profile.spiciness_tolerance is None:
+        spice = np.ones(len(features.menu), dtype=np.float32)
+    else:
+        excess = np.nan_to_num(features.spiciness - profile.spiciness_tolerance, nan=0.0)
+        spice = 1.0 - np.clip(excess / SPICINESS_RANGE, 0.0, 1.0)
+    return (diet * spice).astype(np.float32)
+
+
+class LocalRecommender:
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.weights = np.array([weights[name] for name in FEATURES], dtype=np.float32)
+
+    def rank(self, request: RecommendationRequest, meal_time: str, k: int = 3,
+             features: Optional[MenuFeatures] = None) -> List[Tuple[int, float, np.ndarray]]:
+        """
+        Top-k menu rows as (index, score, feature row), best first
+
+        Ties keep menu order, so results are deterministic.
+        """
+        if not request.restaurant_menu:
+            return []
+        matrix = feature_matrix(request, meal_time, features)
+        scores = matrix @ self.weights
+        k = min(k, len(scores))
+        # Stable sort on the negated scores keeps menu order for ties
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(int(row), float(scores[row]), matrix[row]) for row in top]
+
+    def recommend(self, request: RecommendationRequest, meal_time: str, k: int = 1) -> Recommendation:
+        ranked = self.rank(request, meal_time, k)
+        if not ranked:
+            raise ValueError("Restaurant menu is empty")
+
+        items = [request.restaurant_menu[row].name for row, _, _ in ranked]
+        return Recommendation(recommended_items=items, reasoning=self.explain(request, ranked[0], meal_time))
+
+    def explain(self, request: RecommendationRequest, best: Tuple[int, float, np.ndarray], meal_time: str) -> str:
+        row, _, values = best
+        item = request.restaurant_menu[row]
+        contributions = values * self.weights
+        reasons = {
+            "keyword": f"it matches what you asked for ({request.user_preference})",
+            "category": f"you like {item.category or 'this kind of'} food",
+            "history": "it is similar to what you ordered before",
+            "price": f"it fits your budget at ${item.price:.2f}",
+            "meal_time": f"it is a good pick for {meal_time}",
+            "taste": "it suits your usual tastes",
+        }
+        order = np.argsort(-contributions, kind="stable")
+        chosen = [reasons[FEATURES[index]] for index in order[:2] if contributions[index] > 0]
+        if not chosen:
+            return f"{item.name} is a popular choice on this menu."
+        return f"We recommend {item.name} because " + " and ".join(chosen) + "."
+
+    def is_simple(self, request: RecommendationRequest, features: Optional[MenuFeatures] = None) -> bool:
+        """
+        Whether local scoring can answer without the model
+
+        True when there is no free-text preference, or every word of a short
+        preference appears on the menu (e.g. "spicy", "vegetarian pasta").
+        """
+        preference = _token_set(request.user_preference) - CHEAP_WORDS - PREMIUM_WORDS
+        if not preference:
+            return True
+        features = features or MenuFeatures(request.restaurant_menu)
+        return len(preference) <= 3 and features.covers(preference)
+
+
+local_recommender = LocalRecommender()
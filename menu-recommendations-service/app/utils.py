@@ -1,14 +1,37 @@
+import asyncio
+import logging
 import os
+import re
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import google.generativeai as genai
 from dotenv import load_dotenv
 
 from .models import MenuItem, Recommendation, RecommendationRequest, RecommendationAgent
+from .embeddings import index_store
+from .prompting import (
+    compact_group_async, compact_request_async, meets_constraints, menu_chars, menu_line, profile_text, prompt_stats
+)
+from .scoring import local_recommender
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+# Hard deadline for one recommendation, including time spent waiting for a slot
+RECOMMENDATION_TIMEOUT_SECONDS = float(os.getenv("RECOMMENDATION_TIMEOUT_SECONDS", 8))
+# Model calls allowed at once per worker
+RECOMMENDATION_MAX_CONCURRENCY = int(os.getenv("RECOMMENDATION_MAX_CONCURRENCY", 4))
+# Requests allowed to wait for a slot before answering with the fallback immediately
+RECOMMENDATION_MAX_QUEUE = int(os.getenv("RECOMMENDATION_MAX_QUEUE", 16))
+# When to answer with local scoring instead of the model:
+# - "never" (default): every request reaches the model; local scoring is only the fallback
+# - "simple": also requests without a preference, or with a short one found word for word on the menu
+# - "always": never call the model
+RECOMMENDATION_LOCAL_MODE = os.getenv("RECOMMENDATION_LOCAL_MODE", "never")
+
 def get_current_meal_time():
     hour = datetime.now().hour
     if 5 <= hour < 11:
@@ -20,31 +43,76 @@ def get_current_meal_time():
     else:
         return "late night"
 
-class MenuRecommendationAgent(RecommendationAgent):
-    def recommend(self, request: RecommendationRequest) -> Recommendation:
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("Gemini API key not found. Please check your .env file.")
+class GeminiModel:
+    """Gemini client configured once and called through its async API"""
 
+    def __init__(self, api_key: str, model_name: str = GEMINI_MODEL):
         genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
 
-        meal_time = get_current_meal_time()
-
-        menu_text = "\n".join([
-            f"- {item.name}: ${item.price:.2f} ({item.category or 'No category'}) - {item.description or 'No description'}"
-            for item in request.restaurant_menu
-        ])
+    async def generate(self, prompt: str, timeout: float) -> str:
+        response = await self._model.generate_content_async(prompt, request_options={"timeout": timeout})
+        return response.text
 
-        previous_orders_text = (
-            f"Previously ordered items: {', '.join(request.user_previous_orders)}"
-            if request.user_previous_orders
-            else "No previous order history"
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        response = await self._model.generate_content_async(
+            prompt, stream=True, request_options={"timeout": timeout}
         )
+        async for chunk in response:
+            yield chunk.text
+
+class FakeModel:
+    """
+    Local stand-in for Gemini, for tests and running without an API key
+
+    Replies with ``response_text`` (or the first menu line of the prompt)
+    after ``delay`` seconds.
+    """
+
+    def __init__(self, response_text: Optional[str] = None, delay: float = 0.0):
+        self.response_text = response_text
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.response_text is not None:
+            return self.response_text
+        first_item = next((line.strip()[2:] for line in prompt.splitlines() if line.strip().startswith("- ")), "")
+        return f"{first_item.split(':')[0]} is a great choice right now."
 
-        preference_text = f"User's specific preference: {request.user_preference}" if request.user_preference else ""
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        text = await self.generate(prompt, timeout)
+        for word in text.split(" "):
+            yield word + " "
 
-        prompt = f"""
-        You are an expert restaurant recommendation AI for {meal_time}. 
+def create_model():
+    """Build the model client from the environment; None means fallback only"""
+    if os.getenv("RECOMMENDATION_MODEL") == "fake":
+        return FakeModel()
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        logger.error("Gemini API key not found. Please check your .env file. Serving fallback recommendations.")
+        return None
+    return GeminiModel(api_key)
+
+def build_prompt(request: RecommendationRequest, meal_time: str) -> str:
+    menu_text = "\n".join([menu_line(item) for item in request.restaurant_menu])
+
+    previous_orders_text = (
+        f"Previously ordered items: {', '.join(request.user_previous_orders)}"
+        if request.user_previous_orders
+        else "No previous order history"
+    )
+
+    preference_text = f"User's specific preference: {request.user_preference}" if request.user_preference else ""
+    tastes = profile_text(request.user_profile)
+    profile_line = f"User's usual tastes: {tastes}" if tastes else ""
+
+    return f"""
+        You are an expert restaurant recommendation AI for {meal_time}.
         Help find the perfect menu item based on the following context:
 
         Available Menu Items:
@@ -52,6 +120,8 @@ class MenuRecommendationAgent(RecommendationAgent):
 
         {previous_orders_text}
 
+        {profile_line}
+
         {preference_text}
 
         Recommendation Guidelines:
@@ -67,24 +137,118 @@ class MenuRecommendationAgent(RecommendationAgent):
         - If no perfect match is found, suggest the closest alternative
         """
 
+def build_group_prompt(requests: List[RecommendationRequest], meal_time: str) -> str:
+    """One prompt asking for a recommendation per customer of the same restaurant"""
+    menu_text = "\n".join([menu_line(item) for item in requests[0].restaurant_menu])
+    customers_text = "\n".join([
+        f"Customer {number}: "
+        f"previously ordered {', '.join(request.user_previous_orders) if request.user_previous_orders else 'nothing'}; "
+        f"preference: {request.user_preference or 'none'}; "
+        f"usual tastes: {profile_text(request.user_profile) or 'unknown'}"
+        for number, request in enumerate(requests, 1)
+    ])
+
+    return f"""
+        You are an expert restaurant recommendation AI for {meal_time}.
+        Recommend ONE menu item for EACH customer below.
+
+        Available Menu Items:
+        {menu_text}
+
+        Customers:
+        {customers_text}
+
+        Recommendation Guidelines:
+        1. Current meal time is {meal_time}
+        2. Prioritize each customer's stated preference, then their order history
+        3. ONLY recommend items that EXACTLY match a name in the available menu items
+
+        Reply with exactly one line per customer, in this form:
+        <customer number>. <exact menu item name> - <brief reason>
+        """
+
+GROUP_ANSWER_LINE = re.compile(r"^\W*(?:customer\s*)?(\d+)\s*[.):-]\s*(.+)$", re.IGNORECASE)
+
+def parse_group_answer(text: str, count: int) -> Dict[int, str]:
+    """Answer text per customer number (1-based) from a group reply"""
+    answers = {}
+    for line in text.splitlines():
+        match = GROUP_ANSWER_LINE.match(line.strip())
+        if match and 1 <= int(match.group(1)) <= count:
+            answers.setdefault(int(match.group(1)), match.group(2).strip())
+    return answers
+
+def fallback_recommendation(request: RecommendationRequest, reason: str) -> Recommendation:
+    """
+    Deterministic answer used when the model is unavailable, slow or saturated
+    """
+    recommendation = local_recommender.recommend(request, get_current_meal_time())
+    recommendation.reasoning = f"{reason} {recommendation.reasoning}"
+    recommendation._degraded = True
+    return recommendation
+
+def record_prompt_size(full_menu: List[MenuItem], prompt_menu: List[MenuItem], prompt: str) -> None:
+    # The prompt would have differed only in its menu lines without compaction
+    chars_before = len(prompt) - menu_chars(prompt_menu) + menu_chars(full_menu)
+    report = prompt_stats.record(len(full_menu), len(prompt_menu), chars_before, len(prompt))
+    logger.debug(f"Prompt size: {report}")
+
+def use_local_recommender(request: RecommendationRequest) -> bool:
+    if RECOMMENDATION_LOCAL_MODE == "always":
+        return True
+    if RECOMMENDATION_LOCAL_MODE == "simple":
+        return local_recommender.is_simple(request)
+    return False
+
+class MenuRecommendationAgent(RecommendationAgent):
+    def __init__(
+            self,
+            llm=None,
+            timeout: float = RECOMMENDATION_TIMEOUT_SECONDS,
+            max_concurrency: int = RECOMMENDATION_MAX_CONCURRENCY,
+            max_queue: int = RECOMMENDATION_MAX_QUEUE
+    ):
+        super().__init__()
+        self.llm = llm
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # Requests holding or waiting for a slot
+        self._pending = 0
+
+    async def _generate(self, prompt: str) -> str:
+        async with self._slots:
+            return await self.llm.generate(prompt, self.timeout)
+
+    async def recommend(self, request: RecommendationRequest) -> Recommendation:
+        if not request.restaurant_menu:
+            raise ValueError("Restaurant menu is empty")
+        # Built or loaded off the event loop; local scoring finds it in memory afterwards
+        index = await index_store.get_async(request.restaurant_menu, request.restaurant_id)
+        if use_local_recommender(request):
+            # Keyword-style requests are answered locally in well under a millisecond
+            return self.ai_validate(local_recommender.recommend(request, get_current_meal_time()))
+        if self.llm is None:
+            return self.ai_validate(fallback_recommendation(request, "AI recommendations are unavailable."))
+        if self._saturated():
+            return self.ai_validate(fallback_recommendation(request, "AI recommendations are busy."))
+
+        # Counted before compaction yields, so concurrent requests see each other in _saturated()
+        self._pending += 1
         try:
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            meal_time = get_current_meal_time()
+            compact = await compact_request_async(request, index, meal_time)
+            prompt = build_prompt(compact, meal_time)
+            record_prompt_size(request.restaurant_menu, compact.restaurant_menu, prompt)
 
-            recommendation_text = response.text.strip()
+            recommendation_text = await asyncio.wait_for(self._generate(prompt), self.timeout)
+            recommendation_text = recommendation_text.strip()
 
-            recommended_item = None
-            for item in request.restaurant_menu:
-                if item.name.lower() in recommendation_text.lower():
-                    if item.description and item.description.lower() in recommendation_text.lower():
-                        recommended_item = item.name
-                        break
-                    elif not recommended_item:
-                        recommended_item = item.name
+            recommended_item = index.match(recommendation_text)
 
             if not recommended_item:
-                recommended_item = request.restaurant_menu[0].name
-                recommendation_text = f"Unable to find a perfect match. Suggesting {recommended_item} based on available options."
+                return self.ai_validate(fallback_recommendation(request, "Unable to find a perfect match."))
 
             recommendation = Recommendation(
                 recommended_items=[recommended_item],
@@ -92,23 +256,169 @@ class MenuRecommendationAgent(RecommendationAgent):
             )
             return self.ai_validate(recommendation)
 
+        except asyncio.TimeoutError:
+            logger.error(f"Model call exceeded {self.timeout}s, serving fallback")
+            return self.ai_validate(fallback_recommendation(request, "AI recommendation timed out."))
         except Exception as e:
-            recommendation = Recommendation(
-                recommended_items=[request.restaurant_menu[0].name],
-                reasoning=f"AI recommendation failed. Recommending default item. Error: {str(e)}"
+            logger.error(f"AI recommendation failed: {str(e)}")
+            return self.ai_validate(fallback_recommendation(request, "AI recommendation failed."))
+        finally:
+            self._pending -= 1
+
+    async def recommend_stream(self, request: RecommendationRequest) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Recommend incrementally
+
+        Yields ``("item", names)`` as soon as the pick is known, then
+        ``("reasoning", text)`` chunks as the model writes them, and finally
+        ``("done", recommendation)``.
+        """
+        if not request.restaurant_menu:
+            raise ValueError("Restaurant menu is empty")
+        if use_local_recommender(request) or self.llm is None or self._saturated():
+            recommendation = await self.recommend(request)
+            yield "item", recommendation.recommended_items
+            yield "reasoning", recommendation.reasoning
+            yield "done", recommendation
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        text = ""
+        item = None
+        failure = None
+
+        self._pending += 1
+        try:
+            index = await index_store.get_async(request.restaurant_menu, request.restaurant_id)
+            meal_time = get_current_meal_time()
+            compact = await compact_request_async(request, index, meal_time)
+            prompt = build_prompt(compact, meal_time)
+            record_prompt_size(request.restaurant_menu, compact.restaurant_menu, prompt)
+
+            # Waiting for a slot counts against the deadline too
+            await asyncio.wait_for(self._slots.acquire(), deadline - loop.time())
+            try:
+                chunks = self.llm.stream(prompt, self.timeout)
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(anext(chunks), deadline - loop.time())
+                        except StopAsyncIteration:
+                            break
+                        text += chunk
+                        if item is not None:
+                            yield "reasoning", chunk
+                            continue
+                        # Only a name spelled out in full is trusted this early
+                        lowered = text.lower()
+                        if any(name.lower() in lowered for name in index.names):
+                            item = index.match(text)
+                            yield "item", [item]
+                            # Everything held back until now
+                            yield "reasoning", text
+                finally:
+                    await chunks.aclose()
+            finally:
+                self._slots.release()
+        except asyncio.TimeoutError:
+            logger.error(f"Streaming model call exceeded {self.timeout}s, serving fallback")
+            failure = "AI recommendation timed out."
+        except Exception as e:
+            logger.error(f"Streaming AI recommendation failed: {str(e)}")
+            failure = "AI recommendation failed."
+        finally:
+            self._pending -= 1
+
+        if item is None:
+            item = index.match(text) if failure is None else None
+            if item is None:
+                recommendation = self.ai_validate(
+                    fallback_recommendation(request, failure or "Unable to find a perfect match.")
+                )
+                yield "item", recommendation.recommended_items
+                yield "reasoning", recommendation.reasoning
+                yield "done", recommendation
+                return
+            yield "item", [item]
+            yield "reasoning", text
+
+        recommendation = Recommendation(recommended_items=[item], reasoning=text.strip())
+        if failure is not None:
+            # The pick was already sent; keep it but do not cache a cut-off answer
+            recommendation._degraded = True
+        yield "done", self.ai_validate(recommendation)
+
+    def _saturated(self) -> bool:
+        return self._pending >= self.max_concurrency + self.max_queue
+
+    async def recommend_group(self, requests: List[RecommendationRequest]) -> List[Recommendation]:
+        """
+        Recommend for several customers of the same menu with one model call
+
+        Customers missing from the reply, customers whose pick breaks their own
+        constraints, or the whole group when the call fails, get the local
+        fallback.
+        """
+        if len(requests) == 1 or self.llm is None or self._saturated():
+            return [await self.recommend(request) for request in requests]
+
+        first = requests[0]
+        self._pending += 1
+        try:
+            index = await index_store.get_async(first.restaurant_menu, first.restaurant_id)
+            meal_time = get_current_meal_time()
+            menu = await compact_group_async(requests, index, meal_time)
+            prompt = build_group_prompt(
+                [request.model_copy(update={"restaurant_menu": menu}) for request in requests],
+                meal_time
             )
-            return self.ai_validate(recommendation)
+            record_prompt_size(first.restaurant_menu, menu, prompt)
+
+            answers = parse_group_answer(await asyncio.wait_for(self._generate(prompt), self.timeout), len(requests))
+            reason = "Unable to find a perfect match."
+        except asyncio.TimeoutError:
+            logger.error(f"Group model call exceeded {self.timeout}s, serving fallback")
+            answers, reason = {}, "AI recommendation timed out."
+        except Exception as e:
+            logger.error(f"Group AI recommendation failed: {str(e)}")
+            answers, reason = {}, "AI recommendation failed."
+        finally:
+            self._pending -= 1
+
+        recommendations = []
+        for number, request in enumerate(requests, 1):
+            answer = answers.get(number, "")
+            item = index.match(answer) if answer else None
+            # Each customer's own price, diet and category constraints apply to their pick
+            if item and meets_constraints(request, item):
+                recommendations.append(self.ai_validate(Recommendation(recommended_items=[item], reasoning=answer)))
+            else:
+                recommendations.append(self.ai_validate(fallback_recommendation(request, reason)))
+        return recommendations
+
+_agent: Optional[MenuRecommendationAgent] = None
+
+def init_agent(llm=None) -> MenuRecommendationAgent:
+    """Create the shared agent; called once at startup (or by tests with a FakeModel)"""
+    global _agent
+    _agent = MenuRecommendationAgent(llm if llm is not None else create_model())
+    return _agent
+
+def get_agent() -> MenuRecommendationAgent:
+    return _agent if _agent is not None else init_agent()
 
 async def generate_ai_recommendation(
         menu_items: List[MenuItem],
         previous_orders: Optional[List[str]] = None,
         user_preference: Optional[str] = None,
-        is_authenticated: bool = False
+        is_authenticated: bool = False,
+        restaurant_id: Optional[str] = None
 ) -> Recommendation:
-    agent = MenuRecommendationAgent()
     request = RecommendationRequest(
         restaurant_menu=menu_items,
         user_previous_orders=previous_orders or [],
-        user_preference=user_preference
+        user_preference=user_preference,
+        restaurant_id=restaurant_id
     )
-    return agent.recommend(request)
\ No newline at end of file
+    return await get_agent().recommend(request)
@@ -0,0 +1,96 @@
+# tests/test_agent.py
+import asyncio
+
+import pytest
+
+from app import utils
+from app.models import MenuItem, RecommendationRequest
+from app.utils import FakeModel, MenuRecommendationAgent, generate_ai_recommendation, init_agent
+
+MENU = [
+    MenuItem(name="Pho", price=9, description="Beef noodle soup"),
+    MenuItem(name="Spicy Curry", price=11, category="Indian", spiciness_level=3),
+]
+
+
+class PeakModel(FakeModel):
+    """FakeModel that records how many calls ran at once"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.peak = 0
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().generate(prompt, timeout)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture(autouse=True)
+def model_only(monkeypatch):
+    # Always go to the model, and leave the shared agent as it was
+    monkeypatch.setattr(utils, "RECOMMENDATION_LOCAL_MODE", "never")
+    monkeypatch.setattr(utils, "_agent", None)
+
+
+def _request() -> RecommendationRequest:
+    return RecommendationRequest(restaurant_menu=MENU, user_preference="something spicy")
+
+
+def test_generate_ai_recommendation_uses_model():
+    """Test the happy path from generate_ai_recommendation through the shared agent"""
+    model = FakeModel("Try the Spicy Curry, it has a real kick.")
+    init_agent(model)
+
+    recommendation = asyncio.run(generate_ai_recommendation(MENU, user_preference="something spicy"))
+
+    assert recommendation.recommended_items == ["Spicy Curry"]
+    assert recommendation.reasoning == "Try the Spicy Curry, it has a real kick."
+    assert not recommendation.is_degraded
+    assert model.calls == 1
+
+
+def test_slow_model_falls_back_at_deadline():
+    """Test that a model call past the deadline is answered with the fallback"""
+    agent = MenuRecommendationAgent(FakeModel(delay=1), timeout=0.05)
+
+    recommendation = asyncio.run(agent.recommend(_request()))
+
+    assert recommendation.is_degraded
+    assert recommendation.reasoning.startswith("AI recommendation timed out.")
+    assert recommendation.recommended_items
+    assert agent._pending == 0
+
+
+def test_full_queue_rejects_with_fallback():
+    """Test that requests beyond max_concurrency + max_queue get the fallback without a model call"""
+    model = FakeModel("Pho, to warm you up.", delay=0.05)
+    agent = MenuRecommendationAgent(model, timeout=1, max_concurrency=1, max_queue=1)
+
+    async def run():
+        return await asyncio.gather(*(agent.recommend(_request()) for _ in range(4)))
+
+    recommendations = asyncio.run(run())
+
+    assert model.calls == 2
+    assert [r.is_degraded for r in recommendations] == [False, False, True, True]
+    assert all(r.reasoning.startswith("AI recommendations are busy.") for r in recommendations[2:])
+
+
+def test_semaphore_caps_concurrent_model_calls():
+    """Test that no more than max_concurrency model calls run at once"""
+    model = PeakModel("Pho, to warm you up.", delay=0.02)
+    agent = MenuRecommendationAgent(model, timeout=1, max_concurrency=2, max_queue=10)
+
+    async def run():
+        return await asyncio.gather(*(agent.recommend(_request()) for _ in range(6)))
+
+    recommendations = asyncio.run(run())
+
+    assert model.calls == 6
+    assert model.peak == 2
+    assert all(r.recommended_items == ["Pho"] for r in recommendations)
@@ -0,0 +1,117 @@
+# tests/test_batch.py
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import batch, main, utils
+from app.cache import RecommendationCache
+from app.embeddings import index_store
+from app.models import MenuItem, RecommendationRequest
+from app.utils import FakeModel, MenuRecommendationAgent, init_agent, parse_group_answer
+
+MENU = [
+    MenuItem(name="Korma", price=10, description="Mild creamy curry"),
+    MenuItem(name="Vindaloo", price=12, description="Very hot curry"),
+]
+
+
+class GroupModel(FakeModel):
+    """Answers group prompts with one line per customer, and single prompts with text"""
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        self.calls += 1
+        customers = prompt.count("; preference:")
+        if customers:
+            return "\n".join(f"{number}. Korma - mild and creamy" for number in range(1, customers + 1))
+        return "Korma is mild and creamy."
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(index_store, "directory", str(tmp_path))
+    monkeypatch.setattr(utils, "RECOMMENDATION_LOCAL_MODE", "never")
+    monkeypatch.setattr(utils, "_agent", None)
+    monkeypatch.setattr(batch, "recommendation_cache", RecommendationCache())
+
+
+def _request(preference: str, restaurant_id: str = "r1", menu=MENU) -> RecommendationRequest:
+    return RecommendationRequest(restaurant_menu=menu, user_preference=preference, restaurant_id=restaurant_id)
+
+
+def test_plan_groups_by_menu(monkeypatch):
+    """Test that requests are grouped per restaurant menu, and local ones run alone"""
+    other_menu = MENU + [MenuItem(name="Naan", price=3)]
+    requests = {
+        "a": _request("warming"),
+        "b": _request("creamy"),
+        "c": _request("hot"),
+        "d": _request("creamy", menu=other_menu),
+        "e": _request("spicy", restaurant_id="r2"),
+    }
+
+    assert batch.plan_groups(requests, 2) == [["a", "b"], ["c"], ["d"], ["e"]]
+
+    monkeypatch.setattr(utils, "RECOMMENDATION_LOCAL_MODE", "always")
+    assert batch.plan_groups(requests, 2) == [["a"], ["b"], ["c"], ["d"], ["e"]]
+
+
+def test_parse_group_answer_with_malformed_output():
+    """Test that numbered lines are picked out of chatty, partial or out-of-range replies"""
+    text = """Here are my picks:
+    1. Korma - mild
+    Customer 2) Vindaloo: for the heat
+    7. Naan - there is no customer 7
+    Enjoy your meal!
+    1. Vindaloo - a second answer for customer 1
+    """
+
+    assert parse_group_answer(text, 3) == {1: "Korma - mild", 2: "Vindaloo: for the heat"}
+    assert parse_group_answer("", 3) == {}
+
+
+def test_group_reply_missing_customers_get_fallback():
+    """Test that customers the model skipped get the local fallback"""
+    model = FakeModel("1. Vindaloo - hot, as asked\nSorry, I cannot help with the rest.")
+    agent = MenuRecommendationAgent(model, timeout=1)
+
+    recommendations = asyncio.run(agent.recommend_group([_request("hot"), _request("mild")]))
+
+    assert model.calls == 1
+    assert recommendations[0].recommended_items == ["Vindaloo"]
+    assert not recommendations[0].is_degraded
+    assert recommendations[1].is_degraded
+    assert recommendations[1].reasoning.startswith("Unable to find a perfect match.")
+
+
+def test_run_batch_deduplicates_by_fingerprint():
+    """Test that identical requests are computed once and answered at every index"""
+    model = GroupModel()
+    init_agent(model)
+    requests = [_request("warming"), _request("Warming "), _request("something hot")]
+
+    async def run():
+        return [result async for result in batch.run_batch(requests)]
+
+    results = asyncio.run(run())
+
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert model.calls == 1
+    assert batch.recommendation_cache.stats()["misses"] == 2
+    assert all(result["recommendation"]["recommended_items"] == ["Korma"] for result in results)
+
+
+def test_batch_endpoint_streams_ndjson():
+    """Test that /recommend/batch answers with one JSON object per line"""
+    init_agent(GroupModel())
+    payload = {"requests": [_request(f"preference {number}").model_dump() for number in range(4)]}
+
+    response = TestClient(main.app).post("/recommend/batch", json=payload)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.endswith("\n")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    assert all(set(line) == {"index", "recommendation"} for line in lines)
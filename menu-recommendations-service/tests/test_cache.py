@@ -0,0 +1,139 @@
+# tests/test_cache.py
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.cache import RecommendationCache, SQLiteStore, request_fingerprint
+from app.models import MenuItem, Recommendation, RecommendationRequest, UserProfile
+
+
+def _counting_compute(calls, delay=0.0, degraded=False):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        recommendation = Recommendation(recommended_items=["Pho"], reasoning="Warm and light")
+        recommendation._degraded = degraded
+        return recommendation
+    return compute
+
+
+def test_fingerprint_ignores_case_whitespace_and_order():
+    """Test that equivalent requests share a cache key"""
+    first = RecommendationRequest(
+        restaurant_menu=[MenuItem(name="Pho", price=9), MenuItem(name="Spicy  Curry", price=11, category="Indian")],
+        user_previous_orders=["Pho", "Banh Mi"],
+        user_preference="Something SPICY"
+    )
+    second = RecommendationRequest(
+        restaurant_menu=[MenuItem(name="spicy curry ", price=11.0, category="indian"), MenuItem(name="PHO", price=9.0)],
+        user_previous_orders=["banh mi", "pho"],
+        user_preference="something spicy"
+    )
+
+    assert request_fingerprint(first, "lunch") == request_fingerprint(second, "lunch")
+    assert request_fingerprint(first, "lunch") != request_fingerprint(first, "dinner")
+    second.restaurant_menu[0].price = 12
+    assert request_fingerprint(first, "lunch") != request_fingerprint(second, "lunch")
+
+
+def test_fingerprint_coarsens_the_taste_profile():
+    """Test that small profile changes keep the cache key and real changes move it"""
+    def fingerprint(**profile):
+        defaults = {"order_count": 12, "category_shares": {"Thai": 0.61, "Indian": 0.3, "Pizza": 0.05, "Salad": 0.04},
+                    "average_price": 14.2, "favorite_items": ["Pad Thai", "Korma"]}
+        request = RecommendationRequest(
+            restaurant_menu=[MenuItem(name="Pho", price=9)],
+            user_profile=UserProfile(**{**defaults, **profile})
+        )
+        return request_fingerprint(request, "dinner")
+
+    base = fingerprint()
+    assert fingerprint(order_count=13) == base
+    assert fingerprint(category_shares={"thai": 0.58, "Indian": 0.32, "Pizza": 0.06, "Sushi": 0.01}) == base
+    assert fingerprint(average_price=13.9, favorite_items=["korma", "Pad Thai"]) == base
+    assert fingerprint(category_shares={"Indian": 0.6, "Thai": 0.3}) != base
+    assert fingerprint(favorite_items=["Pad Thai"]) != base
+
+
+def test_cache_expires_and_evicts_least_recent():
+    """Test TTL expiry and LRU eviction of in-memory entries"""
+    async def run():
+        calls = []
+        cache = RecommendationCache(maxsize=2, ttl=0.1)
+        await cache.get_or_compute("a", _counting_compute(calls))
+        await cache.get_or_compute("b", _counting_compute(calls))
+        await cache.get_or_compute("a", _counting_compute(calls))
+        await cache.get_or_compute("c", _counting_compute(calls))
+        assert len(calls) == 3
+        assert cache.peek("b") is None
+        assert cache.peek("a") is not None
+
+        time.sleep(0.15)
+        assert cache.peek("a") is None
+        await cache.get_or_compute("a", _counting_compute(calls))
+        assert len(calls) == 4
+
+    asyncio.run(run())
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    """Test that cached recommendations survive a new cache on the same database"""
+    async def run():
+        calls = []
+        path = str(tmp_path / "cache.db")
+        await RecommendationCache(store=SQLiteStore(path)).get_or_compute("k", _counting_compute(calls))
+        await RecommendationCache(store=SQLiteStore(path)).get_or_compute("degraded", _counting_compute(calls, degraded=True))
+
+        restarted = RecommendationCache(store=SQLiteStore(path))
+        recommendation = await restarted.get_or_compute("k", _counting_compute(calls))
+        assert recommendation == Recommendation(recommended_items=["Pho"], reasoning="Warm and light")
+        assert restarted.persistent_hits == 1
+        await restarted.get_or_compute("degraded", _counting_compute(calls))
+        assert len(calls) == 3
+
+    asyncio.run(run())
+
+
+def test_single_flight_survives_cancelled_waiter():
+    """Test that concurrent identical requests share one computation, even if a waiter goes away"""
+    async def run():
+        calls = []
+        cache = RecommendationCache()
+        compute = _counting_compute(calls, delay=0.05)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+
+        results = await asyncio.gather(*waiters[1:])
+        assert waiters[0].cancelled()
+        assert len(calls) == 1
+        assert all(result.recommended_items == ["Pho"] for result in results)
+        assert cache.stats()["coalesced"] == 4
+        assert cache.peek("k") is not None
+
+    asyncio.run(run())
+
+
+def test_cache_stats_endpoint(monkeypatch):
+    """Test the hit and miss counters reported by /cache/stats"""
+    calls = []
+
+    async def generate(**kwargs):
+        return await _counting_compute(calls)()
+
+    monkeypatch.setattr(main, "recommendation_cache", RecommendationCache())
+    monkeypatch.setattr(main, "generate_ai_recommendation", generate)
+    client = TestClient(main.app)
+    payload = {"restaurant_menu": [{"name": "Pho", "price": 9}], "user_preference": "soup"}
+
+    assert client.post("/recommend/", json=payload).status_code == 200
+    assert client.post("/recommend/", json=payload).status_code == 200
+    stats = client.get("/cache/stats").json()
+
+    assert len(calls) == 1
+    assert stats["entries"] == 1
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.5
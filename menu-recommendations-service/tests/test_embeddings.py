@@ -0,0 +1,47 @@
+# tests/test_embeddings.py
+import os
+
+from app.embeddings import IndexStore, MenuIndex
+from app.models import MenuItem
+
+
+def _menu(*names):
+    return [MenuItem(name=name, price=10) for name in names]
+
+
+def test_index_store_persists_restaurant_menus(tmp_path):
+    """Test that restaurant indexes are saved, reloaded and replaced when the menu changes"""
+    store = IndexStore(directory=str(tmp_path))
+    store.get(_menu("Pho", "Curry"), "r1")
+    store.get(_menu("Pho", "Curry"))
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        f"{store.key(_menu('Pho', 'Curry'), 'r1')}{suffix}" for suffix in (".json", ".text.npy", ".names.npy")
+    )
+
+    reloaded = IndexStore(directory=str(tmp_path)).get(_menu("Pho", "Curry"), "r1")
+    assert reloaded.match("I'd go with the curry") == "Curry"
+
+    store.get(_menu("Pho", "Curry", "Naan"), "r1")
+    assert {name.split(".")[0] for name in os.listdir(tmp_path)} == {store.key(_menu("Pho", "Curry", "Naan"), "r1")}
+
+
+def test_index_store_caps_persisted_indexes(tmp_path):
+    """Test that the oldest indexes are removed beyond max_persisted"""
+    store = IndexStore(directory=str(tmp_path), max_persisted=2)
+    for number, restaurant_id in enumerate(("r1", "r2", "r3")):
+        store.get(_menu("Pho"), restaurant_id)
+        os.utime(tmp_path / f"{store.key(_menu('Pho'), restaurant_id)}.json", (number, number))
+
+    keys = {name.split(".")[0] for name in os.listdir(tmp_path)}
+    assert keys == {store.key(_menu("Pho"), "r2"), store.key(_menu("Pho"), "r3")}
+    assert len(os.listdir(tmp_path)) == 6
+
+
+def test_match_prefers_the_earliest_mention():
+    """Test that the dish named first wins over longer names mentioned while reasoning"""
+    index = MenuIndex.build(_menu("Garden Salad", "Chicken Caesar Salad", "Chicken Tikka", "Chicken Tikka Masala", "Rice"))
+
+    assert index.match("Garden Salad. Unlike the Chicken Caesar Salad, it skips the heavy dressing.") == "Garden Salad"
+    assert index.match("I'd go with the Chicken Tikka Masala, it is creamy.") == "Chicken Tikka Masala"
+    # Whole words only: "price" does not mention Rice
+    assert index.match("At this price the Chicken Tikka is hard to beat.") == "Chicken Tikka"
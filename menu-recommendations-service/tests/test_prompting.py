@@ -0,0 +1,67 @@
+# tests/test_prompting.py
+import asyncio
+
+from app.embeddings import MenuIndex
+from app.models import MenuItem, RecommendationRequest
+from app.prompting import (
+    _constraint_mask, compact_request, compact_request_async, meets_constraints, select_group_candidates
+)
+from app.scoring import MenuFeatures
+
+
+def test_compact_request_async_matches_sync():
+    """Test that compaction off the event loop narrows large menus like the sync version"""
+    menu = [MenuItem(name=f"Dish {number}", price=5 + number, category="Mains") for number in range(40)]
+    menu.append(MenuItem(name="Green Curry", price=12, category="Mains", description="Thai curry, medium hot"))
+    request = RecommendationRequest(restaurant_menu=menu, user_preference="thai curry under $15")
+    index = MenuIndex.build(menu)
+
+    compact = asyncio.run(compact_request_async(request, index, "dinner", limit=10))
+
+    assert compact == compact_request(request, index, "dinner", limit=10)
+    assert len(compact.restaurant_menu) == 10
+    assert "Green Curry" in [item.name for item in compact.restaurant_menu]
+
+    small = asyncio.run(compact_request_async(request, index, "dinner", limit=100))
+    assert len(small.restaurant_menu) == len(menu)
+
+
+def test_constraint_mask_matches_whole_words():
+    """Test that dietary words and categories only match whole words"""
+    menu = [
+        MenuItem(name="Egg Fried Rice", price=8, category="Rice"),
+        MenuItem(name="Veggie Burger", price=10, category="Burgers"),
+        MenuItem(name="Prawn Crackers", price=4, category="Sides", description="Market price"),
+        MenuItem(name="Omelette", price=7, category="Egg")
+    ]
+    features = MenuFeatures(menu)
+
+    rice = RecommendationRequest(restaurant_menu=menu, user_preference="something at a fair price")
+    assert _constraint_mask(rice, features).tolist() == [True, True, True, True]
+
+    rice = RecommendationRequest(restaurant_menu=menu, user_preference="fried rice please")
+    assert _constraint_mask(rice, features).tolist() == [True, False, False, False]
+
+    veggie = RecommendationRequest(restaurant_menu=menu, user_preference="something veggie")
+    assert _constraint_mask(veggie, features).tolist() == [True, True, True, True]
+
+    vegetarian = RecommendationRequest(restaurant_menu=menu, user_preference="vegetarian")
+    assert _constraint_mask(vegetarian, features).tolist() == [False, True, False, False]
+
+
+def test_group_candidates_follow_each_customer():
+    """Test that each customer's constraints narrow only their own share of the group menu"""
+    menu = [MenuItem(name=f"Lamb Dish {number}", price=20 + number, category="Mains") for number in range(20)]
+    menu += [MenuItem(name=f"Veggie Dish {number}", price=6 + number, category="Mains") for number in range(20)]
+    cheap = RecommendationRequest(restaurant_menu=menu, user_preference="vegetarian under $10")
+    lamb = RecommendationRequest(restaurant_menu=menu, user_preference="lamb")
+    index = MenuIndex.build(menu)
+
+    names = [menu[row].name for row in select_group_candidates([cheap, lamb], index, "dinner", limit=10)]
+
+    assert len(names) <= 10
+    assert any(name.startswith("Lamb") for name in names)
+    assert any(name.startswith("Veggie") for name in names)
+    assert not meets_constraints(cheap, "Lamb Dish 0")
+    assert meets_constraints(cheap, "Veggie Dish 0")
+    assert meets_constraints(lamb, "Lamb Dish 0")
@@ -0,0 +1,98 @@
+# tests/test_ratelimit.py
+import asyncio
+from pathlib import Path
+
+import yaml
+from fastapi.testclient import TestClient
+
+from app import main
+from app.ratelimit import MemoryBuckets, Protection, rate_key
+
+SECRET = "backend-secret"
+
+
+class NoLag:
+    lag = 0.0
+
+    def stats(self) -> dict:
+        return {}
+
+
+def _scope(client: str, user_id: str = None, token: str = None) -> dict:
+    headers = [(b"x-user-id", user_id.encode())] if user_id else []
+    if token:
+        headers.append((b"x-internal-token", token.encode()))
+    return {"type": "http", "client": (client, 50000), "headers": headers}
+
+
+def _protection(ip_rate: str = "100/minute") -> Protection:
+    return Protection(
+        rates={"ip": ip_rate, "recommend": "2/minute"}, buckets=MemoryBuckets(), monitor=NoLag(), secret=SECRET
+    )
+
+
+def _limited(protection: Protection, scope: dict, count: int) -> list:
+    async def waits():
+        return [bool(await protection.wait_time(scope, "recommend")) for _ in range(count)]
+
+    return asyncio.run(waits())
+
+
+def test_rate_key_trusts_user_id_only_with_the_shared_secret():
+    """Test that X-User-Id picks the bucket only when the backend's secret comes with it"""
+    assert rate_key(_scope("172.18.0.3", "user-1", SECRET), SECRET) == "user:user-1"
+    assert rate_key(_scope("172.18.0.3", token=SECRET), SECRET) == "172.18.0.3"
+    assert rate_key(_scope("127.0.0.1", "user-1"), SECRET) == "127.0.0.1"
+    assert rate_key(_scope("203.0.113.9", "user-1", "guess"), SECRET) == "203.0.113.9"
+    # Without a configured secret the header is never trusted
+    assert rate_key(_scope("127.0.0.1", "user-1", ""), "") == "127.0.0.1"
+
+
+def test_backend_users_get_separate_buckets():
+    """Test that one busy user behind the backend does not use up everyone else's limit"""
+    protection = _protection()
+
+    assert _limited(protection, _scope("172.18.0.3", "busy", SECRET), 3) == [False, False, True]
+    assert _limited(protection, _scope("172.18.0.3", "other", SECRET), 1) == [False]
+    assert _limited(protection, _scope("172.18.0.3"), 3) == [False, False, True]
+
+
+def test_forged_user_ids_stay_under_the_ip_ceiling():
+    """Test that rotating X-User-Id neither splits buckets without the secret nor escapes the per-IP bucket"""
+    protection = _protection(ip_rate="4/minute")
+
+    forged = [_limited(protection, _scope("203.0.113.9", f"user-{number}"), 1)[0] for number in range(3)]
+    assert forged == [False, False, True]
+
+    # Even a client holding the secret is capped by its address
+    rotated = [_limited(protection, _scope("172.18.0.3", f"user-{number}", SECRET), 1)[0] for number in range(5)]
+    assert rotated == [False, False, False, False, True]
+    assert protection.counters["limited_ip"] == 1
+
+
+def test_compose_shares_the_secret_between_backend_and_service():
+    """Test that docker compose hands both containers the same secret, whatever their bridge addresses"""
+    compose = yaml.safe_load((Path(__file__).resolve().parents[2] / "docker-compose.yml").read_text())
+
+    def environment(service):
+        return dict(entry.split("=", 1) for entry in compose["services"][service]["environment"])
+
+    backend, service = environment("backend"), environment("menu-recommendations-service")
+    assert backend["RECOMMENDATIONS_SHARED_SECRET"] == service["RECOMMENDATIONS_SHARED_SECRET"]
+    assert backend["RECOMMENDATIONS_SHARED_SECRET"].startswith("${")
+
+
+def test_loop_stats_require_the_shared_secret(monkeypatch):
+    """Test that blocking reports, which carry stack traces, are only served to internal callers"""
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main.service_protection, "secret", "")
+    assert client.get("/loop/stats", headers={"X-Internal-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(main.service_protection, "secret", SECRET)
+    assert client.get("/loop/stats").status_code == 403
+    assert client.get("/loop/stats", headers={"X-Internal-Token": "guess"}).status_code == 403
+
+    response = client.get("/loop/stats", headers={"X-Internal-Token": SECRET})
+    assert response.status_code == 200
+    assert set(response.json()) == {"lag", "blocking"}
@@ -0,0 +1,72 @@
+# tests/test_scoring.py
+import pytest
+
+from app import utils
+from app.evaluate import BUILTIN_CASES, PIZZERIA, evaluate
+from app.models import MenuItem, RecommendationRequest
+from app.scoring import LocalRecommender, local_recommender
+
+MENU = [MenuItem(**item) for item in PIZZERIA]
+
+
+def _ranked_names(preference, meal_time="lunch"):
+    request = RecommendationRequest(restaurant_menu=MENU, user_preference=preference)
+    return [MENU[row].name for row, _, _ in LocalRecommender().rank(request, meal_time, k=len(MENU))]
+
+
+def test_rank_follows_preference_and_price_words():
+    """Test that keywords pick the item and cheap/premium words order by price"""
+    assert _ranked_names("something spicy")[0] == "Diavola"
+    assert _ranked_names("a fancy treat")[0] == "Truffle Risotto"
+    assert _ranked_names("cheap")[-1] == "Truffle Risotto"
+
+
+def test_rank_ties_keep_menu_order():
+    """Test that equally scored items come back in menu order"""
+    menu = [MenuItem(name=f"Plain {letter}", price=10) for letter in "ABC"]
+    ranked = LocalRecommender().rank(RecommendationRequest(restaurant_menu=menu), "dinner")
+
+    assert [row for row, _, _ in ranked] == [0, 1, 2]
+    assert len({score for _, score, _ in ranked}) == 1
+
+
+def test_empty_menu():
+    """Test that an empty menu ranks nothing and cannot be recommended from"""
+    request = RecommendationRequest(restaurant_menu=[], user_preference="pizza")
+
+    assert LocalRecommender().rank(request, "dinner") == []
+    with pytest.raises(ValueError):
+        LocalRecommender().recommend(request, "dinner")
+
+
+def test_local_mode_routing(monkeypatch):
+    """Test which requests skip the model in each RECOMMENDATION_LOCAL_MODE"""
+    requests = {
+        "none": RecommendationRequest(restaurant_menu=MENU),
+        "on menu": RecommendationRequest(restaurant_menu=MENU, user_preference="spicy cheap"),
+        "off menu": RecommendationRequest(restaurant_menu=MENU, user_preference="something warming for a rainy day"),
+    }
+    assert {name: local_recommender.is_simple(request) for name, request in requests.items()} == {
+        "none": True, "on menu": True, "off menu": False
+    }
+
+    # The default keeps every request on the model
+    assert utils.RECOMMENDATION_LOCAL_MODE == "never"
+    assert not any(utils.use_local_recommender(request) for request in requests.values())
+
+    monkeypatch.setattr(utils, "RECOMMENDATION_LOCAL_MODE", "simple")
+    assert [utils.use_local_recommender(request) for request in requests.values()] == [True, True, False]
+
+    monkeypatch.setattr(utils, "RECOMMENDATION_LOCAL_MODE", "always")
+    assert all(utils.use_local_recommender(request) for request in requests.values())
+
+
+def test_evaluate_reports_ranking_metrics():
+    """Test the offline evaluation on the built-in cases and on a miss"""
+    report = evaluate(BUILTIN_CASES, k=3)
+    assert report["cases"] == len(BUILTIN_CASES)
+    assert report["hit@1"] == report["hit@3"] == report["mrr"] == 1.0
+
+    miss = {"request": {"restaurant_menu": PIZZERIA, "user_preference": "dessert"}, "expected": ["Sushi"]}
+    report = evaluate([miss], k=2)
+    assert (report["hit@1"], report["hit@2"], report["mrr"]) == (0.0, 0.0, 0.0)
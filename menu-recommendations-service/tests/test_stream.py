@@ -0,0 +1,91 @@
+# tests/test_stream.py
+import asyncio
+
+import pytest
+
+from app import utils
+from app.models import MenuItem, RecommendationRequest
+from app.utils import FakeModel, MenuRecommendationAgent
+
+MENU = [
+    MenuItem(name="Korma", price=10, description="Mild creamy curry"),
+    MenuItem(name="Vindaloo", price=12, description="Very hot curry"),
+]
+
+
+class BrokenModel(FakeModel):
+    """Streams one chunk, then fails"""
+
+    async def stream(self, prompt: str, timeout: float):
+        yield "Let me think "
+        raise RuntimeError("connection reset")
+
+
+@pytest.fixture(autouse=True)
+def model_only(monkeypatch):
+    monkeypatch.setattr(utils, "RECOMMENDATION_LOCAL_MODE", "never")
+
+
+def _events(agent: MenuRecommendationAgent, hold_slots: int = 0):
+    async def run():
+        for _ in range(hold_slots):
+            await agent._slots.acquire()
+        request = RecommendationRequest(restaurant_menu=MENU, user_preference="something mild")
+        return [event async for event in agent.recommend_stream(request)]
+    return asyncio.run(asyncio.wait_for(run(), 2))
+
+
+def test_stream_sends_item_then_reasoning_then_done():
+    """Test that the pick is sent before the reasoning chunks and the final recommendation"""
+    events = _events(MenuRecommendationAgent(FakeModel("Korma is mild and creamy, a gentle choice."), timeout=1))
+    kinds = [kind for kind, _ in events]
+
+    assert kinds[0] == "item" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"reasoning"}
+    assert events[0][1] == ["Korma"]
+    assert "".join(chunk for kind, chunk in events if kind == "reasoning").strip() == events[-1][1].reasoning
+    assert not events[-1][1].is_degraded
+
+
+def test_stream_deadline_includes_waiting_for_a_slot():
+    """Test that a stream stuck behind busy slots falls back at the deadline"""
+    model = FakeModel("Korma is mild.")
+    agent = MenuRecommendationAgent(model, timeout=0.1, max_concurrency=1)
+
+    events = _events(agent, hold_slots=1)
+
+    assert [kind for kind, _ in events] == ["item", "reasoning", "done"]
+    assert events[1][1].startswith("AI recommendation timed out.")
+    assert events[-1][1].is_degraded
+    assert model.calls == 0
+    assert agent._pending == 0
+
+
+def test_stream_slow_model_times_out():
+    """Test that a model slower than the deadline gets the fallback"""
+    events = _events(MenuRecommendationAgent(FakeModel(delay=1), timeout=0.05))
+
+    assert [kind for kind, _ in events] == ["item", "reasoning", "done"]
+    assert events[1][1].startswith("AI recommendation timed out.")
+
+
+def test_stream_model_error_falls_back():
+    """Test that a model failure mid-stream answers with the fallback"""
+    events = _events(MenuRecommendationAgent(BrokenModel(), timeout=1))
+
+    assert [kind for kind, _ in events] == ["item", "reasoning", "done"]
+    assert events[1][1].startswith("AI recommendation failed.")
+    assert events[-1][1].is_degraded
+
+
+def test_stream_saturated_falls_back_without_model():
+    """Test that a saturated agent streams the fallback without calling the model"""
+    model = FakeModel("Korma is mild.")
+    agent = MenuRecommendationAgent(model, timeout=1, max_concurrency=1, max_queue=0)
+    agent._pending = 1
+
+    events = _events(agent)
+
+    assert [kind for kind, _ in events] == ["item", "reasoning", "done"]
+    assert events[1][1].startswith("AI recommendations are busy.")
+    assert model.calls == 0